@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de parse_dates_block: tokenizer rapide (DATE_FAST_PATH) contre dateparser seul.
+
+Sur un corpus d'emails représentatifs (FR/EN/DA/NL), mesure le temps par email des deux chemins,
+la part des emails résolus sans appel à dateparser et les écarts de résultat entre les deux.
+
+Usage: python Test/bench_dates.py [nombre_de_repetitions]
+"""
+
+import os
+import sys
+import timeit
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+try:
+    import nlp_parser  # noqa: E402
+except ImportError as e:
+    print(f"❌ nlp_parser indisponible (spaCy/dateparser installés ?): {e}")
+    sys.exit(1)
+
+CORPUS = [
+    "Bonjour,\nNous sommes un groupe de 45 personnes et cherchons un autocar du 12/10 au 15/10.\n"
+    "Départ: Paris\nArrivée: Lyon\nMerci, Jean Dupont +33 6 12 34 56 78",
+    "Hello, we need a coach for 30 people from 3 Nov to 5 Nov, round trip London -> Oxford.",
+    "Naam | Jan de Vries\nVertrekstad | Amsterdam\nVertrekdatum | 12 oktober\nTerugkeerdatum | 14 oktober\n"
+    "Hoeveel reizigers nemen deel aan deze reis? | 10 - 20 personen",
+    "Hej, vi er 8 voksne og skal bruge en bus fra København den 4. maj. Tak!",
+    "Merci de nous envoyer un devis pour 20 passagers, aller simple, le 24 déc.",
+    "Date de départ: 27-09-2025 17:30\nDate de retour: 29-09-2025 10:00\nPersonnes: 50",
+    "Hi,\nCould you quote a minibus on 2025-11-21 for our team offsite? We are 12.\nBest regards, Anna",
+    "Bonjour, pour le mariage du 1er mai nous aurions besoin de deux navettes. Retour le 2 mai.",
+    "Dear team, trip planned for October 12, 2025 with 40 pupils, return October 14, 2025.",
+    "Bonjour, nous voudrions un bus demain matin pour 15 personnes.",
+    "Hello, can you do a transfer next monday for 6 people?",
+    "Goedemiddag, wij zoeken vervoer voor 25 personen op 3 december, heen en terug.",
+    "Transfert aéroport CDG -> hôtel, vol AF123 arrivant à 14h35, 4 personnes.",
+]
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    appels = {"n": 0}
+    parse_orig, search_orig = nlp_parser.parse, nlp_parser.search_dates
+
+    def _compte(fn):
+        def wrapper(*args, **kwargs):
+            appels["n"] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+
+    print(f"⏱️  {len(CORPUS)} emails x {repetitions} répétitions")
+    nlp_parser.warmup()  # chargement des langues dateparser hors mesure
+    resultats = {}
+    for nom, rapide in (("dateparser", False), ("rapide", True)):
+        nlp_parser.DATE_FAST_PATH = rapide
+        duree = min(timeit.repeat(lambda: [nlp_parser.parse_dates_block(t) for t in CORPUS],
+                                  number=repetitions, repeat=3))
+        par_email_ms = duree / (repetitions * len(CORPUS)) * 1000
+        # sorties et emails nécessitant dateparser, sur un passage instrumenté
+        nlp_parser.parse, nlp_parser.search_dates = _compte(parse_orig), _compte(search_orig)
+        sorties, sans_dateparser = [], 0
+        for t in CORPUS:
+            appels["n"] = 0
+            sorties.append(nlp_parser.parse_dates_block(t))
+            sans_dateparser += appels["n"] == 0
+        nlp_parser.parse, nlp_parser.search_dates = parse_orig, search_orig
+        resultats[nom] = (par_email_ms, sorties)
+        print(f"   {nom:<10} {par_email_ms:8.2f} ms / email, sans dateparser: {sans_dateparser}/{len(CORPUS)}")
+
+    print(f"📉 Gain: x{resultats['dateparser'][0] / resultats['rapide'][0]:.1f}")
+    ecarts = [(t, a, b) for t, a, b in zip(CORPUS, resultats["dateparser"][1], resultats["rapide"][1]) if a != b]
+    print(f"🔍 Écarts de résultat: {len(ecarts)}/{len(CORPUS)}")
+    for t, a, b in ecarts:
+        print(f"   - {t[:60]!r}: dateparser={a} rapide={b}")
+
+
+if __name__ == "__main__":
+    main()
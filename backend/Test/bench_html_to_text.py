@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de conversion HTML -> texte sur un gros email marketing (tableaux imbriqués, styles, scripts).
+
+Compare html_text.html_to_text à l'ancienne cascade de re.sub et, pour référence,
+à un convertisseur mono-passe basé sur html.parser.HTMLParser.
+
+Usage: python Test/bench_html_to_text.py [taille_en_ko]
+"""
+
+import html as html_module
+import os
+import re
+import sys
+import timeit
+from html.parser import HTMLParser
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from html_text import html_to_text, _PIPE_RUN_RE  # noqa: E402
+from test_html_to_text import legacy_html_to_text  # noqa: E402
+
+
+class _HTMLParserConverter(HTMLParser):
+    """Même sortie que html_to_text, en un seul parcours du balisage (référence)."""
+    START = {"li": "- ", "br": "\n"}
+    END = {"thead": "\n", "tbody": "\n", "tfoot": "\n", "tr": "\n", "td": " | ", "th": " | ",
+           "p": "\n\n", "div": "\n", "li": "\n"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self.skip += 1
+        elif not self.skip and tag in self.START:
+            self.out.append(self.START[tag])
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.skip and tag in self.START:
+            self.out.append(self.START[tag])
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self.skip = max(0, self.skip - 1)
+        elif not self.skip and tag in self.END:
+            self.out.append(self.END[tag])
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.out.append(data)
+
+    def handle_entityref(self, name):
+        if not self.skip:
+            self.out.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if not self.skip:
+            self.out.append(f"&#{name};")
+
+
+def htmlparser_to_text(h):
+    p = _HTMLParserConverter()
+    p.feed(h)
+    p.close()
+    t = _PIPE_RUN_RE.sub(" | ", "".join(p.out))
+    return html_module.unescape("\n".join([ln.strip(" |\t ") for ln in t.splitlines()]))
+
+
+def email_marketing(taille_ko):
+    ligne = ('<tr><td class="label" style="padding:4px;font-family:Arial">Destination</td>'
+             '<td style="padding:4px">Paris &amp; Lyon</td></tr>\n')
+    bloc = ('<table width="600" cellpadding="0"><tbody>' + ligne * 10 + '</tbody></table>'
+            '<div class="cta"><span style="color:#333"><a href="https://example.com/offre?id=1">Voir l\'offre</a>'
+            '</span></div><ul><li>Autocar 50 places</li><li>Minibus</li></ul><br>\n')
+    tete = ('<html><head><style>td { color: #333; } .cta { margin: 0 }</style>'
+            '<script>window.dataLayer = [];</script></head><body><div><p>Bonjour&nbsp;!</p>')
+    corps = tete
+    while len(corps) < taille_ko * 1024:
+        corps += bloc
+    return corps + "</div></body></html>"
+
+
+def main():
+    taille_ko = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    h = email_marketing(taille_ko)
+    print(f"⏱️  email HTML de {len(h) // 1024} Ko")
+    resultats = {}
+    for nom, fn in (("cascade", legacy_html_to_text), ("html_text", html_to_text),
+                    ("HTMLParser", htmlparser_to_text)):
+        duree = min(timeit.repeat(lambda: fn(h), number=10, repeat=3)) / 10
+        resultats[nom] = duree
+        print(f"   {nom:<11} {duree * 1000:8.2f} ms  ({len(h) / duree / 1e6:6.1f} Mo/s)  "
+              f"sortie identique: {fn(h) == legacy_html_to_text(h)}")
+    print(f"📉 Gain html_text vs cascade: x{resultats['cascade'] / resultats['html_text']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark des extracteurs à base de regex de nlp_parser (hors spaCy/dateparser).
+
+Compare, sur un corpus de blocs représentatifs, le temps d'extraction par bloc
+avec le registre de motifs précompilés et avec les implémentations d'origine
+(motifs reconstruits à chaque appel), recopiées ci-dessous pour référence.
+
+Usage: python Test/bench_nlp_regex.py [nombre_de_repetitions]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import nlp_parser  # noqa: E402
+
+BLOCS = [
+    "Bonjour,\nNous sommes un groupe de 45 personnes et cherchons un autocar du 12/10 au 15/10.\n"
+    "Départ: Paris\nArrivée: Lyon\nMerci, Jean Dupont +33 6 12 34 56 78",
+    "Hello, we need a coach for twelve people from 3 Nov to 5 Nov, round trip London -> Oxford. "
+    "Contact: john@example.com",
+    "Naam | Jan de Vries\nVertrekstad | Amsterdam\nAankomststad | Rotterdam\nVertrekdatum | 12 oktober\n"
+    "Hoeveel reizigers nemen deel aan deze reis? | 10 - 20 personen",
+    "Hej, vi er 8 voksne og skal bruge en bil fra København den 4. maj. Tak!",
+    "Merci de nous envoyer un devis pour deux passagers, aller simple, le 24 déc.",
+]
+
+
+# --- Implémentations d'origine (pour comparaison) ---
+def _legacy_inject_year_ymd(s, current_year):
+    s = re.sub(r"\b(\d{1,2})([\/\-.])(\d{1,2})(?![\/\-.]\d{2,4})\b", lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}{m.group(2)}{current_year}", s)
+    months = [
+        'jan', 'janv', 'janvier', 'feb', 'fev', 'févr', 'février', 'february', 'march', 'mars', 'apr', 'avr', 'avril', 'april',
+        'may', 'mai', 'jun', 'juin', 'june', 'jul', 'juillet', 'july', 'aug', 'août', 'aout', 'august', 'sep', 'sept', 'septembre',
+        'oct', 'octobre', 'october', 'nov', 'novembre', 'november', 'dec', 'déc', 'décembre', 'december',
+        'januar', 'januar', 'februar', 'marts', 'april', 'maj', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'december',
+        'januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli', 'augustus', 'september', 'oktober', 'november', 'december'
+    ]
+    month_re = r"(" + "|".join(sorted(set(months), key=len, reverse=True)) + r")"
+    s = re.sub(fr"\b(\d{{1,2}})\s+{month_re}\b(?!\s*\d{{2,4}})", lambda m: f"{m.group(1)} {m.group(2)} {current_year}", s, flags=re.IGNORECASE)
+    s = re.sub(fr"\b{month_re}\s+(\d{{1,2}})\b(?!\s*\d{{2,4}})", lambda m: f"{m.group(1)} {m.group(2)} {current_year}", s, flags=re.IGNORECASE)
+    return s
+
+
+def _legacy_extract_nb_personnes(text):
+    direct_patterns = [
+        r"(?:\bfor|pour)\s+(\d{1,3})\s+(?:people|persons|personnes|personne|passagers|pax)",
+        r"\b(\d{1,3})\s*(?:personnes|personne|people|voyageurs|participants|coaches|boys|passagers|pax)\b",
+        r"There will be\s+(\d{1,3})\s+of us",
+        r"\b(\d{1,3})\s*x\s*(?:people|personnes|pax)\b",
+        r"\bgroup of\s*(\d{1,3})\b",
+        r"\b(\d{1,3})\s*(?:adults|adultes)\b",
+        r"\b(\d{1,3})\s*(?:children|kids|enfants)\b",
+    ]
+    for rgx in direct_patterns:
+        m = re.search(rgx, text, re.IGNORECASE)
+        if m:
+            return m.group(1)
+    tl = text.lower()
+    for w, n in {**nlp_parser.WORD_NUM_FR, **nlp_parser.WORD_NUM_EN}.items():
+        if re.search(fr"\b{re.escape(w)}\b\s+(?:personnes|people|passagers)", tl):
+            return str(n)
+    m = re.search(r"(\d{1,3})\s*[-àto]{1,2}\s*(\d{1,3})\s*(?:personnes|people|pax)", tl)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}"
+    return ""
+
+
+def _legacy_extract_trip_type(text):
+    patterns = [
+        (r"aller\s*retour|aller-retour|a/r|ar|retourreis|heen en terug|round\s*trip", "aller-retour"),
+        (r"aller\s*simple|one\s*way|one-way", "aller simple"),
+    ]
+    for rgx, label in patterns:
+        if re.search(rgx, text, re.IGNORECASE):
+            return label
+    return ""
+
+
+def _legacy_extract_vehicle(text):
+    vocab = [
+        "bus", "autocar", "minibus", "voiture", "van", "minivan", "minibus", "suv",
+        "car", "coach", "bus", "minibus", "van", "minivan", "suv",
+        "bil", "lastbil", "bus", "minibus",
+    ]
+    t = text.lower()
+    for v in vocab:
+        if v in t:
+            return v
+    return ""
+
+
+def extraction_legacy(bloc):
+    # parse_dates_block appelait _inject_year_ymd trois fois par bloc
+    for _ in range(3):
+        _legacy_inject_year_ymd(bloc, 2025)
+    _legacy_extract_nb_personnes(bloc)
+    _legacy_extract_trip_type(bloc)
+    _legacy_extract_vehicle(bloc)
+
+
+def extraction_registre(bloc):
+    for _ in range(3):
+        nlp_parser._inject_year(bloc, 2025)
+    nlp_parser.extract_nb_personnes(bloc)
+    nlp_parser.extract_trip_type(bloc)
+    nlp_parser.extract_vehicle(bloc)
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"⏱️  {len(BLOCS)} blocs x {repetitions} répétitions")
+    resultats = {}
+    for nom, fn in (("origine", extraction_legacy), ("registre", extraction_registre)):
+        duree = min(timeit.repeat(lambda: [fn(b) for b in BLOCS], number=repetitions, repeat=3))
+        par_bloc_us = duree / (repetitions * len(BLOCS)) * 1e6
+        resultats[nom] = par_bloc_us
+        print(f"   {nom:<9} {par_bloc_us:8.1f} µs / bloc")
+    print(f"📉 Gain: x{resultats['origine'] / resultats['registre']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Outils communs aux tests: base SQLite temporaire, migrée, propre à chaque test.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Pas de préchargement NLP ni de worker outbox lancés par app.init_app pendant les tests:
+# les tests qui en ont besoin les démarrent explicitement
+os.environ.setdefault("WARMUP_ON_START", "false")
+os.environ.setdefault("OUTBOX_WORKER_ON_START", "false")
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import db  # noqa: E402
+
+_DOSSIER = tempfile.mkdtemp(prefix="email_auto_tests_")
+atexit.register(shutil.rmtree, _DOSSIER, True)
+_compteur = 0
+
+
+def chemin_temporaire() -> str:
+    """Chemin d'un nouveau fichier de base (inexistant) dans le dossier temporaire des tests."""
+    global _compteur
+    _compteur += 1
+    return os.path.join(_DOSSIER, f"demandes_{_compteur}.db")
+
+
+def base_temporaire(migrer: bool = True):
+    """Bascule db.DB_PATH sur une base neuve et retourne Database() (migrée si migrer=True).
+    La connexion du thread courant est rouverte sur la nouvelle base."""
+    db.close_thread_connection()
+    db.DB_PATH = chemin_temporaire()
+    if not migrer:
+        return None
+    return db.Database()
+
+
+class Remplacements:
+    """Équivalent minimal de la fixture monkeypatch de pytest, pour exécuter un script de test
+    directement (python Test/test_x.py): setattr() puis undo() rétablit les valeurs d'origine."""
+
+    def __init__(self):
+        self._undo = []
+
+    def setattr(self, obj, name, value):
+        self._undo.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def undo(self):
+        for obj, name, value in reversed(self._undo):
+            setattr(obj, name, value)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests du cache des rédactions IA (ai_email): clé construite sur les faits normalisés (marqueurs
+d'inconnu équivalents) et une seule rédaction pour la prévisualisation puis l'envoi par l'outbox.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import Remplacements, base_temporaire  # noqa: E402
+import ai_email  # noqa: E402
+
+
+class FausseConnexion:
+    """Remplace la SmtpConnection de mailer_service: enregistre les messages envoyés."""
+
+    def __init__(self):
+        self.server = None
+        self.messages = []
+
+    def sendmail(self, recipients, message):
+        self.messages.append(message)
+
+    def close(self):
+        pass
+
+
+def test_cle_sur_faits_normalises():
+    trajets = [("2025-10-12", "08:30")]
+    cle = ai_email._compose_key("fr", 40, "Paris", "", trajets, "")
+    assert ai_email._compose_key("fr", "40", "Paris", "N/A", [["2025-10-12", "08:30"]], "à définir") == cle
+    assert ai_email._compose_key("fr", "?", "Paris", None, [], None) \
+        == ai_email._compose_key("fr", "", "Paris", "n/a", [("", "08:30")], "TBD")
+    assert ai_email._compose_key("fr", 41, "Paris", "", trajets, "") != cle
+    assert ai_email._compose_key("de", 40, "Paris", "", trajets, "") != cle
+
+
+def test_apercu_puis_envoi_une_seule_redaction(monkeypatch):
+    base = base_temporaire()
+    import app as app_module
+    import outbox
+    appels = []
+
+    def rediger(*faits):
+        appels.append(faits)
+        return "Texte rédigé par l'IA"
+    monkeypatch.setattr(ai_email, "_compose_uncached", rediger)
+    monkeypatch.setattr(ai_email, "_compose_cache", ai_email._compose_cache.__class__())
+    connexion = FausseConnexion()
+    monkeypatch.setattr(outbox.mailer_service, "connection", connexion)
+    monkeypatch.setattr(outbox.outbox_worker, "wake", lambda: None)
+    # ni nombre de personnes ni dates: marqueurs d'inconnu et trajet "Date à confirmer"
+    demande_id = base.conn.execute("INSERT INTO demandes (nom, ville, statut) VALUES ('Client', 'Lyon', 'en_attente')"
+                                   ).lastrowid
+    base.conn.execute("INSERT INTO sous_traitants (nom, email, ville, pays) "
+                      "VALUES ('Cars Rhône', 'cars@exemple.fr', 'Lyon', 'France')")
+    base.conn.commit()
+    client = app_module.app.test_client()
+
+    apercu = client.get(f"/demandes/{demande_id}/email/preview").get_json()
+    assert apercu["body"] == "Texte rédigé par l'IA" and apercu["lang"] == "fr"
+    reponse = client.post(f"/demandes/valider/{demande_id}")
+    assert reponse.status_code == 200
+    outbox_id, = reponse.get_json()["outbox"]
+    assert outbox.outbox_worker.process_due() == 1
+    item = base.get_outbox(outbox_id)
+    assert item["statut"] == "envoye" and item["corps"] == apercu["body"]
+    assert len(appels) == 1
+    assert len(connexion.messages) == 1
+
+
+def main():
+    print("🔍 Tests du cache des rédactions IA...")
+    test_cle_sur_faits_normalises()
+    print(f"✅ {test_cle_sur_faits_normalises.__name__}")
+    patch = Remplacements()
+    try:
+        test_apercu_puis_envoi_une_seule_redaction(patch)
+    finally:
+        patch.undo()
+    print(f"✅ {test_apercu_puis_envoi_une_seule_redaction.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests de _trim_email (ai_parser): l'historique cité d'une réponse Outlook est coupé seulement sur
+un bloc d'en-tête complet (De/Envoyé/À/Objet...); les formulaires dont les champs s'appellent
+"From:", "To:" ou "Date:" restent entiers.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import ai_parser  # noqa: E402
+
+DEMANDE = ("Bonjour,\nNous souhaitons un autocar de 50 places pour un voyage scolaire à Lyon "
+           "le 12 mars, retour le 14 mars.\nMerci, Claire Martin 06 12 34 56 78\n")
+
+FORMULAIRES = [
+    # formulaire de site web: champs From/To/Date consécutifs, sans Envoyé ni Objet
+    "Nouvelle demande de devis reçue via le site.\nNom: Dupont\nFrom: Paris\nTo: Lyon\n"
+    "Date: 12/03/2030\nPassagers: 45\nMessage: aller-retour avec arrêt à Dijon, merci.\n",
+    "Trip request submitted from our website form, details below.\nFrom: London\nDate: 2030-05-04\n"
+    "To: Oxford\nPeople: 30\nComments: we need a coach with luggage space.\n",
+    # "De :" / "À :" sans bloc Outlook complet
+    "Bonjour, voici notre demande pour le séminaire de printemps.\nDe : Marseille\nÀ : Nice\n"
+    "Date : 3 avril 2030\nNombre de personnes : 25\nCordialement,\nLéa\n",
+]
+
+HISTORIQUES = [
+    "________________________________\nDe : Autocars Express <devis@autocars.fr>\n"
+    "Envoyé : lundi 3 mars 2025 10:12\nÀ : Claire Martin <claire@ecole.fr>\nObjet : RE: Devis Lyon\n\n"
+    "Merci pour votre demande, pouvez-vous préciser le nombre d'élèves ?\n",
+    "From: Coach Hire <sales@coach.co.uk>\nSent: Monday, March 3, 2025 10:12 AM\nTo: Claire Martin\n"
+    "Cc: Office <office@ecole.fr>\nSubject: RE: Quote Lyon\n\nThanks, how many pupils?\n",
+    "Van: Busreizen <info@bus.nl>\nVerzonden: maandag 3 maart 2025 10:12\nAan: Claire\n"
+    "Onderwerp: RE: Offerte\n\nBedankt voor uw aanvraag.\n",
+    "Fra: Busselskab <tilbud@bus.dk>\nSendt: 3. marts 2025 10:12\nTil: Claire\nEmne: SV: Tilbud\n\nTak.\n",
+]
+
+
+def test_formulaires_non_coupes():
+    for corps in FORMULAIRES:
+        assert ai_parser._trim_email(corps) == corps.strip()
+
+
+def test_historique_outlook_coupe():
+    for historique in HISTORIQUES:
+        reduit = ai_parser._trim_email(DEMANDE + "\n" + historique)
+        assert "12 mars" in reduit and "06 12 34 56 78" in reduit
+        for mot in ("Envoyé", "Sent", "Verzonden", "Sendt", "RE:", "SV:", "how many", "Bedankt", "Tak."):
+            assert mot not in reduit, (mot, reduit)
+
+
+def test_formulaire_suivi_d_un_historique():
+    corps = FORMULAIRES[0] + "\n" + HISTORIQUES[0]
+    reduit = ai_parser._trim_email(corps)
+    assert "From: Paris" in reduit and "Date: 12/03/2030" in reduit
+    assert "Envoyé" not in reduit
+
+
+def main():
+    print("🔍 Tests de la réduction des emails avant extraction IA...")
+    for test in (test_formulaires_non_coupes, test_historique_outlook_coupe, test_formulaire_suivi_d_un_historique):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests du démarrage de l'API: importer app (et donc email_fetcher, outbox) ne crée ni ne migre
+la base; init_app, ou la première requête sous un serveur WSGI, s'en charge une seule fois.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import subprocess
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import chemin_temporaire  # noqa: E402
+
+# Exécuté dans un processus neuf: app ne doit pas déjà être importé
+SCRIPT = """
+import os, sqlite3, sys
+chemin = os.environ["SQLITE_PATH"]
+import app
+assert not os.path.exists(chemin), "base créée à l'import"
+{action}
+versions = {{r[0] for r in sqlite3.connect(chemin).execute("SELECT version FROM schema_version")}}
+import db
+assert versions == {{v for v, _, _ in db.Database.MIGRATIONS}}, versions
+assert app._initialized
+print("ok")
+"""
+
+
+def _executer(action):
+    env = dict(os.environ, SQLITE_PATH=chemin_temporaire(), WARMUP_ON_START="false",
+               OUTBOX_WORKER_ON_START="false", IMAP_IDLE_SERVICE="false")
+    res = subprocess.run([sys.executable, "-c", SCRIPT.format(action=action)], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0 and res.stdout.strip().endswith("ok"), res.stdout + res.stderr
+
+
+def test_import_sans_base_puis_init_app():
+    _executer("app.init_app(); app.init_app()")
+
+
+def test_premiere_requete_initialise():
+    _executer("assert app.app.test_client().get('/health').status_code == 200")
+
+
+def main():
+    print("🔍 Tests du démarrage de l'API...")
+    for test in (test_import_sans_base_puis_init_app, test_premiere_requete_initialise):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests de parse_dates_block: chemin rapide (DATE_FAST_PATH) comparé au chemin dateparser seul sur le
+corpus du benchmark et des cas supplémentaires. Les sorties doivent être identiques, sauf pour les
+écarts voulus listés dans ECARTS (dates lues correctement, ou bruit numérique que dateparser
+prenait pour une date).
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+from datetime import datetime
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import nlp_parser  # noqa: E402
+from bench_dates import CORPUS  # noqa: E402
+from outils_test import Remplacements  # noqa: E402
+
+AN = datetime.now().year
+
+# Textes où les deux chemins doivent donner le même résultat (formes relatives, jours, mois écrits)
+IDENTIQUES = [
+    "Hello, see you on Friday",
+    "Rendez-vous dans 3 jours",
+    "in 2 weeks please",
+    "Départ lundi 14 mars",
+    "Vi kommer 20 personer på lørdag",
+    "Bonjour, merci pour votre réponse rapide.",
+    "Tel 06 12 34 56 78",
+]
+
+# Écarts voulus: texte -> résultat attendu du chemin rapide (dateparser seul se trompe)
+ECARTS = {
+    CORPUS[0]: (f"{AN}-10-12", f"{AN}-10-15"),  # 12/10: jour d'abord, pas le 10 décembre
+    CORPUS[2]: (f"{AN}-10-12", f"{AN}-10-14"),  # 12 oktober ... 14 oktober
+    CORPUS[6]: ("2025-11-21", ""),  # ISO
+    CORPUS[7]: (f"{AN}-05-01", f"{AN}-05-02"),  # 1er mai ... 2 mai
+    CORPUS[8]: ("2025-10-12", "2025-10-14"),  # October 12, 2025
+    CORPUS[12]: ("", ""),  # heure d'arrivée d'un vol, pas une date de voyage
+    "Nous sommes 5-6 personnes pour Lyon.": ("", ""),
+    "Devis pour 10-20 personnes, départ Paris.": ("", ""),
+    "Prix 12.50 euros": ("", ""),
+    "Call me at 10:30": ("", ""),
+    "Bus 2 jours, 45 personnes, budget 1500€": ("", ""),
+    "Mariage le 1er mai 2031, retour le 2 mai 2031, 5-6 personnes": ("2031-05-01", "2031-05-02"),
+}
+
+
+def _les_deux(texte):
+    nlp_parser.DATE_FAST_PATH = False
+    lent = nlp_parser.parse_dates_block(texte)
+    nlp_parser.DATE_FAST_PATH = True
+    return lent, nlp_parser.parse_dates_block(texte)
+
+
+def test_identique_a_dateparser(monkeypatch):
+    monkeypatch.setattr(nlp_parser, "DATE_FAST_PATH", True)
+    for texte in [t for t in CORPUS if t not in ECARTS] + IDENTIQUES:
+        lent, rapide = _les_deux(texte)
+        assert lent == rapide, (texte, lent, rapide)
+
+
+def test_ecarts_voulus(monkeypatch):
+    monkeypatch.setattr(nlp_parser, "DATE_FAST_PATH", True)
+    for texte, attendu in ECARTS.items():
+        lent, rapide = _les_deux(texte)
+        assert rapide == attendu, (texte, rapide)
+        assert lent != rapide, f"écart disparu, à déplacer dans IDENTIQUES: {texte!r}"
+
+
+def test_sans_indice_de_date_pas_de_dateparser(monkeypatch):
+    appels = []
+    monkeypatch.setattr(nlp_parser, "DATE_FAST_PATH", True)
+    monkeypatch.setattr(nlp_parser, "search_dates", lambda *a, **k: appels.append(a) or None)
+    for texte in ("Nous sommes 5-6 personnes pour Lyon.", "Prix 12.50 euros", "Bonjour, merci."):
+        assert nlp_parser.parse_dates_block(texte) == ("", "")
+    assert appels == []
+    # un jour de la semaine non lu par le chemin rapide reste confié à dateparser
+    nlp_parser.parse_dates_block("Départ vendredi matin")
+    assert len(appels) == 1
+
+
+def main():
+    print("🔍 Tests du chemin rapide de lecture des dates...")
+    for test in (test_identique_a_dateparser, test_ecarts_voulus, test_sans_indice_de_date_pas_de_dateparser):
+        patch = Remplacements()
+        try:
+            test(patch)
+        finally:
+            patch.undo()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
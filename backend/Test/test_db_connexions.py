@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests des connexions SQLite par thread: libération en fin de requête Flask et réutilisation
+par le thread suivant via le pool (sans rouvrir ni réappliquer les PRAGMA).
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import threading
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import db  # noqa: E402
+from outils_test import base_temporaire  # noqa: E402
+
+
+def _compter_ouvertures():
+    ouvertures = []
+    original = db._connect
+
+    def _connect():
+        ouvertures.append(1)
+        return original()
+    db._connect = _connect
+    return ouvertures, lambda: setattr(db, "_connect", original)
+
+
+def test_requetes_reutilisent_la_connexion():
+    base_temporaire()
+    import app as app_module
+    client = app_module.app.test_client()
+    db.close_thread_connection()
+    ouvertures, restaurer = _compter_ouvertures()
+    try:
+        codes = []
+        # un thread par requête, comme le serveur de développement Flask
+        for _ in range(5):
+            t = threading.Thread(target=lambda: codes.append(client.get("/sous-traitants").status_code))
+            t.start()
+            t.join()
+        assert codes == [200] * 5
+        assert len(ouvertures) <= 1
+        assert getattr(db._local, "conn", None) is None
+    finally:
+        restaurer()
+
+
+def test_transaction_ouverte_annulee_a_la_liberation():
+    base = base_temporaire()
+    base.conn.execute("INSERT INTO sous_traitants (nom_entreprise, email, ville) VALUES ('A', 'a@x.fr', 'Paris')")
+    assert db.get_conn().in_transaction
+    db.close_thread_connection()
+    assert not db.get_conn().in_transaction
+    assert base.conn.execute("SELECT COUNT(*) FROM sous_traitants").fetchone()[0] == 0
+
+
+def test_pool_borne_et_base_courante():
+    base_temporaire(migrer=False)
+    connexions = []
+
+    def ouvrir():
+        connexions.append(db.get_conn())
+        barriere.wait()
+        db.close_thread_connection()
+    barriere = threading.Barrier(db.SQLITE_POOL_SIZE + 3)
+    threads = [threading.Thread(target=ouvrir) for _ in range(db.SQLITE_POOL_SIZE + 3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(db._pool) == db.SQLITE_POOL_SIZE
+    # une autre base: les connexions gardées pour l'ancienne ne sont pas reprises
+    base_temporaire(migrer=False)
+    assert db.get_conn() not in connexions
+    assert db._pool == []
+
+
+def main():
+    print("🔍 Tests des connexions SQLite par thread...")
+    for test in (test_requetes_reutilisent_la_connexion, test_transaction_ouverte_annulee_a_la_liberation,
+                 test_pool_borne_et_base_courante):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
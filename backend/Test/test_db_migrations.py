@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests des migrations versionnées à partir d'une base au schéma d'origine (sans schema_version):
+données conservées, migration 6 reportée tant que des emails de sous-traitants sont en double.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sqlite3
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import db  # noqa: E402
+from outils_test import base_temporaire  # noqa: E402
+
+# Schéma créé par les versions antérieures aux migrations (tables de base + colonnes ajoutées)
+SCHEMA_ORIGINE = """
+CREATE TABLE demandes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT, prenom TEXT, telephone TEXT, ville TEXT,
+    date_debut TEXT, date_fin TEXT, type_vehicule TEXT, statut TEXT DEFAULT 'en_attente',
+    sous_traitant TEXT, date_enregistrement TEXT, date_voyage TEXT, pays TEXT, email TEXT,
+    villes TEXT, adresses TEXT, type_voyage TEXT, infos_libres TEXT, corps_mail TEXT,
+    nb_personnes INTEGER
+);
+CREATE TABLE sous_traitants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT, email TEXT, ville TEXT,
+    nom_entreprise TEXT, site_internet TEXT, pays TEXT, telephone TEXT
+);
+CREATE TABLE historique (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, demande_id INTEGER, nom TEXT, prenom TEXT,
+    telephone TEXT, ville TEXT, date_debut TEXT, date_fin TEXT, type_vehicule TEXT, statut TEXT,
+    sous_traitant TEXT, action TEXT, date_action TEXT
+);
+INSERT INTO demandes (nom, ville, date_enregistrement) VALUES ('Dupont', 'Paris', '2025-10-01 09:00:00');
+INSERT INTO sous_traitants (nom_entreprise, email, ville) VALUES ('Cars A', 'a@x.fr', 'Paris');
+INSERT INTO sous_traitants (nom_entreprise, email, ville) VALUES ('Cars A bis', 'a@x.fr', 'Paris');
+INSERT INTO sous_traitants (nom_entreprise, email, ville) VALUES ('Cars B', '', 'Lyon');
+INSERT INTO sous_traitants (nom_entreprise, email, ville) VALUES ('Cars C', '', 'Lyon');
+"""
+
+
+def _base_origine():
+    base_temporaire(migrer=False)
+    brut = sqlite3.connect(db.DB_PATH)
+    brut.executescript(SCHEMA_ORIGINE)
+    brut.close()
+    return db.Database()
+
+
+def _index_unique_present(base):
+    return base.conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_sous_traitants_email_unique'"
+    ).fetchone() is not None
+
+
+def test_migration_depuis_schema_origine():
+    base = _base_origine()
+    versions = base.applied_versions()
+    assert versions == {v for v, _, _ in db.Database.MIGRATIONS} - {6}
+    assert not _index_unique_present(base)
+    assert base.conn.execute("SELECT nom, ville FROM demandes").fetchall() == [("Dupont", "Paris")]
+    assert base.conn.execute("SELECT COUNT(*) FROM sous_traitants").fetchone()[0] == 4
+    for table in ("imap_sync", "parse_cache", "outbox"):
+        assert base.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+
+
+def test_migration_reportee_retentee_apres_dedoublonnage():
+    base = _base_origine()
+    assert 6 not in base.applied_versions()
+    base.conn.execute("DELETE FROM sous_traitants WHERE nom_entreprise = 'Cars A bis'")
+    base.conn.commit()
+    # démarrage suivant
+    db._MIGRATED.discard(db.DB_PATH)
+    base = db.Database()
+    assert 6 in base.applied_versions()
+    assert _index_unique_present(base)
+    # plusieurs sous-traitants sans email restent possibles
+    base.conn.execute("INSERT INTO sous_traitants (nom_entreprise, email) VALUES ('Cars D', '')")
+    try:
+        base.conn.execute("INSERT INTO sous_traitants (nom_entreprise, email) VALUES ('Cars E', 'a@x.fr')")
+        assert False, "email en double accepté"
+    except sqlite3.IntegrityError:
+        base.conn.rollback()
+
+
+def test_base_neuve_toutes_migrations():
+    base = base_temporaire()
+    assert base.applied_versions() == {v for v, _, _ in db.Database.MIGRATIONS}
+    assert _index_unique_present(base)
+
+
+def main():
+    print("🔍 Tests des migrations de schéma...")
+    for test in (test_migration_depuis_schema_origine, test_migration_reportee_retentee_apres_dedoublonnage,
+                 test_base_neuve_toutes_migrations):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests du mode paginé de GET /demandes: curseur keyset sur (date_enregistrement, id) avec des dates
+identiques (ex aequo) et des dates NULL, et projection ?fields= sans perdre les champs calculés.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+from datetime import datetime, timedelta
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import base_temporaire  # noqa: E402
+
+DATES = ["2025-10-02 09:00:00", "2025-10-01 09:00:00", None, "2025-10-02 09:00:00",
+         "2025-10-01 09:00:00", None, "2025-10-02 09:00:00", None, "2025-09-30 18:00:00"]
+
+
+def _client_avec_demandes():
+    base = base_temporaire()
+    import app as app_module
+    voyage = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d')
+    for i, date_enr in enumerate(DATES):
+        base.conn.execute(
+            "INSERT INTO demandes (nom, ville, date_enregistrement, date_voyage) VALUES (?, ?, ?, ?)",
+            (f"Client {i}", "Paris", date_enr, voyage),
+        )
+    base.conn.commit()
+    return app_module.app.test_client()
+
+
+def _toutes_les_pages(client, limit, fields=None):
+    pages, cursor = [], None
+    while True:
+        url = f"/demandes?limit={limit}" + (f"&cursor={cursor}" if cursor else "") + (f"&fields={fields}" if fields else "")
+        data = client.get(url).get_json()
+        pages.append(data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_curseur_ex_aequo_et_dates_nulles():
+    client = _client_avec_demandes()
+    attendu = sorted(
+        ((d or "", i + 1) for i, d in enumerate(DATES)), reverse=True
+    )
+    for limit in (1, 2, 4, 50):
+        pages = _toutes_les_pages(client, limit)
+        ids = [item["id"] for page in pages for item in page]
+        assert ids == [i for _, i in attendu], (limit, ids)
+        assert all(len(page) <= limit for page in pages)
+    # les demandes sans date d'enregistrement arrivent en dernier, par id décroissant
+    assert ids[-3:] == [8, 6, 3]
+
+
+def test_projection_garde_les_champs_calcules():
+    client = _client_avec_demandes()
+    items = _toutes_les_pages(client, 50, fields="nom")[0]
+    assert all(item["jours_restants"] in (9, 10) for item in items)
+    assert "corps_mail" not in items[0] and items[0]["nom"].startswith("Client")
+
+
+def test_curseur_invalide():
+    client = _client_avec_demandes()
+    assert client.get("/demandes?cursor=pas-un-curseur").status_code == 400
+
+
+def main():
+    print("🔍 Tests de la pagination de GET /demandes...")
+    for test in (test_curseur_ex_aequo_et_dates_nulles, test_projection_garde_les_champs_calcules,
+                 test_curseur_invalide):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
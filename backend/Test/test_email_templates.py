@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests de référence (golden) des emails partenaires rendus par email_templates pour de/da/fr/en.
+Les textes attendus sont ceux de l'ancien format_partner_email (une branche par langue).
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from email_templates import get_template, render_partner_email  # noqa: E402
+
+FAHRTEN = [("2025-10-12", "08:30"), ("2025-10-13", "17:00")]
+COMPLET = (45, "Paris → Lyon", "465 km", FAHRTEN, "9 h")
+INCONNU = ("", "N/A", "n/a", [], "à définir")
+
+GOLDEN = {
+    "de": (
+        "Guten Tag,\n\nwir suchen einen Bus mit Fahrer für folgende Transfers:\n\n"
+        "Details\nGruppe: ca. 45 Personen\nStrecke: Paris → Lyon\nEntfernung: 465 km\n\n"
+        "Fahrten\n2025-10-12 – Abfahrt 08:30 Uhr\n2025-10-13 – Abfahrt 17:00 Uhr\n\n"
+        "Gesamt: 2 Fahrten, 465 km, geschätzte Einsatzzeit pro Tag ca. 9 h.\n\n"
+        "Wir bitten um Ihr Verfügbarkeits- und Preisangebot.\n\nVielen Dank im Voraus.\n--------------\n"
+    ),
+    "da": (
+        "Goddag,\n\nVi søger en bus med chauffør til følgende transporter:\n\n"
+        "Detaljer\nGruppe: ca. 45 personer\nRute: Paris → Lyon\nAfstand: 465 km\n\n"
+        "Ture\n2025-10-12 – Afgang 08:30 \n2025-10-13 – Afgang 17:00 \n\n"
+        "I alt: 2 ture, 465 km, anslået varighed pr. dag ca. 9 h.\n\n"
+        "Send venligst jeres tilgængelighed og prisoverslag.\n\nPå forhånd tak.\n--------------\n"
+    ),
+    "fr": (
+        "Bonjour,\n\nNous recherchons un bus avec chauffeur pour les trajets suivants :\n\n"
+        "Détails\nGroupe : environ 45 personnes\nTrajet : Paris → Lyon\nDistance : 465 km\n\n"
+        "Trajets\n2025-10-12 – Départ 08:30 h\n2025-10-13 – Départ 17:00 h\n\n"
+        "Total : 2 trajets, 465 km, durée estimée par jour environ 9 h.\n\n"
+        "Merci de nous communiquer vos disponibilités et vos tarifs.\n\nCordialement,\n--------------\n"
+    ),
+    "en": (
+        "Hello,\n\nWe are looking for a bus with driver for the following transfers:\n\n"
+        "Details\nGroup: approx. 45 persons\nRoute: Paris → Lyon\nDistance: 465 km\n\n"
+        "Trips\n2025-10-12 – Departure 08:30\n2025-10-13 – Departure 17:00\n\n"
+        "Total: 2 trips, 465 km, estimated duration per day approx. 9 h.\n\n"
+        "Please send us your availability and quote.\n\nThank you in advance.\n--------------\n"
+    ),
+}
+
+GOLDEN_INCONNU = {
+    "de": "Guten Tag,\n\nwir suchen einen Bus mit Fahrer für folgende Transfers:\n\nDetails\n\nFahrten\n\n"
+          "Gesamt: 0 Fahrten.\n\nWir bitten um Ihr Verfügbarkeits- und Preisangebot.\n\n"
+          "Vielen Dank im Voraus.\n--------------\n",
+    "da": "Goddag,\n\nVi søger en bus med chauffør til følgende transporter:\n\nDetaljer\n\nTure\n\n"
+          "I alt: 0 ture.\n\nSend venligst jeres tilgængelighed og prisoverslag.\n\nPå forhånd tak.\n--------------\n",
+    "fr": "Bonjour,\n\nNous recherchons un bus avec chauffeur pour les trajets suivants :\n\nDétails\n\nTrajets\n\n"
+          "Total : 0 trajets.\n\nMerci de nous communiquer vos disponibilités et vos tarifs.\n\n"
+          "Cordialement,\n--------------\n",
+    "en": "Hello,\n\nWe are looking for a bus with driver for the following transfers:\n\nDetails\n\nTrips\n\n"
+          "Total: 0 trips.\n\nPlease send us your availability and quote.\n\nThank you in advance.\n--------------\n",
+}
+
+
+def test_golden_complet():
+    for lang, attendu in GOLDEN.items():
+        assert render_partner_email(lang, *COMPLET) == attendu, lang
+
+
+def test_golden_infos_inconnues():
+    for lang, attendu in GOLDEN_INCONNU.items():
+        assert render_partner_email(lang, *INCONNU) == attendu, lang
+
+
+def test_langue_inconnue_en_anglais():
+    assert render_partner_email("nl", *COMPLET) == GOLDEN["en"]
+    assert get_template("nl", default="fr").phrases["GREETING"] == "Bonjour,"
+
+
+def test_milliers_de_trajets():
+    fahrten = [(f"2025-10-{1 + i % 28:02d}", "08:30") for i in range(5000)]
+    debut = time.perf_counter()
+    texte = render_partner_email("de", 45, "Berlin", "N/A", fahrten, "N/A")
+    duree = time.perf_counter() - debut
+    assert texte.count(" – Abfahrt 08:30 Uhr\n") == 5000
+    assert "Gesamt: 5000 Fahrten." in texte
+    assert duree < 0.5
+
+
+def main():
+    print("🔍 Tests des gabarits d'emails partenaires...")
+    for test in (test_golden_complet, test_golden_infos_inconnues, test_langue_inconnue_en_anglais,
+                 test_milliers_de_trajets):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests de FetchJobScheduler: rattachement des demandes au fetch actif (y compris pendant une
+annulation), annulation d'un job en cours ou pas encore démarré, et job suivant après la fin.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import threading
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from fetch_jobs import FetchJobScheduler  # noqa: E402
+
+
+class FauxFetch:
+    """run_fn pilotable: démarre, attend `liberer`, puis s'arrête (annulé ou non)."""
+
+    def __init__(self):
+        self.demarre = threading.Event()
+        self.liberer = threading.Event()
+        self.appels = 0
+
+    def __call__(self, progress, cancel_event):
+        self.appels += 1
+        progress["total"] = 3
+        self.demarre.set()
+        self.liberer.wait(5)
+        progress["fetched"] = 1 if cancel_event.is_set() else 3
+        return progress["fetched"]
+
+
+def _attendre_fin(scheduler, job_id):
+    for _ in range(500):
+        job = scheduler.get(job_id)
+        if job["finished_at"]:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} non terminé")
+
+
+def test_rattachement_au_job_actif():
+    fetch = FauxFetch()
+    termines = []
+    scheduler = FetchJobScheduler(fetch, on_done=termines.append)
+    job, coalesced = scheduler.submit()
+    assert not coalesced
+    fetch.demarre.wait(5)
+    autre, coalesced = scheduler.submit()
+    assert coalesced and autre["id"] == job["id"] and autre["requests"] == 2
+    fetch.liberer.set()
+    fini = _attendre_fin(scheduler, job["id"])
+    assert fini["status"] == "done" and fini["progress"]["inserted"] == 3 and fini["requests"] == 2
+    assert fetch.appels == 1
+    assert termines[0]["status"] == "done"
+    # une fois terminé, une nouvelle demande lance un nouveau job
+    fetch.liberer.set()
+    suivant, coalesced = scheduler.submit()
+    assert not coalesced and suivant["id"] != job["id"]
+    _attendre_fin(scheduler, suivant["id"])
+
+
+def test_annulation_et_rattachement_pendant_annulation():
+    fetch = FauxFetch()
+    scheduler = FetchJobScheduler(fetch)
+    job, _ = scheduler.submit()
+    fetch.demarre.wait(5)
+    assert scheduler.cancel(job["id"])
+    assert scheduler.get(job["id"])["status"] == "cancelling"
+    # pas de second fetch tant que le premier n'est pas arrêté
+    autre, coalesced = scheduler.submit()
+    assert coalesced and autre["id"] == job["id"]
+    fetch.liberer.set()
+    fini = _attendre_fin(scheduler, job["id"])
+    assert fini["status"] == "cancelled" and fini["progress"]["inserted"] == 1
+    assert fetch.appels == 1
+    assert not scheduler.cancel(job["id"])
+    assert not scheduler.cancel("inconnu")
+
+
+def test_annule_avant_demarrage():
+    fetch = FauxFetch()
+    scheduler = FetchJobScheduler(fetch)
+    bloque = threading.Lock()
+    bloque.acquire()
+    demarrer = scheduler._run
+    # retarde le thread du job jusqu'à l'annulation
+    scheduler._run = lambda job_id: (bloque.acquire(), demarrer(job_id))
+    job, _ = scheduler.submit()
+    assert scheduler.cancel(job["id"])
+    bloque.release()
+    fini = _attendre_fin(scheduler, job["id"])
+    assert fini["status"] == "cancelled" and fini["started_at"] is None
+    assert fetch.appels == 0
+
+
+def main():
+    print("🔍 Tests de l'ordonnanceur des fetchs...")
+    for test in (test_rattachement_au_job_actif, test_annulation_et_rattachement_pendant_annulation,
+                 test_annule_avant_demarrage):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
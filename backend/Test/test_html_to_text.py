@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests d'équivalence du convertisseur HTML -> texte (html_text.html_to_text)
+avec l'ancienne cascade de re.sub de email_fetcher, recopiée ci-dessous.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import html as html_module
+import os
+import random
+import re
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from html_text import html_to_text  # noqa: E402
+
+
+def legacy_html_to_text(h):
+    """Implémentation d'origine (référence)."""
+    h = re.sub(r'</\s*(thead|tbody|tfoot)\s*>', '\n', h, flags=re.I)
+    h = re.sub(r'<\s*(thead|tbody|tfoot)[^>]*>', '', h, flags=re.I)
+    h = re.sub(r'</\s*tr\s*>', '\n', h, flags=re.I)
+    h = re.sub(r'<\s*tr[^>]*>', '', h, flags=re.I)
+    h = re.sub(r'</\s*t[dh]\s*>', ' | ', h, flags=re.I)
+    h = re.sub(r'<\s*t[dh][^>]*>', '', h, flags=re.I)
+    h = re.sub(r'<\s*br\s*/?>', '\n', h, flags=re.I)
+    h = re.sub(r'</\s*p\s*>', '\n\n', h, flags=re.I)
+    h = re.sub(r'</\s*div\s*>', '\n', h, flags=re.I)
+    h = re.sub(r'</\s*li\s*>', '\n', h, flags=re.I)
+    h = re.sub(r'<\s*li[^>]*>', '- ', h, flags=re.I)
+    h = re.sub(r'<script[\s\S]*?</script>', '', h, flags=re.I)
+    h = re.sub(r'<style[\s\S]*?</style>', '', h, flags=re.I)
+    h = re.sub(r'<[^>]+>', '', h)
+    h = re.sub(r'(\s*\|\s*){2,}', ' | ', h)
+    h = '\n'.join([ln.strip(' |\t ') for ln in h.splitlines()])
+    return html_module.unescape(h)
+
+
+FORMULAIRE_NL = (
+    "<html><head><style>td { padding: 4px; }</style></head><body>"
+    "<p>Nieuwe offerteaanvraag</p><table><thead><tr><th>Veld</th><th>Waarde</th></tr></thead><tbody>"
+    "<tr><td>Naam</td><td>Jan de Vries</td></tr>"
+    "<tr><td>E-mailadres</td><td>jan@example.nl</td></tr>"
+    "<tr><td>Vertrekdatum</td><td>12-10-2025</td></tr>"
+    "<tr><td class=\"l\">Hoeveel reizigers?</td><td>10 - 20 personen</td></tr>"
+    "</tbody></table></body></html>"
+)
+
+EMAIL_FR = (
+    "<div>Bonjour,<br>Nous sommes <b>45&nbsp;personnes</b> &amp; cherchons un autocar.<br/>"
+    "</div><div><ul><li>Départ : Paris</li><li class=\"x\">Arrivée : Lyon</li></ul></div>"
+    "<p>Merci d&#39;avance,</p><p>Jean</p>"
+)
+
+FRAGMENTS = [
+    "<tr>", "</tr>", "<td>", "</td>", "<th class=x>", "</th>", "<TD>", "</TD >", "<br>", "<br/>", "<BR />",
+    "<p>", "</p>", "</P>", "<div>", "</div>", "<li>", "</li>", "<LI class=a>", "<ul>", "<thead>", "</tbody>",
+    "<span>", "</span>", "<b>", "<a href=\"x\">", "</a>", "<img src=\"a.png\"/>", "<!-- commentaire -->",
+    "<script>var x = 1;</script>", "<style>p { color: red }</style>",
+    "a", "Nom", "Jean Dupont", "&amp;", "&nbsp;", "&#233;", " ", "  ", "\n", "\t", "|", " | ", "x: y",
+]
+
+
+def test_formulaire_tableau():
+    texte = html_to_text(FORMULAIRE_NL)
+    assert "Naam | Jan de Vries" in texte
+    assert "Hoeveel reizigers? | 10 - 20 personen" in texte
+    assert texte == legacy_html_to_text(FORMULAIRE_NL)
+
+
+def test_email_paragraphes_listes():
+    texte = html_to_text(EMAIL_FR)
+    assert "- Départ : Paris" in texte
+    assert "45\xa0personnes & cherchons" in texte
+    assert texte == legacy_html_to_text(EMAIL_FR)
+
+
+def test_equivalence_fragments_aleatoires():
+    rnd = random.Random(17)
+    for _ in range(5000):
+        h = "".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, 30)))
+        assert html_to_text(h) == legacy_html_to_text(h), h
+
+
+def test_ecarts_voulus():
+    # <link> n'est plus pris pour un item de liste, <br> avec attributs donne un saut de ligne
+    assert html_to_text('<link rel="stylesheet" href="a.css">Bonjour') == "Bonjour"
+    assert html_to_text('a<br class="x">b') == "a\nb"
+    # le contenu des scripts n'est jamais interprété, même s'il contient du balisage
+    assert html_to_text("<script>document.write('</div><li>')</script>Texte") == "Texte"
+
+
+def main():
+    print("🔍 Tests d'équivalence html_to_text...")
+    for test in (test_formulaire_tableau, test_email_paragraphes_listes,
+                 test_equivalence_fragments_aleatoires, test_ecarts_voulus):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
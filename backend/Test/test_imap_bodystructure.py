@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests du mode IMAP_FETCH_MODE=parts: analyse de BODYSTRUCTURE (_parse_sexp, _text_sections) sur des
+structures multipart/alternative, imbriquées, avec pièces jointes seules, encodages base64/QP et
+charsets; message recomposé décodable; messages générés dans l'ordre des UID, None si non récupérés.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import base64
+import os
+import quopri
+import re
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import email_fetcher  # noqa: E402
+
+TEXTE = b'("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 120 5 NIL NIL NIL)'
+ALTERNATIVE = (b'(("TEXT" "PLAIN" ("CHARSET" "iso-8859-1") NIL NIL "QUOTED-PRINTABLE" 100 4 NIL NIL NIL)'
+               b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "BASE64" 300 4 NIL NIL NIL)'
+               b' "ALTERNATIVE" ("BOUNDARY" "alt") NIL NIL)')
+PDF = b'("APPLICATION" "PDF" ("NAME" "devis.pdf") NIL NIL "BASE64" 5000 NIL ("ATTACHMENT" ("FILENAME" "devis.pdf")) NIL)'
+TEXTE_JOINT = (b'("TEXT" "PLAIN" ("CHARSET" "utf-8" "NAME" "notes.txt") NIL NIL "BASE64" 10 1 NIL '
+               b'("ATTACHMENT" ("FILENAME" "notes.txt")) NIL)')
+IMBRIQUE = b"(" + ALTERNATIVE + PDF + TEXTE_JOINT + b' "MIXED" ("BOUNDARY" "mix") NIL NIL)'
+PIECES_JOINTES_SEULES = b"(" + PDF + b' "MIXED" ("BOUNDARY" "mix") NIL NIL)'
+
+
+def _sections(bs: bytes):
+    return email_fetcher._text_sections(email_fetcher._parse_sexp(bs)[0])
+
+
+def test_parse_sexp():
+    assert email_fetcher._parse_sexp(b'(UID 12 FLAGS (\\Seen) X "a \\"b\\"" NIL)') == [
+        ["UID", "12", "FLAGS", ["\\Seen"], "X", 'a "b"', None]
+    ]
+    arbre = email_fetcher._parse_sexp(ALTERNATIVE)[0]
+    assert [p[1] for p in arbre[:2]] == ["PLAIN", "HTML"] and arbre[2] == "ALTERNATIVE"
+
+
+def test_text_sections():
+    assert _sections(TEXTE) == [("1", "text/plain", {"charset": "UTF-8"}, "7BIT")]
+    assert _sections(ALTERNATIVE) == [
+        ("1", "text/plain", {"charset": "iso-8859-1"}, "QUOTED-PRINTABLE"),
+        ("2", "text/html", {"charset": "utf-8"}, "BASE64"),
+    ]
+    # imbriqué: parties de l'alternative numérotées 1.1 et 1.2, pièces jointes (même text/plain) ignorées
+    assert [(s, t) for s, t, _, _ in _sections(IMBRIQUE)] == [("1.1", "text/plain"), ("1.2", "text/html")]
+    assert _sections(PIECES_JOINTES_SEULES) == []
+
+
+def test_message_recompose_decodable():
+    texte = "Bonjour, départ de Créteil le 12/10 pour 40 personnes, merci de votre devis rapide."
+    parts = [
+        ("text/plain", {"charset": "iso-8859-1"}, "quoted-printable", quopri.encodestring(texte.encode("latin-1"))),
+        ("text/html", {"charset": "utf-8"}, "base64",
+         base64.encodebytes(f"<p>{texte}</p>".encode("utf-8"))),
+    ]
+    brut = email_fetcher._build_text_message(b"From: Jean <jean@exemple.fr>\r\nSubject: Devis\r\n", parts)
+    corps, expediteur, sujet = email_fetcher._decode_message(brut)
+    assert "Créteil" in corps and "40 personnes" in corps
+    assert (expediteur, sujet) == ("jean@exemple.fr", "Devis")
+
+
+class FauxImapParties:
+    """Répond aux UID FETCH du mode parts dans l'ordre inverse des UID demandés (comme un serveur peut le faire)."""
+
+    def __init__(self, structures, corps):
+        self.structures = structures  # {uid: BODYSTRUCTURE}
+        self.corps = corps  # {uid: {section: octets}}
+        self.echec_bodystructure = False
+
+    def uid(self, command, uids, items):
+        uids = [int(u) for u in uids.split(",")]
+        data = []
+        if items == "(BODYSTRUCTURE)":
+            if self.echec_bodystructure:
+                return "NO", [None]
+            for n, u in enumerate(reversed(uids), 1):
+                if u in self.structures:
+                    data.append(f"{n} (UID {u} BODYSTRUCTURE ".encode() + self.structures[u] + b")")
+            return "OK", data
+        sections = re.findall(r"BODY\.PEEK\[([^\]]*)\]", items)
+        for n, u in enumerate(reversed(uids), 1):
+            entete = f"From: client{u}@exemple.fr\r\nSubject: Demande {u}\r\n\r\n".encode()
+            reponse = [(f"{n} (UID {u} BODY[HEADER.FIELDS (FROM SUBJECT)] {{{len(entete)}}}".encode(), entete)]
+            for sec in sections[1:]:
+                contenu = self.corps[u][sec]
+                reponse.append((f" BODY[{sec}]<0> {{{len(contenu)}}}".encode(), contenu))
+            data += reponse + [b")"]
+        return "OK", data
+
+
+def test_ordre_des_uid_et_echecs():
+    mail = FauxImapParties(
+        {10: TEXTE, 11: ALTERNATIVE, 13: TEXTE},  # 12: absent de la réponse BODYSTRUCTURE
+        {10: {"1": b"m10"}, 11: {"1": b"m11", "2": base64.encodebytes(b"<b>m11</b>")}, 13: {"1": b"m13"}},
+    )
+    generes = list(email_fetcher._fetch_text_batches(mail, [10, 11, 12, 13], 25))
+    assert [u for u, _ in generes] == [10, 11, 12, 13]
+    assert generes[2][1] is None
+    assert all(b"Subject: Demande" in brut for u, brut in generes if u != 12)
+    assert "m11" in email_fetcher._decode_message(generes[1][1])[0]
+    # lot dont le FETCH BODYSTRUCTURE échoue: tous ses messages sont générés avec None
+    mail.echec_bodystructure = True
+    assert list(email_fetcher._fetch_text_batches(mail, [10, 11, 13], 2)) == [(10, None), (11, None), (13, None)]
+
+
+def main():
+    print("🔍 Tests de BODYSTRUCTURE et du fetch des parties texte...")
+    for test in (test_parse_sexp, test_text_sections, test_message_recompose_decodable, test_ordre_des_uid_et_echecs):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
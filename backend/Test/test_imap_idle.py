@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests de _idle_wait sur une paire de sockets: notification déjà présente dans le tampon de lecture
+(arrivée avec la continuation "+"), expiration sans nouveau message, et connexion fermée pendant
+IDLE (aucun DONE envoyé).
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import socket
+import sys
+import threading
+import time
+import imaplib
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import base_temporaire  # noqa: E402
+
+
+class FauxMail:
+    """Ce qu'utilise _idle_wait d'imaplib.IMAP4: sock, file, readline, send, _new_tag."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.settimeout(5)
+        self.file = sock.makefile("rb")
+        self.envoye = []
+
+    def _new_tag(self):
+        return b"A001"
+
+    def readline(self):
+        return self.file.readline()
+
+    def send(self, data):
+        self.envoye.append(data)
+        self.sock.sendall(data)
+
+
+def _serveur(script):
+    """Démarre un faux serveur: script(fichier, socket) s'exécute dans un thread."""
+    client, serveur = socket.socketpair()
+    fichier = serveur.makefile("rb")
+    thread = threading.Thread(target=script, args=(fichier, serveur), daemon=True)
+    thread.start()
+    return FauxMail(client), thread
+
+
+def _import_fetcher():
+    base_temporaire()
+    import email_fetcher
+    return email_fetcher
+
+
+def test_notification_deja_tamponnee():
+    email_fetcher = _import_fetcher()
+
+    def script(fichier, serveur):
+        assert fichier.readline() == b"A001 IDLE\r\n"
+        # continuation et notification dans le même paquet: la seconde ligne reste dans le tampon
+        serveur.sendall(b"+ idling\r\n* 3 EXISTS\r\n")
+        assert fichier.readline() == b"DONE\r\n"
+        serveur.sendall(b"A001 OK IDLE terminated\r\n")
+    mail, thread = _serveur(script)
+    debut = time.monotonic()
+    assert email_fetcher._idle_wait(mail, 30, threading.Event()) is True
+    assert time.monotonic() - debut < 2
+    thread.join(2)
+    assert mail.envoye == [b"A001 IDLE\r\n", b"DONE\r\n"]
+
+
+def test_expiration_sans_message():
+    email_fetcher = _import_fetcher()
+
+    def script(fichier, serveur):
+        fichier.readline()
+        serveur.sendall(b"+ idling\r\n")
+        assert fichier.readline() == b"DONE\r\n"
+        serveur.sendall(b"* 1 RECENT\r\nA001 OK IDLE terminated\r\n")
+    mail, thread = _serveur(script)
+    assert email_fetcher._idle_wait(mail, 0.3, threading.Event()) is False
+    thread.join(2)
+    assert mail.envoye[-1] == b"DONE\r\n"
+
+
+def test_connexion_fermee_pendant_idle():
+    email_fetcher = _import_fetcher()
+
+    def script(fichier, serveur):
+        fichier.readline()
+        serveur.sendall(b"+ idling\r\n")
+        serveur.close()
+    mail, thread = _serveur(script)
+    try:
+        email_fetcher._idle_wait(mail, 30, threading.Event())
+        assert False, "abort attendu"
+    except imaplib.IMAP4.abort:
+        pass
+    thread.join(2)
+    assert mail.envoye == [b"A001 IDLE\r\n"]
+
+
+def test_idle_refuse():
+    email_fetcher = _import_fetcher()
+
+    def script(fichier, serveur):
+        fichier.readline()
+        serveur.sendall(b"A001 BAD IDLE non supporte\r\n")
+    mail, thread = _serveur(script)
+    try:
+        email_fetcher._idle_wait(mail, 30, threading.Event())
+        assert False, "abort attendu"
+    except imaplib.IMAP4.abort:
+        pass
+    assert mail.envoye == [b"A001 IDLE\r\n"]
+
+
+def main():
+    print("🔍 Tests de l'attente IMAP IDLE...")
+    for test in (test_notification_deja_tamponnee, test_expiration_sans_message,
+                 test_connexion_fermee_pendant_idle, test_idle_refuse):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
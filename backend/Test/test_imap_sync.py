@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests de la synchronisation IMAP incrémentale (sync_mailbox) sur un faux serveur: un message en
+échec ne bloque pas le point de reprise, il est retenté puis abandonné après IMAP_MAX_ATTEMPTS,
+les messages déjà traités ne sont jamais réinsérés et l'échec d'un message n'entraîne pas celui
+des autres messages de son lot (NLP seul ou repli NLP après l'IA). Les réponses FETCH dont l'UID
+suit le littéral RFC822 sont reconnues.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import re
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import Remplacements, base_temporaire  # noqa: E402
+
+
+class FauxImap:
+    """Boîte IMAP minimale: SELECT (UIDVALIDITY/UIDNEXT), UID SEARCH, UID FETCH (RFC822), UID STORE."""
+
+    def __init__(self, messages, uidvalidity=7):
+        self.messages = messages  # {uid: corps}
+        self.uidvalidity = uidvalidity
+        self.absents = set()  # UID jamais renvoyés par FETCH
+        self.uid_apres_litteral = False  # b'1 (RFC822 {n}', contenu, b' UID 10)' au lieu de b'1 (UID 10 RFC822 {n}'
+        self.vus = set()
+
+    def select(self, mailbox):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        if code == "UIDVALIDITY":
+            return code, [str(self.uidvalidity).encode()]
+        return code, [str(max(self.messages) + 1).encode()]
+
+    def uid(self, command, *args):
+        if command == "SEARCH":
+            critere = args[-1]
+            if critere == "UNSEEN":
+                uids = [u for u in self.messages if u not in self.vus]
+            else:
+                debut = int(re.match(r"UID (\d+):\*", critere).group(1))
+                uids = [u for u in self.messages if u >= debut] or [max(self.messages)]
+            return "OK", [" ".join(str(u) for u in sorted(uids)).encode()]
+        if command == "FETCH":
+            data = []
+            for n, u in enumerate(int(x) for x in args[0].split(",")):
+                if u in self.messages and u not in self.absents:
+                    brut = (f"From: client{u}@exemple.fr\r\nSubject: Demande {u}\r\n\r\n"
+                            f"{self.messages[u]}\r\n").encode()
+                    if self.uid_apres_litteral:
+                        data += [(f"{n + 1} (RFC822 {{{len(brut)}}}".encode(), brut), f" UID {u})".encode()]
+                    else:
+                        data += [(f"{n + 1} (UID {u} RFC822 {{{len(brut)}}}".encode(), brut), b")"]
+            return "OK", data
+        if command == "STORE":
+            self.vus.update(int(x) for x in args[0].split(","))
+            return "OK", []
+        raise AssertionError(command)
+
+
+class FauxParser:
+    """Remplace nlp_parser: une demande par corps, échec sur les corps listés dans `echecs`."""
+    PARSER_VERSION = "test"
+    SPACY_MODELS = {}
+
+    def __init__(self):
+        self.echecs = set()
+
+    def extraire_infos_batch(self, corps):
+        # échec de tout l'appel groupé, comme une exception non isolée par message
+        for c in corps:
+            if c.strip() in self.echecs:
+                raise RuntimeError(f"extraction impossible: {c.strip()}")
+        return [[{"nom": c.strip(), "ville": "Paris", "infos_libres": ""}] for c in corps]
+
+
+def _preparer(monkeypatch):
+    base = base_temporaire()
+    import email_fetcher
+    parser = FauxParser()
+    monkeypatch.setattr(email_fetcher, "_nlp_parser", lambda: parser)
+    monkeypatch.setattr(email_fetcher, "_ai_enabled", lambda: False)
+    monkeypatch.setattr(email_fetcher, "PARSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(email_fetcher, "IMAP_SYNC_MODE", "uid")
+    monkeypatch.setattr(email_fetcher, "IMAP_FETCH_MODE", "rfc822")
+    # un message par tâche: l'échec d'un message n'entraîne pas celui des autres
+    monkeypatch.setattr(email_fetcher, "FETCH_NLP_BATCH", 1)
+    return base, email_fetcher, parser
+
+
+def _noms(base):
+    return sorted(r[0] for r in base.conn.execute("SELECT nom FROM demandes"))
+
+
+def test_echec_puis_reprise_sans_reinsertion(monkeypatch):
+    base, email_fetcher, parser = _preparer(monkeypatch)
+    # premier passage: point de reprise posé sur la boîte existante
+    mail = FauxImap({5: "ancien"})
+    email_fetcher.sync_mailbox(mail)
+    mail.messages.update({10: "m10", 11: "m11", 12: "m12"})
+    parser.echecs = {"m11"}
+    assert email_fetcher.sync_mailbox(mail) == 2
+    assert base.get_sync_checkpoint("inbox") == (7, 12)
+    assert base.get_sync_failures("inbox", 7) == {11: 1}
+    parser.echecs = set()
+    assert email_fetcher.sync_mailbox(mail) == 1
+    assert _noms(base) == ["ancien", "m10", "m11", "m12"]
+    assert base.get_sync_failures("inbox", 7) == {}
+    assert mail.vus == {5, 10, 11, 12}
+    # plus rien à faire
+    assert email_fetcher.sync_mailbox(mail) == 0
+
+
+def test_message_abandonne_apres_max_tentatives(monkeypatch):
+    base, email_fetcher, parser = _preparer(monkeypatch)
+    monkeypatch.setattr(email_fetcher, "IMAP_MAX_ATTEMPTS", 3)
+    mail = FauxImap({5: "ancien"})
+    email_fetcher.sync_mailbox(mail)
+    mail.messages.update({10: "m10", 11: "m11"})
+    mail.absents = {10}
+    for _ in range(5):
+        email_fetcher.sync_mailbox(mail)
+    assert base.get_sync_failures("inbox", 7) == {10: 3}
+    assert base.get_sync_checkpoint("inbox") == (7, 11)
+    assert _noms(base) == ["ancien", "m11"]
+    # UIDVALIDITY changé: les échecs de l'ancienne numérotation sont oubliés
+    mail.uidvalidity = 8
+    email_fetcher.sync_mailbox(mail)
+    assert base.conn.execute("SELECT uidvalidity, uid, tentatives FROM imap_echecs").fetchall() == [(8, 10, 1)]
+
+
+def test_echec_isole_dans_son_lot(monkeypatch):
+    base, email_fetcher, parser = _preparer(monkeypatch)
+    monkeypatch.setattr(email_fetcher, "FETCH_NLP_BATCH", 16)
+    mail = FauxImap({5: "ancien"})
+    email_fetcher.sync_mailbox(mail)
+    mail.messages.update({10: "m10", 11: "m11", 12: "m12", 13: "m13"})
+    parser.echecs = {"m11"}
+    assert email_fetcher.sync_mailbox(mail) == 3
+    assert _noms(base) == ["ancien", "m10", "m12", "m13"]
+    assert base.get_sync_failures("inbox", 7) == {11: 1}
+    assert mail.vus == {5, 10, 12, 13}
+
+
+def test_repli_nlp_isole_dans_son_lot(monkeypatch):
+    base, email_fetcher, parser = _preparer(monkeypatch)
+    monkeypatch.setattr(email_fetcher, "FETCH_AI_BATCH", 16)
+    mail = FauxImap({5: "ancien"})
+    email_fetcher.sync_mailbox(mail)
+
+    def extraire_ia(corps):
+        return [RuntimeError("LLM indisponible") if c.strip() in ("m11", "m12")
+                else [{"nom": f"ia-{c.strip()}", "ville": "Paris", "infos_libres": ""}] for c in corps]
+    monkeypatch.setattr(email_fetcher, "_ai_enabled", lambda: True)
+    monkeypatch.setattr(email_fetcher, "extraire_infos_ai_many", extraire_ia)
+    mail.messages.update({10: "m10", 11: "m11", 12: "m12", 13: "m13"})
+    # m11 échoue avec l'IA puis avec le NLP; m12 est repris par le NLP
+    parser.echecs = {"m11"}
+    assert email_fetcher.sync_mailbox(mail) == 3
+    assert _noms(base) == ["ancien", "ia-m10", "ia-m13", "m12"]
+    assert base.get_sync_failures("inbox", 7) == {11: 1}
+
+
+def test_uid_apres_le_litteral(monkeypatch):
+    base, email_fetcher, parser = _preparer(monkeypatch)
+    mail = FauxImap({5: "ancien"})
+    mail.uid_apres_litteral = True
+    email_fetcher.sync_mailbox(mail)
+    mail.messages.update({10: "m10", 11: "m11", 12: "m12"})
+    brut = email_fetcher._fetch_raw(mail, [10, 11, 12])
+    assert sorted(brut) == [10, 11, 12] and b"m11" in brut[11]
+    assert email_fetcher.sync_mailbox(mail) == 3
+    assert _noms(base) == ["ancien", "m10", "m11", "m12"]
+    assert base.get_sync_failures("inbox", 7) == {}
+
+
+def main():
+    print("🔍 Tests de la synchronisation IMAP incrémentale...")
+    for test in (test_echec_puis_reprise_sans_reinsertion, test_message_abandonne_apres_max_tentatives,
+                 test_echec_isole_dans_son_lot, test_repli_nlp_isole_dans_son_lot, test_uid_apres_le_litteral):
+        patch = Remplacements()
+        try:
+            test(patch)
+        finally:
+            patch.undo()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
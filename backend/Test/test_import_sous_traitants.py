@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests de l'import Excel des sous-traitants (POST /sous-traitants/upload): l'import vectorisé donne les
+mêmes erreurs, le même nombre d'insertions et le même contenu de table que l'ancien import ligne par
+ligne (champs vides, espaces, emails en double dans le fichier ou déjà en base), et INSERT OR IGNORE
+ne compte que les lignes réellement insérées.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import io
+import os
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import pandas as pd  # noqa: E402
+from outils_test import base_temporaire  # noqa: E402
+
+COLONNES = ['Nom entreprise', 'Site internet', 'Pays', 'Ville', 'Email', 'Téléphone']
+NA = float("nan")
+LIGNES = [
+    ("Cars Alpha", "alpha.fr", "France", "Paris", "alpha@exemple.fr", 612345678),
+    ("Cars Bêta", NA, "France", "Lyon", NA, 611111111),  # email vide
+    ("  Cars Gamma ", "gamma.fr", "Belgique", " Bruxelles", "  gamma@exemple.fr  ", NA),
+    ("Cars Alpha bis", NA, "France", "Paris", "alpha@exemple.fr", 699999999),  # doublon dans le fichier
+    ("Déjà là", NA, "France", "Nice", "existant@exemple.fr", NA),  # déjà en base
+    ("Cars Delta", NA, "France", "   ", "delta@exemple.fr", NA),  # ville vide après nettoyage
+    ("Cars Epsilon", NA, NA, "Lille", "epsilon@exemple.fr", NA),
+    ("Cars Gamma bis", NA, "Belgique", "Liège", "gamma@exemple.fr ", NA),  # doublon après nettoyage
+    (NA, "zeta.fr", "France", "Lyon", "zeta@exemple.fr", NA),  # nom vide
+]
+
+
+def _fichier_excel():
+    flux = io.BytesIO()
+    pd.DataFrame(LIGNES, columns=COLONNES).to_excel(flux, index=False)
+    flux.seek(0)
+    return flux
+
+
+def _base_avec_existant():
+    base = base_temporaire()
+    base.conn.execute("INSERT INTO sous_traitants (nom_entreprise, ville, email) "
+                      "VALUES ('Existant', 'Nice', 'existant@exemple.fr')")
+    base.conn.commit()
+    return base
+
+
+def _contenu(base):
+    return base.conn.execute("SELECT nom_entreprise, site_internet, pays, ville, email, telephone "
+                             "FROM sous_traitants ORDER BY id").fetchall()
+
+
+def _import_ligne_par_ligne(df, conn):
+    """Référence: l'import d'origine, une requête SELECT puis INSERT par ligne du fichier."""
+    c = conn.cursor()
+    successful_inserts = 0
+    errors = []
+    for index, row in df.iterrows():
+        nom_entreprise = str(row['Nom entreprise']).strip() if pd.notna(row['Nom entreprise']) else ""
+        site_internet = str(row['Site internet']).strip() if pd.notna(row['Site internet']) else ""
+        pays = str(row['Pays']).strip() if pd.notna(row['Pays']) else ""
+        ville = str(row['Ville']).strip() if pd.notna(row['Ville']) else ""
+        email = str(row['Email']).strip() if pd.notna(row['Email']) else ""
+        telephone = str(row['Téléphone']).strip() if pd.notna(row['Téléphone']) else ""
+        if not nom_entreprise or not email or not ville:
+            errors.append(f"Ligne {index + 2}: Nom entreprise, Email et Ville sont obligatoires")
+            continue
+        c.execute("SELECT id FROM sous_traitants WHERE email = ?", (email,))
+        if c.fetchone():
+            errors.append(f"Ligne {index + 2}: Email {email} existe déjà")
+            continue
+        c.execute("""INSERT INTO sous_traitants
+                     (nom_entreprise, site_internet, pays, ville, email, telephone)
+                     VALUES (?, ?, ?, ?, ?, ?)""",
+                  (nom_entreprise, site_internet, pays, ville, email, telephone))
+        successful_inserts += 1
+    conn.commit()
+    c.close()
+    return successful_inserts, errors
+
+
+def test_import_identique_a_la_reference():
+    base = _base_avec_existant()
+    import app as app_module
+    client = app_module.app.test_client()
+    reponse = client.post("/sous-traitants/upload", data={"file": (_fichier_excel(), "partenaires.xlsx")},
+                          content_type="multipart/form-data")
+    assert reponse.status_code == 200, reponse.get_json()
+    resultat = reponse.get_json()
+    contenu = _contenu(base)
+
+    reference = _base_avec_existant()
+    inseres, erreurs = _import_ligne_par_ligne(pd.read_excel(_fichier_excel()), reference.conn)
+    assert (resultat["sous_traitants_ajoutes"], resultat["erreurs"]) == (inseres, erreurs)
+    assert resultat["total_lignes"] == len(LIGNES)
+    assert contenu == _contenu(reference)
+    assert inseres == 3 and len(erreurs) == 6
+    assert [r[4] for r in contenu] == ["existant@exemple.fr", "alpha@exemple.fr", "gamma@exemple.fr",
+                                       "epsilon@exemple.fr"]
+
+    # même fichier réimporté: tout est déjà en base
+    reponse = client.post("/sous-traitants/upload", data={"file": (_fichier_excel(), "partenaires.xlsx")},
+                          content_type="multipart/form-data")
+    assert reponse.get_json()["sous_traitants_ajoutes"] == 0
+    assert _contenu(base) == contenu
+
+
+def test_insert_or_ignore_compte_les_insertions():
+    base = _base_avec_existant()
+    lignes = [("Nouveau", "", "France", "Paris", "nouveau@exemple.fr", ""),
+              ("Existant bis", "", "France", "Nice", "existant@exemple.fr", "")]
+    # l'email déjà présent est écarté par l'index unique: une seule ligne comptée
+    assert base.insert_sous_traitants_bulk(lignes) == 1
+    assert base.insert_sous_traitants_bulk(lignes) == 0
+    assert base.existing_sous_traitant_emails(["nouveau@exemple.fr", "inconnu@exemple.fr", ""],
+                                              chunk_size=1) == {"nouveau@exemple.fr"}
+    assert len(_contenu(base)) == 2
+
+
+def main():
+    print("🔍 Tests de l'import des sous-traitants...")
+    for test in (test_import_identique_a_la_reference, test_insert_or_ignore_compte_les_insertions):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests de la détection de langue: listes de mots-outils sans mot commun à deux langues, et
+échantillons étiquetés FR/EN/DA/NL pour _preclassify et detect_language.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+from itertools import combinations
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import nlp_parser  # noqa: E402
+
+ECHANTILLONS = {
+    "fr": [
+        "Demande de devis de Paris à Lyon pour 30 personnes, aller et retour.",
+        "Bonjour, nous cherchons un autocar pour notre groupe de 45 personnes.",
+        "Merci de nous envoyer votre meilleur prix, cordialement.",
+    ],
+    "en": [
+        "Hello, we need a coach for 30 people from London to Oxford.",
+        "Could you please send us a quote for our trip? Kind regards",
+        "Dear team, thank you for the quick reply.",
+    ],
+    "da": [
+        "Hej, vi er 8 voksne og skal bruge en bus fra København til Aarhus.",
+        "Vi vil gerne have et tilbud på en rejse for jeres firma. Mvh Lars",
+        "Tak for hjælpen, venlig hilsen",
+    ],
+    "nl": [
+        "Goedemiddag, wij zoeken vervoer voor 25 personen op 3 december, heen en terug.",
+        "Graag ontvangen wij een offerte voor onze reis naar Parijs.",
+        "Met vriendelijke groeten, ik ben bereikbaar op mijn telefoon.",
+    ],
+}
+
+# Mots courants dans plusieurs des langues traitées: ils ne doivent compter pour aucune
+AMBIGUS = {"de", "du", "et", "er", "is", "in", "we", "of", "to", "for", "have", "je", "pas", "van", "met", "af",
+           "on", "op", "den", "til", "hallo"}
+
+
+def test_listes_sans_mot_commun():
+    for (l1, w1), (l2, w2) in combinations(nlp_parser._STOPWORDS.items(), 2):
+        assert not (w1 & w2), (l1, l2, w1 & w2)
+    tous = set().union(*nlp_parser._STOPWORDS.values())
+    assert not (tous & AMBIGUS), tous & AMBIGUS
+
+
+def test_preclassify_echantillons():
+    for langue, textes in ECHANTILLONS.items():
+        for texte in textes:
+            assert nlp_parser._preclassify(texte) == (langue, True), (langue, texte, nlp_parser._preclassify(texte))
+
+
+def test_detect_language_echantillons():
+    for langue, textes in ECHANTILLONS.items():
+        for texte in textes:
+            # pas de modèle spaCy néerlandais: le néerlandais est traité avec le modèle fr
+            attendu = "fr" if langue == "nl" else langue
+            assert nlp_parser.detect_language(texte) == attendu, (langue, texte)
+
+
+def test_demande_francaise_avec_de_repete():
+    best, sure = nlp_parser._preclassify("Demande de devis de Paris à Lyon de 40 places, départ de la gare")
+    assert best == "fr" and sure
+    assert nlp_parser._block_language("Demande de devis de Paris à Lyon", "en") != "nl"
+
+
+def main():
+    print("🔍 Tests de la détection de langue...")
+    for test in (test_listes_sans_mot_commun, test_preclassify_echantillons, test_detect_language_echantillons,
+                 test_demande_francaise_avec_de_repete):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests de MailerService avec une fausse connexion SMTP: les statuts des messages en file, en cours
+d'envoi ou attendus par wait() ne sont jamais oubliés au-delà de MAIL_STATUS_KEEP, annulation d'un
+message encore en file et wait() borné par son timeout.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import threading
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import Remplacements  # noqa: E402
+import mailer  # noqa: E402
+
+
+class FausseConnexion:
+    """Remplace SmtpConnection: chaque envoi attend que `ouvert` soit levé."""
+
+    def __init__(self):
+        self.server = None
+        self.ouvert = threading.Event()
+        self.en_envoi = threading.Event()
+        self.envoyes = []
+
+    def sendmail(self, recipients, message):
+        self.en_envoi.set()
+        self.ouvert.wait(5)
+        self.envoyes.append(list(recipients))
+
+    def close(self):
+        pass
+
+
+def _service():
+    service = mailer.MailerService(maxsize=10)
+    service.connection = FausseConnexion()
+    return service
+
+
+def _attendre(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition non atteinte")
+
+
+def test_statuts_en_attente_jamais_oublies(monkeypatch):
+    monkeypatch.setattr(mailer, "MAIL_STATUS_KEEP", 1)
+    service = _service()
+    ids = [service.submit([f"p{i}@exemple.fr"], f"Sujet {i}", "Corps") for i in range(3)]
+    service.connection.en_envoi.wait(5)
+    # un message en cours d'envoi et deux en file: aucun n'est oublié malgré MAIL_STATUS_KEEP=1
+    assert [service.status(i)["status"] for i in ids] == ["sending", "queued", "queued"]
+    resultats = {}
+    attente = threading.Thread(target=lambda: resultats.update(service.wait(ids[0], timeout=5)))
+    attente.start()
+    _attendre(lambda: service._waiters.get(ids[0]))
+    service.connection.ouvert.set()
+    service.queue.join()
+    attente.join(5)
+    assert resultats["id"] == ids[0] and resultats["status"] == "sent"
+    # plus personne n'attend: seul le plus récent est conservé
+    assert list(service._statuses) == [ids[2]] and list(service._events) == [ids[2]]
+    assert service._waiters == {}
+
+
+def test_annulation_en_file():
+    service = _service()
+    premier = service.submit(["a@exemple.fr"], "Premier", "Corps")
+    second = service.submit(["b@exemple.fr"], "Second", "Corps")
+    service.connection.en_envoi.wait(5)
+    assert not service.cancel(premier)  # déjà pris par le worker
+    assert service.cancel(second)
+    assert service.wait(second, timeout=1)["status"] == "cancelled"
+    service.connection.ouvert.set()
+    service.queue.join()
+    assert service.status(premier)["status"] == "sent"
+    assert service.status(second)["status"] == "cancelled"
+    assert service.connection.envoyes == [["a@exemple.fr"]]
+    assert not service.cancel(second) and not service.cancel(999)
+
+
+def test_wait_borne_par_timeout():
+    service = _service()
+    msg_id = service.submit(["a@exemple.fr"], "Sujet", "Corps")
+    debut = time.monotonic()
+    assert service.wait(msg_id, timeout=0.1)["status"] in ("queued", "sending")
+    assert time.monotonic() - debut < 2
+    assert service._waiters == {}
+    service.connection.ouvert.set()
+    assert service.wait(msg_id, timeout=5)["status"] == "sent"
+    assert service.wait(12345) == {}
+
+
+def main():
+    print("🔍 Tests du service d'envoi des emails...")
+    patch = Remplacements()
+    try:
+        test_statuts_en_attente_jamais_oublies(patch)
+    finally:
+        patch.undo()
+    print(f"✅ {test_statuts_en_attente_jamais_oublies.__name__}")
+    for test in (test_annulation_en_file, test_wait_borne_par_timeout):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests du chargement des modèles spaCy depuis plusieurs threads: un seul chargement par langue,
+extraire_infos_batch utilisable en parallèle, et un email en échec isolé des autres emails du lot.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import threading
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import nlp_parser  # noqa: E402
+from outils_test import Remplacements  # noqa: E402
+
+
+def test_chargement_unique_en_concurrence(monkeypatch):
+    chargements = []
+
+    def charger_lentement(nom, exclude=None):
+        chargements.append(nom)
+        time.sleep(0.2)
+        return nlp_parser.spacy.blank("en")
+    monkeypatch.setattr(nlp_parser.spacy, "load", charger_lentement)
+    monkeypatch.setattr(nlp_parser, "_NLP_CACHE", {"fr": None, "en": None, "da": None})
+    resultats = []
+    threads = [threading.Thread(target=lambda: resultats.append(nlp_parser._load_spacy("en"))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert chargements == ["en_core_web_sm"]
+    assert len(resultats) == 6 and all(r is resultats[0] for r in resultats)
+
+
+def test_extraction_parallele():
+    textes = ["Bonjour, nous sommes 40 personnes et cherchons un autocar de Paris à Lyon le 12/03/2030.",
+              "Hello, we need a coach for 25 people from London to Oxford on 14/05/2030."]
+    attendu = nlp_parser.extraire_infos_batch(textes)
+    resultats, erreurs = [], []
+
+    def extraire():
+        try:
+            resultats.append(nlp_parser.extraire_infos_batch(textes))
+        except Exception as e:
+            erreurs.append(e)
+    threads = [threading.Thread(target=extraire) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erreurs
+    assert all(r == attendu for r in resultats)
+
+
+def test_echec_isole_par_email(monkeypatch):
+    textes = ["Bonjour, nous sommes 40 personnes et cherchons un autocar de Paris à Lyon le 12/03/2030.",
+              "Message corrompu pour l'extraction.",
+              "Hello, we need a coach for 25 people from London to Oxford on 14/05/2030."]
+    attendu = nlp_parser.extraire_infos_batch([textes[0], textes[2]])
+    extraire_bloc = nlp_parser._extract_bloc
+
+    def extraire_ou_echouer(bloc, *args):
+        if "corrompu" in bloc:
+            raise ValueError("bloc illisible")
+        return extraire_bloc(bloc, *args)
+    monkeypatch.setattr(nlp_parser, "_extract_bloc", extraire_ou_echouer)
+    resultats = nlp_parser.extraire_infos_batch(textes)
+    assert isinstance(resultats[1], ValueError)
+    assert [resultats[0], resultats[2]] == attendu
+    # détection de langue en échec pour un email: seul celui-ci est en erreur
+    detecter = nlp_parser.detect_language
+
+    def detecter_ou_echouer(texte):
+        if "corrompu" in texte:
+            raise ValueError("langue indéterminable")
+        return detecter(texte)
+    monkeypatch.setattr(nlp_parser, "_extract_bloc", extraire_bloc)
+    monkeypatch.setattr(nlp_parser, "detect_language", detecter_ou_echouer)
+    resultats = nlp_parser.extraire_infos_batch(textes)
+    assert isinstance(resultats[1], ValueError) and [resultats[0], resultats[2]] == attendu
+    try:
+        nlp_parser.extraire_infos(textes[1])
+        assert False, "exception attendue"
+    except ValueError:
+        pass
+
+
+def main():
+    print("🔍 Tests du chargement concurrent des modèles spaCy...")
+    patch = Remplacements()
+    try:
+        test_chargement_unique_en_concurrence(patch)
+    finally:
+        patch.undo()
+    print(f"✅ {test_chargement_unique_en_concurrence.__name__}")
+    test_extraction_parallele()
+    print(f"✅ {test_extraction_parallele.__name__}")
+    patch = Remplacements()
+    try:
+        test_echec_isole_par_email(patch)
+    finally:
+        patch.undo()
+    print(f"✅ {test_echec_isole_par_email.__name__}")
+
+
+if __name__ == "__main__":
+    main()
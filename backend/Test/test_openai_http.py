@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests du budget de débit OpenAI (openai_http.RateLimiter) appris des en-têtes x-ratelimit-*.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import openai_http  # noqa: E402
+
+
+def _budget(requests, tokens, reset="0.3s"):
+    return {
+        "x-ratelimit-remaining-requests": str(requests), "x-ratelimit-reset-requests": reset,
+        "x-ratelimit-remaining-tokens": str(tokens), "x-ratelimit-reset-tokens": reset,
+    }
+
+
+def test_duree_reset():
+    assert openai_http._parse_reset("6m0s") == 360
+    assert openai_http._parse_reset("20ms") == 0.02
+    assert openai_http._parse_reset("1h2m3.5s") == 3723.5
+    assert openai_http._parse_reset("") is None
+
+
+def test_budget_inconnu_sans_attente():
+    limiter = openai_http.RateLimiter(2)
+    debut = time.monotonic()
+    for _ in range(5):
+        limiter.acquire(1000)
+        limiter.release()
+    assert time.monotonic() - debut < 0.1
+
+
+def test_attente_quand_budget_epuise():
+    limiter = openai_http.RateLimiter(2)
+    limiter.update(_budget(requests=2, tokens=100000))
+    debut = time.monotonic()
+    for _ in range(3):  # la 3e requête attend la remise à zéro
+        limiter.acquire(10)
+        limiter.release()
+    assert time.monotonic() - debut >= 0.25
+
+    limiter = openai_http.RateLimiter(2)
+    limiter.update(_budget(requests=100, tokens=500))
+    debut = time.monotonic()
+    limiter.acquire(400)
+    limiter.release()
+    limiter.acquire(400)  # plus assez de jetons
+    limiter.release()
+    assert time.monotonic() - debut >= 0.25
+
+
+def main():
+    print("🔍 Tests du limiteur de débit OpenAI...")
+    for test in (test_duree_reset, test_budget_inconnu_sans_attente, test_attente_quand_budget_epuise):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Tests de l'outbox avec une fausse connexion SMTP: réservation et envoi d'un lot, nouvelles tentatives
+puis lettre morte et retry_now, reprise d'un email dont la réservation a expiré (mais pas d'un email
+réservé par un worker actif), envoi retiré de la file après OUTBOX_SEND_TIMEOUT et envoi SMTP lent
+attendu jusqu'au bout (réservation prolongée, pas de nouvelle tentative ni de doublon).
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import json
+import os
+import sys
+import threading
+import time
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import Remplacements, base_temporaire  # noqa: E402
+
+ANCIENNE = "2000-01-01 00:00:00"
+
+
+class FausseConnexion:
+    """Remplace la SmtpConnection de mailer_service: enregistre les envois, échoue si `erreur` est définie,
+    attend `ouvert` pour les messages dont le sujet est 'bloquant'."""
+
+    def __init__(self):
+        self.server = None
+        self.erreur = None
+        self.ouvert = threading.Event()
+        self.en_envoi = threading.Event()
+        self.envoyes = []
+
+    def sendmail(self, recipients, message):
+        if "Subject: bloquant" in message:
+            self.en_envoi.set()
+            self.ouvert.wait(5)
+        if self.erreur:
+            raise OSError(self.erreur)
+        self.envoyes.append(list(recipients))
+
+    def close(self):
+        pass
+
+
+def _preparer(monkeypatch):
+    base = base_temporaire()
+    import outbox
+    connexion = FausseConnexion()
+    monkeypatch.setattr(outbox.mailer_service, "connection", connexion)
+    # pas de thread outbox: les tests appellent process_due directement
+    monkeypatch.setattr(outbox.outbox_worker, "wake", lambda: None)
+    return base, outbox, connexion
+
+
+def _ajouter(base, demande_id, langue="fr", sujet="Sujet"):
+    outbox_id, _ = base.enqueue_outbox(f"demande:{demande_id}:{langue}", demande_id, langue,
+                                       json.dumps([f"p{demande_id}@exemple.fr"]), sujet, corps="Bonjour")
+    return outbox_id
+
+
+def _vieillir(base, outbox_id, colonne):
+    base.conn.execute(f"UPDATE outbox SET {colonne} = ? WHERE id = ?", (ANCIENNE, outbox_id))
+    base.conn.commit()
+
+
+def test_reservation_et_envoi(monkeypatch):
+    base, outbox, connexion = _preparer(monkeypatch)
+    ids = [_ajouter(base, 1), _ajouter(base, 2)]
+    # même clé (validation rejouée): pas de doublon
+    assert base.enqueue_outbox("demande:1:fr", 1, "fr", "[]", "Sujet")[1] is False
+    assert outbox.outbox_worker.process_due() == 2
+    for outbox_id in ids:
+        item = base.get_outbox(outbox_id)
+        assert item["statut"] == "envoye" and item["tentatives"] == 1 and item["reserve_le"]
+    assert sorted(connexion.envoyes) == [["p1@exemple.fr"], ["p2@exemple.fr"]]
+    assert outbox.outbox_worker.process_due() == 0
+
+
+def test_nouvelles_tentatives_puis_lettre_morte(monkeypatch):
+    base, outbox, connexion = _preparer(monkeypatch)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    outbox_id = _ajouter(base, 1)
+    connexion.erreur = "550 refusé"
+    assert outbox.outbox_worker.process_due() == 1
+    item = base.get_outbox(outbox_id)
+    assert (item["statut"], item["tentatives"], item["derniere_erreur"]) == ("en_attente", 1, "550 refusé")
+    # prochaine tentative pas encore échue
+    assert outbox.outbox_worker.process_due() == 0
+    _vieillir(base, outbox_id, "prochaine_tentative")
+    assert outbox.outbox_worker.process_due() == 1
+    assert base.get_outbox(outbox_id)["statut"] == "echec"
+    assert outbox.outbox_worker.process_due() == 0
+    # relance manuelle de la lettre morte
+    connexion.erreur = None
+    assert outbox.retry_now(outbox_id)
+    assert outbox.outbox_worker.process_due() == 1
+    item = base.get_outbox(outbox_id)
+    assert (item["statut"], item["tentatives"]) == ("envoye", 1)
+    assert not outbox.retry_now(outbox_id)
+
+
+def test_reprise_reservation_expiree(monkeypatch):
+    base, outbox, connexion = _preparer(monkeypatch)
+    outbox_id = _ajouter(base, 1)
+    # réservé par un worker (d'un autre processus) toujours actif: ni repris ni remis en file au démarrage
+    assert [i["id"] for i in base.claim_outbox(10)] == [outbox_id]
+    assert outbox.outbox_worker.process_due() == 0
+    worker = outbox.OutboxWorker()
+    worker.start()
+    worker.stop()
+    assert base.get_outbox(outbox_id)["statut"] == "en_cours"
+    # worker arrêté pendant l'envoi: la réservation expire et l'email est repris
+    _vieillir(base, outbox_id, "reserve_le")
+    assert outbox.outbox_worker.process_due() == 1
+    assert base.get_outbox(outbox_id)["statut"] == "envoye"
+    assert connexion.envoyes == [["p1@exemple.fr"]]
+
+
+def test_envoi_retire_apres_timeout(monkeypatch):
+    base, outbox, connexion = _preparer(monkeypatch)
+    monkeypatch.setattr(outbox, "OUTBOX_SEND_TIMEOUT", 0.2)
+    outbox_id = _ajouter(base, 1)
+    # le worker du mailer est occupé: l'email de l'outbox reste en file au-delà du délai
+    bloquant = outbox.mailer_service.submit(["autre@exemple.fr"], "bloquant", "Corps")
+    connexion.en_envoi.wait(5)
+    try:
+        assert outbox.outbox_worker.process_due() == 1
+    finally:
+        connexion.ouvert.set()
+    item = base.get_outbox(outbox_id)
+    assert item["statut"] == "en_attente" and "envoi non commencé" in item["derniere_erreur"]
+    assert outbox.mailer_service.wait(bloquant, timeout=5)["status"] == "sent"
+    outbox.mailer_service.queue.join()
+    # le message retiré de la file n'a pas été envoyé: pas de doublon à la tentative suivante
+    assert connexion.envoyes == [["autre@exemple.fr"]]
+    _vieillir(base, outbox_id, "prochaine_tentative")
+    assert outbox.outbox_worker.process_due() == 1
+    assert base.get_outbox(outbox_id)["statut"] == "envoye"
+    assert connexion.envoyes == [["autre@exemple.fr"], ["p1@exemple.fr"]]
+
+
+def test_envoi_lent_attendu_sans_doublon(monkeypatch):
+    base, outbox, connexion = _preparer(monkeypatch)
+    monkeypatch.setattr(outbox, "OUTBOX_SEND_TIMEOUT", 0.1)
+    outbox_id = _ajouter(base, 1, sujet="bloquant")
+    traites = []
+    worker = threading.Thread(target=lambda: traites.append(outbox.outbox_worker.process_due()))
+    worker.start()
+    try:
+        assert connexion.en_envoi.wait(5)
+        # transaction SMTP plus longue que OUTBOX_SEND_TIMEOUT: l'email reste réservé et la réservation
+        # est prolongée (elle ne peut pas expirer et être reprise par un autre worker)
+        _vieillir(base, outbox_id, "reserve_le")
+        for _ in range(500):
+            if base.get_outbox(outbox_id)["reserve_le"] != ANCIENNE:
+                break
+            time.sleep(0.01)
+        item = base.get_outbox(outbox_id)
+        assert item["statut"] == "en_cours" and item["reserve_le"] != ANCIENNE
+        assert item["tentatives"] == 0 and item["derniere_erreur"] is None
+    finally:
+        connexion.ouvert.set()
+    worker.join(5)
+    assert traites == [1]
+    item = base.get_outbox(outbox_id)
+    assert (item["statut"], item["tentatives"]) == ("envoye", 1)
+    assert connexion.envoyes == [["p1@exemple.fr"]]
+    assert outbox.outbox_worker.process_due() == 0
+
+
+def main():
+    print("🔍 Tests de l'outbox...")
+    for test in (test_reservation_et_envoi, test_nouvelles_tentatives_puis_lettre_morte,
+                 test_reprise_reservation_expiree, test_envoi_retire_apres_timeout,
+                 test_envoi_lent_attendu_sans_doublon):
+        patch = Remplacements()
+        try:
+            test(patch)
+        finally:
+            patch.undo()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
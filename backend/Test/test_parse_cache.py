@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests du cache des extractions (parse_cache): hit, miss, mise à jour paresseuse de la date
+d'utilisation, éviction LRU sous max_bytes et invalidation par changement de PARSER_VERSION.
+"""
+
+# Rendre importables les modules du dossier backend quand on exécute depuis backend/Test
+import os
+import sys
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from outils_test import Remplacements, base_temporaire  # noqa: E402
+
+ANCIENNE = "2000-01-01 00:00:00.000000"
+
+
+def _date_utilisation(base, cle):
+    return base.conn.execute("SELECT date_utilisation FROM parse_cache WHERE cle = ?", (cle,)).fetchone()[0]
+
+
+def _vieillir(base, cle):
+    base.conn.execute("UPDATE parse_cache SET date_utilisation = ? WHERE cle = ?", (ANCIENNE, cle))
+    base.conn.commit()
+
+
+def test_hit_miss_et_mise_a_jour_paresseuse():
+    base = base_temporaire()
+    assert base.get_parse_result("absente") is None
+    base.save_parse_result("a", "nlp", '[{"ville": "Paris"}]')
+    date = _date_utilisation(base, "a")
+    ecritures = base.conn.total_changes
+    # entrée récente: un hit ne fait aucune écriture
+    assert base.get_parse_result("a") == '[{"ville": "Paris"}]'
+    assert base.conn.total_changes == ecritures and _date_utilisation(base, "a") == date
+    # entrée ancienne: la date d'utilisation est rafraîchie
+    _vieillir(base, "a")
+    assert base.get_parse_result("a") == '[{"ville": "Paris"}]'
+    assert _date_utilisation(base, "a") > ANCIENNE
+    assert not base.conn.in_transaction
+
+
+def test_eviction_lru():
+    base = base_temporaire()
+    valeur = "x" * 100
+    for cle in ("a", "b", "c"):
+        base.save_parse_result(cle, "nlp", valeur)
+    base.conn.execute("UPDATE parse_cache SET date_utilisation = '2000-01-01 00:00:0' || "
+                      "CASE cle WHEN 'a' THEN '1' WHEN 'b' THEN '2' ELSE '3' END")
+    base.conn.commit()
+    # 'a' relue: elle devient la plus récente, 'b' est alors la moins récemment utilisée
+    base.get_parse_result("a")
+    base.save_parse_result("d", "nlp", valeur, max_bytes=300)
+    restantes = sorted(r[0] for r in base.conn.execute("SELECT cle FROM parse_cache"))
+    assert restantes == ["a", "c", "d"]
+
+
+def test_changement_de_version(monkeypatch):
+    base_temporaire()
+    import email_fetcher
+    import ai_parser
+    monkeypatch.setattr(email_fetcher, "PARSE_CACHE_ENABLED", True)
+    appels = []
+
+    def extraire(corps):
+        appels.append(list(corps))
+        return [[{"ville": "Lyon"}] for _ in corps]
+    corps = ["Bonjour,\nun car pour Lyon le 3 mars."]
+    assert email_fetcher._cached_parse_many(corps, "ai", extraire) == [[{"ville": "Lyon"}]]
+    # espaces et fins de ligne différents: même clé normalisée
+    assert email_fetcher._cached_parse_many(["Bonjour,\r\nun car  pour Lyon le 3 mars.  "], "ai", extraire) \
+        == [[{"ville": "Lyon"}]]
+    assert len(appels) == 1
+    cle = email_fetcher._parse_cache_key(corps[0], "ai")
+    monkeypatch.setattr(ai_parser, "PARSER_VERSION", ai_parser.PARSER_VERSION + "-test")
+    assert email_fetcher._parse_cache_key(corps[0], "ai") != cle
+    email_fetcher._cached_parse_many(corps, "ai", extraire)
+    assert len(appels) == 2
+
+
+def main():
+    print("🔍 Tests du cache des extractions...")
+    for test in (test_hit_miss_et_mise_a_jour_paresseuse, test_eviction_lru):
+        test()
+        print(f"✅ {test.__name__}")
+    patch = Remplacements()
+    try:
+        test_changement_de_version(patch)
+    finally:
+        patch.undo()
+    print(f"✅ {test_changement_de_version.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,16 @@
 import os
 import json
+import threading
+import time
+from collections import OrderedDict
+from email_templates import get_template, is_known
 # Optional dependency: dotenv
 try:
     from dotenv import load_dotenv
 except Exception:
     def load_dotenv(*args, **kwargs):
         return False
-# Optional dependency: requests
-try:
-    import requests
-except Exception:
-    requests = None
+import openai_http
 
 # Load env from common locations
 load_dotenv()
@@ -28,6 +28,15 @@ except Exception:
     pass
 
 
+# Composed emails are a deterministic function of the facts: keep them (LRU, TTL in seconds)
+# so that preview -> send and repeated validations reuse the same text instead of a new LLM call.
+COMPOSE_CACHE_SIZE = int(os.getenv('COMPOSE_CACHE_SIZE', '256'))
+COMPOSE_CACHE_TTL = float(os.getenv('COMPOSE_CACHE_TTL', '3600'))
+_compose_cache = OrderedDict()  # key -> (text, stored at)
+_compose_inflight = {}  # key -> Event, so concurrent callers with the same facts share one request
+_compose_lock = threading.Lock()
+
+
 def _load_openai_from_credentials_file():
     """Load OPENAI_API_KEY and OPENAI_MODEL from backend/credentials.txt if not set."""
     try:
@@ -52,21 +61,10 @@ def _load_openai_from_credentials_file():
         pass
 
 
-def _build_prompt(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
-    """Build an instruction to compose the partner email in the specified language and structure.
-
-    Parameters:
-      - lang: 'de' | 'fr' | 'en'
-      - gruppe: int|str|None → number of persons (approx). Omit if unknown.
-      - strecke: str|None → route description (e.g., City A → City B). Omit if unknown.
-      - entfernung: str|None → distance and duration (free text). Omit if unknown.
-      - fahrten: list[(date_str, time_str)] → date and departure time per line. Skip section if list empty.
-      - stunden_pro_tag: str|None → estimated duration per day. Omit if unknown.
-    """
-    # Normalize inputs
-    def known(x):
-        return x is not None and str(x).strip() not in ("", "?", "N/A", "n/a")
-
+def _facts(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_tag) -> dict:
+    """Normalized facts given to the model: unknown markers (None, "", "?", "N/A", "à définir"...)
+    become None and trips keep only dated lines. Also the cache key, so that callers spelling
+    "unknown" differently (preview vs validation) share one composition."""
     lines_fahrten = []
     if isinstance(fahrten, (list, tuple)):
         for it in fahrten:
@@ -79,82 +77,31 @@ def _build_prompt(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_t
             if d:
                 lines_fahrten.append((d, t))
 
-    templates = {
-        'de': {
-            'greeting': "Guten Tag,",
-            'intro': "wir suchen einen Bus mit Fahrer für folgende Transfers:",
-            'details': "Details",
-            'group': lambda g: f"Gruppe: ca. {g} Personen",
-            'route': lambda s: f"Strecke: {s}",
-            'distance': lambda e: f"Entfernung: {e}",
-            'trips': "Fahrten",
-            'trip_line': lambda d, t: f"{d} – Abfahrt {t or '00:00'} Uhr",
-            'total': "Gesamt",
-            'total_line': lambda n, e, spt: ", ".join([
-                f"{n} Fahrten",
-                *([e] if known(e) else []),
-                *([f"geschätzte Einsatzzeit pro Tag ca. {spt}"] if known(spt) else []),
-            ]) + ".",
-            'request': "Wir bitten um Ihr Verfügbarkeits- und Preisangebot.",
-            'thanks': "Vielen Dank im Voraus.",
-        },
-        'da': {
-            'greeting': "Goddag,",
-            'intro': "Vi søger en bus med chauffør til følgende transporter:",
-            'details': "Detaljer",
-            'group': lambda g: f"Gruppe: ca. {g} personer",
-            'route': lambda s: f"Rute: {s}",
-            'distance': lambda e: f"Afstand: {e}",
-            'trips': "Ture",
-            'trip_line': lambda d, t: f"{d} – Afgang {t or '00:00'}",
-            'total': "I alt",
-            'total_line': lambda n, e, spt: ", ".join([
-                f"{n} ture",
-                *([e] if known(e) else []),
-                *([f"anslået varighed pr. dag ca. {spt}"] if known(spt) else []),
-            ]) + ".",
-            'request': "Send venligst jeres tilgængelighed og prisoverslag.",
-            'thanks': "På forhånd tak.",
-        },
-        'fr': {
-            'greeting': "Bonjour,",
-            'intro': "Nous recherchons un bus avec chauffeur pour les trajets suivants :",
-            'details': "Détails",
-            'group': lambda g: f"Groupe : environ {g} personnes",
-            'route': lambda s: f"Trajet : {s}",
-            'distance': lambda e: f"Distance : {e}",
-            'trips': "Trajets",
-            'trip_line': lambda d, t: f"{d} – Départ {t or '00:00'} h",
-            'total': "Total",
-            'total_line': lambda n, e, spt: ", ".join([
-                f"{n} trajets",
-                *([e] if known(e) else []),
-                *([f"durée estimée par jour environ {spt}"] if known(spt) else []),
-            ]) + ".",
-            'request': "Merci de nous communiquer vos disponibilités et vos tarifs.",
-            'thanks': "Cordialement,",
-        },
-        'en': {
-            'greeting': "Hello,",
-            'intro': "We are looking for a bus with driver for the following transfers:",
-            'details': "Details",
-            'group': lambda g: f"Group: approx. {g} persons",
-            'route': lambda s: f"Route: {s}",
-            'distance': lambda e: f"Distance: {e}",
-            'trips': "Trips",
-            'trip_line': lambda d, t: f"{d} – Departure {t or '00:00'}",
-            'total': "Total",
-            'total_line': lambda n, e, spt: ", ".join([
-                f"{n} trips",
-                *([e] if known(e) else []),
-                *([f"estimated duration per day approx. {spt}"] if known(spt) else []),
-            ]) + ".",
-            'request': "Please send us your availability and quote.",
-            'thanks': "Thank you in advance.",
-        }
+    return {
+        "language": lang,
+        "group_size": str(gruppe) if is_known(gruppe) else None,
+        "route": strecke if is_known(strecke) else None,
+        "distance": entfernung if is_known(entfernung) else None,
+        "trips": [
+            {"date": d, "time": (t or "00:00")}
+            for d, t in lines_fahrten
+        ],
+        "per_day_estimate": stunden_pro_tag if is_known(stunden_pro_tag) else None,
     }
 
-    t = templates.get(lang or 'fr', templates['fr'])
+
+def _build_prompt(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
+    """Build an instruction to compose the partner email in the specified language and structure.
+
+    Parameters:
+      - lang: 'de' | 'fr' | 'en'
+      - gruppe: int|str|None → number of persons (approx). Omit if unknown.
+      - strecke: str|None → route description (e.g., City A → City B). Omit if unknown.
+      - entfernung: str|None → distance and duration (free text). Omit if unknown.
+      - fahrten: list[(date_str, time_str)] → date and departure time per line. Skip section if list empty.
+      - stunden_pro_tag: str|None → estimated duration per day. Omit if unknown.
+    """
+    template = get_template(lang or 'fr', default='fr')
 
     # Provide the LLM with explicit instructions and a JSON with the facts.
     instructions = (
@@ -175,99 +122,115 @@ def _build_prompt(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_t
     )
 
     # Facts given to model
-    facts = {
-        "language": lang,
-        "group_size": str(gruppe) if known(gruppe) else None,
-        "route": strecke if known(strecke) else None,
-        "distance": entfernung if known(entfernung) else None,
-        "trips": [
-            {"date": d, "time": (t or "00:00")}
-            for d, t in lines_fahrten
-        ],
-        "per_day_estimate": stunden_pro_tag if known(stunden_pro_tag) else None,
-        "phrases": {
-            "GREETING": t['greeting'],
-            "INTRO": t['intro'],
-            "DETAILS": t['details'],
-            "TRIPS": t['trips'],
-            "TOTAL": t['total'],
-            "REQUEST": t['request'],
-            "THANKS": t['thanks'],
-        }
-    }
+    facts = _facts(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+    facts["phrases"] = dict(template.phrases)
 
     return instructions, facts
 
 
+def _compose_key(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag) -> str:
+    facts = _facts(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+    return os.getenv('OPENAI_MODEL', 'gpt-4o-mini') + ':' + json.dumps(facts, ensure_ascii=False, sort_keys=True,
+                                                                       default=str)
+
+
+def _cache_get(key):
+    with _compose_lock:
+        entry = _compose_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > COMPOSE_CACHE_TTL:
+            del _compose_cache[key]
+            return None
+        _compose_cache.move_to_end(key)
+        return entry[0]
+
+
 def compose_partner_email(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
-    """Compose the partner email using OpenAI when possible. Returns text or None on failure."""
+    """Compose the partner email using OpenAI when possible. Returns text or None on failure.
+
+    Results are memoized on the facts (COMPOSE_CACHE_SIZE entries, COMPOSE_CACHE_TTL seconds);
+    failures are not cached.
+    """
+    key = _compose_key(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+    text = _cache_get(key)
+    if text is not None:
+        return text
+    with _compose_lock:
+        event = _compose_inflight.get(key)
+        leader = event is None
+        if leader:
+            event = _compose_inflight[key] = threading.Event()
+    if not leader:
+        # same facts being composed by another thread: share its result (None if it failed)
+        event.wait()
+        return _cache_get(key)
+    try:
+        text = _compose_uncached(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+        if text:
+            with _compose_lock:
+                _compose_cache[key] = (text, time.monotonic())
+                _compose_cache.move_to_end(key)
+                while len(_compose_cache) > COMPOSE_CACHE_SIZE:
+                    _compose_cache.popitem(last=False)
+        return text
+    finally:
+        with _compose_lock:
+            _compose_inflight.pop(key, None)
+        event.set()
+
+
+def _compose_uncached(lang: str, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
+    """One composition request (Responses API, then Chat Completions). Returns text or None on failure."""
     # Ensure key/model present (load from credentials file if needed)
     _load_openai_from_credentials_file()
     api_key = os.getenv('OPENAI_API_KEY')
     model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
-    if not api_key or requests is None:
+    if not api_key or openai_http.requests is None:
         return None
 
     instructions, facts = _build_prompt(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that composes emails."},
+        {"role": "user", "content": instructions + "\nFacts (JSON):\n" + json.dumps(facts, ensure_ascii=False)}
+    ]
 
-    # Try Responses API first (text output)
-    try:
-        url = 'https://api.openai.com/v1/responses'
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
+    # Responses API (text output)
+    def call_responses():
         payload = {
             'model': model,
-            'input': [
-                {"role": "system", "content": "You are a helpful assistant that composes emails."},
-                {"role": "user", "content": instructions + "\nFacts (JSON):\n" + json.dumps(facts, ensure_ascii=False)}
-            ],
+            'input': messages,
             'modalities': ['text'],
             'text': { 'format': 'plain' }
         }
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            # Extract text from responses API
-            # It may return data['output'][0]['content'][0]['text'] depending on API; try common paths
-            text = None
-            try:
-                text = data['output'][0]['content'][0]['text']
-            except Exception:
-                # fallback: choices like structure
-                text = data.get('content', '') or data.get('output_text')
-            if text and isinstance(text, str):
-                return text.strip()
-        else:
-            # Non-200: try fallback
-            pass
-    except Exception:
-        pass
-
-    # Fallback to Chat Completions (plain text)
-    try:
-        url = 'https://api.openai.com/v1/chat/completions'
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that composes emails."},
-            {"role": "user", "content": instructions + "\nFacts (JSON):\n" + json.dumps(facts, ensure_ascii=False)}
-        ]
+        resp = openai_http.post_json('responses', api_key, payload)
+        resp.raise_for_status()
+        data = resp.json()
+        # It may return data['output'][0]['content'][0]['text'] depending on API; try common paths
+        try:
+            text = data['output'][0]['content'][0]['text']
+        except Exception:
+            text = data.get('content', '') or data.get('output_text')
+        if not text or not isinstance(text, str):
+            raise ValueError('empty Responses API output')
+        return text.strip()
+
+    # Chat Completions (plain text)
+    def call_chat():
         payload = {
             'model': model,
             'messages': messages,
             'temperature': 0.2
         }
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            text = data['choices'][0]['message']['content']
-            if text:
-                return text.strip()
+        resp = openai_http.post_json('chat/completions', api_key, payload)
+        resp.raise_for_status()
+        text = resp.json()['choices'][0]['message']['content']
+        if not text:
+            raise ValueError('empty Chat Completions output')
+        return text.strip()
+
+    # Responses first, then Chat; the endpoint that worked is tried first next time
+    try:
+        return openai_http.call_with_fallback('compose', [('responses', call_responses), ('chat', call_chat)])
     except Exception:
-        pass
-
-    return None
+        return None
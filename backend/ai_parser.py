@@ -1,12 +1,24 @@
 import os
 import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 from dotenv import load_dotenv
+import openai_http
 load_dotenv()
 
-def _build_prompt(email_text: str) -> str:
-    return (
-        "You are an information extraction assistant for ground transport bookings. Extract details precisely. "
+# Version du prompt/normalisation: à incrémenter quand le résultat change (invalide le cache d'extraction)
+PARSER_VERSION = "3"
+
+# Token budget: the email part of the prompt is cut to AI_MAX_INPUT_TOKENS (~4 characters per token)
+AI_MAX_INPUT_TOKENS = int(os.getenv("AI_MAX_INPUT_TOKENS", "2000"))
+AI_MAX_OUTPUT_TOKENS = int(os.getenv("AI_MAX_OUTPUT_TOKENS", "800"))
+
+# Fixed instructions, always sent first and byte-identical so the provider's prompt caching applies;
+# only the (trimmed) email text varies between requests.
+_INSTRUCTIONS = (
+    "You are an information extraction assistant for ground transport bookings. Extract details precisely. "
         "Return STRICT JSON with an array named 'demandes'. Each item must contain these keys: "
         "nom, prenom, email, telephone, ville, villes (array), pays, date_debut (YYYY-MM-DD or ''), date_fin (YYYY-MM-DD or ''), "
         "type_vehicule, type_voyage, nb_personnes, infos_libres, corps_mail, langue_detectee, itinerary. "
@@ -29,9 +41,85 @@ def _build_prompt(email_text: str) -> str:
         "     'Hoeveel reizigers nemen deel aan deze reis?' -> nb_personnes (support ranges like '10 - 20'), "
         "     'Voor wat voor type reis wilt u een offerte?' -> type_voyage (e.g., 'Retourreis (Heen en terug)' -> 'retour'). "
         "   Also capture any free-text details under additional info into 'infos_libres' and 'corps_mail'. "
-        "10) Keep 'type_vehicule' empty unless a vehicle type is explicitly stated.\n\n"
-        "Input email text:\n\n" + email_text
-    )
+        "10) Keep 'type_vehicule' empty unless a vehicle type is explicitly stated."
+)
+
+# Start of the quoted history in a reply (everything after it is dropped)
+_REPLY_HEADER_RE = re.compile(
+    r"^(?:-{2,}\s*(?:Original Message|Message d'origine|Ursprüngliche Nachricht|Oprindelig meddelelse|"
+    r"Oorspronkelijk bericht)\s*-{2,}"
+    r"|(?:On|Le|Am|Den|Op)\s[^\n]{0,200}(?:\n[^\n]{0,200})?\s(?:wrote|a\s+écrit|schrieb|skrev|schreef)\s?:)\s*$",
+    re.I | re.M,
+)
+# Outlook style quoted header: a complete block of consecutive lines From / Sent (or Date) / To /
+# [Cc / Bcc] / Subject, optionally after a separator line. A form-style body with its own "From:" or
+# "Date:" fields (departure city, travel date) does not have this shape and is left whole.
+_OUTLOOK_HEADER_RE = re.compile(
+    r"^(?:[ \t]*(?:_{5,}|-{5,})[ \t]*\n)?"
+    r"[ \t]*(?:From|De|Von|Fra|Van)[ \t\u00a0]*:[^\n]*\n"
+    r"[ \t]*(?:Sent|Date|Envoyé|Gesendet|Datum|Sendt|Dato|Verzonden)[ \t\u00a0]*:[^\n]*\n"
+    r"[ \t]*(?:To|À|A|An|Til|Aan)[ \t\u00a0]*:[^\n]*\n"
+    r"(?:[ \t]*(?:Cc|Cci|Bcc)[ \t\u00a0]*:[^\n]*\n)*"
+    r"[ \t]*(?:Subject|Objet|Betreff|Emne|Onderwerp)[ \t\u00a0]*:",
+    re.I | re.M,
+)
+# Forwarded message marker: the forwarded part is the customer request, never cut it
+_FORWARD_RE = re.compile(
+    r"^-{2,}\s*(?:Forwarded message|Message transféré|Weitergeleitete Nachricht|Videresendt meddelelse|"
+    r"Doorgestuurd bericht)",
+    re.I | re.M,
+)
+# Signature delimiter ("-- ") and mobile client footers
+_SIGNATURE_RE = re.compile(r"^--\s*$", re.M)
+_MOBILE_FOOTER_RE = re.compile(
+    r"^(?:Sent from my|Envoyé de mon|Von meinem|Sendt fra min|Verzonden vanaf mijn|Get Outlook for)\b.*$",
+    re.I | re.M,
+)
+_DISCLAIMER_RE = re.compile(
+    r"^(?:This (?:e-?mail|message) (?:and any|is confidential|may contain)|CONFIDENTIAL(?:ITY)? NOTICE|"
+    r"Ce (?:message|courriel) (?:et (?:toutes )?les pièces jointes|est confidentiel))",
+    re.I | re.M,
+)
+# Contact lines kept from a signature: phone numbers (8+ digits) or email addresses
+_CONTACT_LINE_RE = re.compile(r"(?:\d[\s./()-]*){8,}|@")
+_MIN_KEPT_CHARS = 40
+
+
+def _cut_at(text: str, pattern) -> str:
+    """Text before the first match of pattern, unless that would leave (almost) nothing."""
+    m = pattern.search(text)
+    if m and len(text[:m.start()].strip()) >= _MIN_KEPT_CHARS:
+        return text[:m.start()]
+    return text
+
+
+def _trim_email(email_text: str) -> str:
+    """Reduce an email to what the extraction needs: no quoted reply chain, disclaimer or mobile
+    footer, signature reduced to its contact lines, blank runs collapsed, capped at AI_MAX_INPUT_TOKENS.
+    Forwarded messages are kept: a forwarded customer request is the content to extract."""
+    text = (email_text or "").replace("\r\n", "\n")
+    text = _cut_at(text, _REPLY_HEADER_RE)
+    if not _FORWARD_RE.search(text):
+        text = _cut_at(text, _OUTLOOK_HEADER_RE)
+    text = "\n".join(ln for ln in text.split("\n") if not ln.lstrip().startswith(">"))
+    text = _cut_at(text, _DISCLAIMER_RE)
+    text = _MOBILE_FOOTER_RE.sub("", text)
+    m = _SIGNATURE_RE.search(text)
+    if m and len(text[:m.start()].strip()) >= _MIN_KEPT_CHARS:
+        contacts = [ln.strip() for ln in text[m.end():].split("\n") if _CONTACT_LINE_RE.search(ln)]
+        text = text[:m.start()] + "\n".join(contacts)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text).strip()
+    max_chars = AI_MAX_INPUT_TOKENS * 4
+    if AI_MAX_INPUT_TOKENS > 0 and len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars)
+        text = text[:cut if cut > max_chars // 2 else max_chars] + "\n[...]"
+    return text
+
+
+def _build_prompt(email_text: str) -> str:
+    """Variable part of the prompt (user message); the fixed rules are in _INSTRUCTIONS."""
+    return "Input email text:\n\n" + _trim_email(email_text)
 
 def _parse_json_strict(s: str) -> Dict:
     # Attempt to find the first and last curly braces and parse JSON
@@ -53,26 +141,23 @@ def extraire_infos_ai(email_text: str) -> List[Dict[str, str]]:
         raise RuntimeError("OPENAI_API_KEY not configured")
 
     try:
-        # Prefer the OpenAI Responses API; on error, fall back to Chat Completions for compatibility
-        import requests
-
+        # Prefer the OpenAI Responses API; on error, fall back to Chat Completions for compatibility.
+        # The endpoint that worked is remembered by openai_http, so later emails make a single request.
         def call_responses(prompt: str) -> str:
-            url = "https://api.openai.com/v1/responses"
-            headers = {
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-                # Some deployments require this beta header for responses
-                "OpenAI-Beta": "assistants=v2",
-            }
+            # Some deployments require this beta header for responses
+            headers = {"OpenAI-Beta": "assistants=v2"}
             body = {
                 "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                "input": prompt,
+                "input": [
+                    {"role": "system", "content": _INSTRUCTIONS},
+                    {"role": "user", "content": prompt}
+                ],
                 "temperature": 0.0,
-                "max_output_tokens": 800,
+                "max_output_tokens": AI_MAX_OUTPUT_TOKENS,
                 "modalities": ["text"],
                 "text": {"format": "json_object"}
             }
-            r = requests.post(url, headers=headers, json=body, timeout=30)
+            r = openai_http.post_json("responses", OPENAI_API_KEY, body, extra_headers=headers)
             if r.status_code >= 400:
                 # surface detailed server message to logs
                 try:
@@ -88,22 +173,17 @@ def extraire_infos_ai(email_text: str) -> List[Dict[str, str]]:
             )
 
         def call_chat(prompt: str) -> str:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            }
             body = {
                 "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
                 "temperature": 0.0,
-                "max_tokens": 800,
+                "max_tokens": AI_MAX_OUTPUT_TOKENS,
                 "response_format": {"type": "json_object"},
                 "messages": [
-                    {"role": "system", "content": "You are a helpful JSON-only information extraction assistant."},
+                    {"role": "system", "content": _INSTRUCTIONS},
                     {"role": "user", "content": prompt}
                 ]
             }
-            r = requests.post(url, headers=headers, json=body, timeout=30)
+            r = openai_http.post_json("chat/completions", OPENAI_API_KEY, body)
             if r.status_code >= 400:
                 try:
                     print(f"[DEBUG] Chat API error {r.status_code}: {r.text[:1000]}")
@@ -118,11 +198,10 @@ def extraire_infos_ai(email_text: str) -> List[Dict[str, str]]:
             return "{}"
 
         prompt = _build_prompt(email_text)
-        try:
-            text = call_responses(prompt)
-        except Exception:
-            # Fallback to Chat Completions
-            text = call_chat(prompt)
+        text = openai_http.call_with_fallback("extraction", [
+            ("responses", lambda: call_responses(prompt)),
+            ("chat", lambda: call_chat(prompt)),
+        ])
 
         obj = _parse_json_strict(text)
         demandes = obj.get("demandes") or []
@@ -163,3 +242,42 @@ def extraire_infos_ai(email_text: str) -> List[Dict[str, str]]:
         print(f"[WARN] AI parsing failed, falling back to NLP: {e}")
         # Signal caller to fallback to classic NLP
         raise
+
+
+# LLM calls run concurrently on one shared pool; openai_http bounds them further
+# (OPENAI_MAX_CONCURRENCY slots, RPM/TPM budget from the x-ratelimit-* headers)
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "8"))
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, AI_CONCURRENCY), thread_name_prefix="ai-extract")
+        return _pool
+
+
+def extraire_infos_ai_many(email_texts: List[str]) -> List:
+    """Run extraire_infos_ai on several emails concurrently.
+
+    Returns a list aligned on email_texts: the demandes of each email, or the exception
+    it raised so the caller can fall back to NLP for that email only.
+    """
+    if len(email_texts) <= 1:
+        results = []
+        for text in email_texts:
+            try:
+                results.append(extraire_infos_ai(text))
+            except Exception as e:
+                results.append(e)
+        return results
+    futures = [_get_pool().submit(extraire_infos_ai, text) for text in email_texts]
+    results = []
+    for f in futures:
+        try:
+            results.append(f.result())
+        except Exception as e:
+            results.append(e)
+    return results
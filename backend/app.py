@@ -1,18 +1,24 @@
+import time
+_BOOT_T0 = time.perf_counter()
 from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
-from db import conn
+from db import conn, close_thread_connection
 import email_fetcher
-from mailer import send_email_partners_bcc, format_partner_email, send_custom_body_bcc, subject_for_lang
-from ai_email import compose_partner_email
+from fetch_jobs import FetchJobScheduler
+from mailer import format_partner_email, send_custom_body_bcc, subject_for_lang, mailer_service
+import outbox
 from threading import Thread
+import threading
 import csv
-import pandas as pd
 import os
-from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta, date
 import secrets
+import base64
 from dotenv import load_dotenv
 
+# Rapport de démarrage (ms); spaCy, dateparser, pandas et ai_email sont importés à la première utilisation
+BOOT_TIMINGS = {"imports_ms": int((time.perf_counter() - _BOOT_T0) * 1000)}
+
 app = Flask(__name__)
 CORS(app)
 
@@ -25,6 +31,50 @@ except Exception:
 # Runtime fetch status
 LAST_FETCH = {"mode": None, "inserted": 0, "at": None}
 
+# Service d'ingestion IMAP IDLE (optionnel): IMAP_IDLE_SERVICE=true pour le lancer avec l'API,
+# ou en processus séparé via `python email_fetcher.py --idle`.
+IMAP_IDLE_SERVICE = (os.getenv("IMAP_IDLE_SERVICE", "false").lower() in ("1", "true", "yes", "y"))
+idle_service = None
+# Préchargement NLP (spaCy, dateparser, langdetect) en arrière-plan: WARMUP_ON_START=true au
+# démarrage, ou à la demande via POST /admin/warmup. L'API répond pendant le préchargement.
+WARMUP_ON_START = (os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes", "y"))
+WARMUP_STATUS = {"state": "idle", "started_at": None, "finished_at": None, "timings": {}, "error": None}
+_warmup_lock = threading.Lock()
+
+def _record_fetch(count):
+    from datetime import datetime as _dt
+    LAST_FETCH["mode"] = getattr(email_fetcher, "LAST_PARSE_MODE", None)
+    LAST_FETCH["inserted"] = count
+    LAST_FETCH["at"] = _dt.now().isoformat(timespec='seconds')
+
+def start_idle_service():
+    global idle_service
+    if idle_service is None:
+        idle_service = email_fetcher.IdleIngestionService(on_sync=_record_fetch)
+    idle_service.start()
+
+def _run_warmup():
+    try:
+        t0 = time.perf_counter()
+        import nlp_parser
+        timings = {"import_ms": int((time.perf_counter() - t0) * 1000)}
+        timings.update(nlp_parser.warmup())
+        WARMUP_STATUS.update(state="done", timings=timings)
+    except Exception as e:
+        print(f"[ERROR] Warmup échoué: {e}")
+        WARMUP_STATUS.update(state="failed", error=str(e))
+    WARMUP_STATUS["finished_at"] = datetime.now().isoformat(timespec='seconds')
+
+def start_warmup():
+    """Lance le préchargement NLP dans un thread. Retourne False s'il est déjà en cours."""
+    with _warmup_lock:
+        if WARMUP_STATUS["state"] == "running":
+            return False
+        WARMUP_STATUS.update(state="running", started_at=datetime.now().isoformat(timespec='seconds'),
+                             finished_at=None, error=None)
+    Thread(target=_run_warmup, name="warmup", daemon=True).start()
+    return True
+
 # --- Admin authentication (optional) ---
 # Configure via environment:
 # - ADMIN_PASSWORD: the password required for login (default: "admin admin")
@@ -83,6 +133,90 @@ def auth_login():
 def health():
     return jsonify({"status": "ok", "require_admin": REQUIRE_ADMIN})
 
+@app.route('/admin/warmup', methods=['GET', 'POST'])
+def admin_warmup():
+    """POST: lance le préchargement NLP en arrière-plan. GET: état du préchargement et rapport de démarrage."""
+    started = start_warmup() if request.method == 'POST' else False
+    return jsonify({"started": started, "warmup": dict(WARMUP_STATUS), "startup": BOOT_TIMINGS}), (202 if started else 200)
+
+@app.route('/admin/mailer', methods=['GET'])
+def admin_mailer():
+    """État du service d'envoi: messages en file, connexion SMTP ouverte, derniers statuts."""
+    return jsonify(mailer_service.stats())
+
+@app.route('/admin/mailer/<int:msg_id>', methods=['GET'])
+def admin_mailer_message(msg_id):
+    status = mailer_service.status(msg_id)
+    if not status:
+        return jsonify({"error": "Message inconnu"}), 404
+    return jsonify(status)
+
+@app.route('/outbox', methods=['GET'])
+def list_outbox():
+    """Emails partenaires de l'outbox (?statut=en_attente|en_cours|envoye|echec, ?demande_id=, ?limit=)."""
+    try:
+        demande_id = request.args.get('demande_id', type=int)
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        items = outbox.db.list_outbox(statut=request.args.get('statut'), demande_id=demande_id, limit=limit)
+        for item in items:
+            item.pop('donnees', None)
+        return jsonify({"counts": outbox.db.outbox_counts(), "worker": outbox.outbox_worker.running, "items": items})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/outbox/<int:outbox_id>', methods=['GET'])
+def get_outbox(outbox_id):
+    item = outbox.db.get_outbox(outbox_id)
+    if item is None:
+        return jsonify({"error": "Email introuvable"}), 404
+    item.pop('donnees', None)
+    return jsonify(item)
+
+@app.route('/outbox/<int:outbox_id>/retry', methods=['POST'])
+def retry_outbox(outbox_id):
+    """Relance immédiatement un email en attente ou en échec (lettre morte)."""
+    if outbox.db.get_outbox(outbox_id) is None:
+        return jsonify({"error": "Email introuvable"}), 404
+    if not outbox.retry_now(outbox_id):
+        return jsonify({"error": "Email déjà envoyé ou en cours d'envoi"}), 409
+    return jsonify(outbox.db.get_outbox(outbox_id)), 202
+
+# --- Initialisation au démarrage (hors import) ---
+# Migrations et services d'arrière-plan ne sont lancés ni à l'import du module (outils, tests,
+# processus parent du reloader) ni deux fois: __main__ appelle init_app, un serveur WSGI
+# (gunicorn app:app) le déclenche à la première requête.
+OUTBOX_WORKER_ON_START = (os.getenv("OUTBOX_WORKER_ON_START", "true").lower() in ("1", "true", "yes", "y"))
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_app():
+    """Migre la base puis démarre préchargement NLP, service IMAP IDLE et worker outbox selon la configuration."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _t0 = time.perf_counter()
+        db.get()
+        BOOT_TIMINGS["database_ms"] = int((time.perf_counter() - _t0) * 1000)
+        if WARMUP_ON_START:
+            start_warmup()
+        if IMAP_IDLE_SERVICE:
+            start_idle_service()
+        if OUTBOX_WORKER_ON_START:
+            # reprise des emails restés en file avant l'arrêt
+            outbox.outbox_worker.start()
+        _initialized = True
+
+@app.before_request
+def _init_on_first_request():
+    if not _initialized:
+        init_app()
+
+@app.teardown_appcontext
+def _release_db_connection(exc):
+    # chaque requête tourne dans son thread: rendre sa connexion SQLite au pool (voir db.get_conn)
+    close_thread_connection()
+
 @app.before_request
 def _enforce_admin():
     if not REQUIRE_ADMIN:
@@ -106,13 +240,8 @@ def _enforce_admin():
 
 # Configuration pour l'upload de fichiers
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
-# Créer le dossier d'upload s'il n'existe pas
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -148,8 +277,8 @@ def format_demande_with_calculations(demande_dict):
     return demande_dict
 
 # --- Ajout d'une demande (POST) ---
-from db import Database
-db = Database()
+from db import LazyDatabase
+db = LazyDatabase()
 
 @app.route("/demandes", methods=["POST"])
 def add_demande():
@@ -164,14 +293,163 @@ def add_demande():
         return jsonify({"error": str(e)}), 500
 
 # --- Helper pour envoyer email asynchrone ---
-def send_email_async(ville, subject, gruppe, strecke, entfernung, fahrten, stunden_pro_tag, conn):
-    Thread(target=send_email_partners_bcc, args=(ville, subject, gruppe, strecke, entfernung, fahrten, stunden_pro_tag, conn)).start()
+def send_email_async(demande_id, ville, subject, gruppe, strecke, entfernung, fahrten, stunden_pro_tag, conn):
+    """Met les emails partenaires dans l'outbox (table durable); le worker outbox les rédige et les envoie."""
+    return outbox.enqueue_partner_emails(demande_id, ville, subject, gruppe, strecke, entfernung, fahrten,
+                                         stunden_pro_tag, conn)
+
+
+def _partner_email_facts(demande):
+    """Faits de l'email partenaire d'une demande (ligne SELECT * FROM demandes), communs à la
+    prévisualisation et à la validation: (groupe, strecke, entfernung, fahrten, stunden_pro_tag).
+    Mêmes valeurs des deux côtés, donc même rédaction (cache de ai_email) pour l'aperçu puis l'envoi."""
+    ville = demande[4]
+    # Groupe: nombre de personnes si dispo, sinon inconnu
+    try:
+        groupe = int(demande[19]) if demande[19] is not None else None
+    except Exception:
+        groupe = None
+    if not groupe:
+        groupe = "?"
+
+    # Itinéraire (strecke): préférer la colonne 'villes' si disponible, sinon la ville simple
+    strecke = demande[14] if demande[14] else ville
+
+    # Distance (entfernung): inconnue par défaut
+    entfernung = "N/A"
+
+    # Fahrten: liste (date, heure). On utilise date_debut si dispo.
+    # Construire les trajets: si période (date_debut/date_fin) → un départ par jour à 08:30
+    dd = demande[5]  # date_debut
+    df = demande[6]  # date_fin
+    dv = demande[11]  # date_voyage fallback
+    fahrten = []
+    default_time = "08:30"
+    try:
+        if dd and df:
+            d0 = datetime.strptime(dd, '%Y-%m-%d').date()
+            d1 = datetime.strptime(df, '%Y-%m-%d').date()
+            if d1 >= d0:
+                cur = d0
+                while cur <= d1:
+                    fahrten.append((cur.isoformat(), default_time))
+                    cur += timedelta(days=1)
+        elif dd or dv:
+            d = dd or dv
+            fahrten.append((d, default_time))
+    except Exception:
+        pass
+    if not fahrten:
+        fahrten = [("Date à confirmer", default_time)]
+
+    # Temps estimé par jour
+    stunden_pro_tag = "à définir"
+    return groupe, strecke, entfernung, fahrten, stunden_pro_tag
+
+# --- Pagination de GET /demandes ---
+# Colonnes projetables via ?fields=; corps_mail est exclu par défaut en mode paginé
+DEMANDE_COLUMNS = [
+    "id", "nom", "prenom", "telephone", "ville", "date_debut", "date_fin",
+    "type_vehicule", "statut", "sous_traitant", "date_enregistrement", "date_voyage",
+    "pays", "email", "villes", "adresses", "type_voyage", "infos_libres",
+    "corps_mail", "nb_personnes",
+]
+DEFAULT_DEMANDE_FIELDS = [col for col in DEMANDE_COLUMNS if col != "corps_mail"]
+# Colonnes toujours lues, même hors ?fields=: le curseur (id, date_enregistrement) et les champs
+# calculés par format_demande_with_calculations (jours_restants, date_enr_formatted)
+PAGE_REQUIRED_COLUMNS = ["id", "date_enregistrement", "date_voyage"]
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _encode_cursor(date_enregistrement, demande_id):
+    raw = f"{date_enregistrement or ''}|{demande_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor):
+    """Retourne (date_enregistrement, id) ou lève ValueError si le curseur est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        date_enr, demande_id = raw.rsplit("|", 1)
+        return date_enr, int(demande_id)
+    except Exception:
+        raise ValueError("Curseur invalide")
+
+def _get_demandes_page():
+    """Mode paginé de GET /demandes: curseur keyset sur (date_enregistrement, id), projection de colonnes.
+
+    Paramètres: limit (défaut 50, max 500), cursor (opaque, renvoyé dans next_cursor),
+    fields (liste séparée par des virgules; par défaut toutes les colonnes sauf corps_mail).
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "Paramètre limit invalide"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    fields_arg = (request.args.get("fields") or "").strip()
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in DEMANDE_COLUMNS]
+        if unknown:
+            return jsonify({"error": f"Champs inconnus: {', '.join(unknown)}", "champs_disponibles": DEMANDE_COLUMNS}), 400
+    else:
+        fields = list(DEFAULT_DEMANDE_FIELDS)
+    select_cols = list(dict.fromkeys(PAGE_REQUIRED_COLUMNS + fields))
+
+    where = ""
+    params = []
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cur_date, cur_id = _decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        where = "WHERE (COALESCE(d.date_enregistrement, ''), d.id) < (?, ?)"
+        params.extend([cur_date, cur_id])
+
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT {", ".join("d." + col for col in select_cols)}, COALESCE(st.nb, 0) AS nb_sous_traitants
+        FROM demandes d
+        LEFT JOIN (
+            SELECT ville, COUNT(*) AS nb FROM sous_traitants GROUP BY ville
+        ) st ON st.ville = d.ville
+        {where}
+        ORDER BY COALESCE(d.date_enregistrement, '') DESC, d.id DESC
+        LIMIT ?
+    """, (*params, limit + 1))
+    rows = c.fetchall()
+    columns = [column[0] for column in c.description]
+    c.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [format_demande_with_calculations(dict(zip(columns, row))) for row in rows]
+    next_cursor = None
+    if has_more and rows:
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = _encode_cursor(last["date_enregistrement"], last["id"])
+    return jsonify({"items": items, "next_cursor": next_cursor, "limit": limit})
+
 # --- Routes ---
 @app.route("/demandes", methods=["GET"])
 def get_demandes():
     try:
+        # Mode paginé dès qu'un paramètre de pagination/projection est fourni;
+        # sans paramètre, la réponse historique (liste complète) est conservée.
+        if any(k in request.args for k in ("limit", "cursor", "fields")):
+            return _get_demandes_page()
         c = conn.cursor()
-        c.execute("SELECT * FROM demandes ORDER BY date_enregistrement DESC")
+        # Une seule requête: le nombre de sous-traitants par ville est agrégé
+        # une fois puis joint, au lieu d'un COUNT(*) par demande (N+1).
+        c.execute("""
+            SELECT d.*, COALESCE(st.nb, 0) AS nb_sous_traitants
+            FROM demandes d
+            LEFT JOIN (
+                SELECT ville, COUNT(*) AS nb FROM sous_traitants GROUP BY ville
+            ) st ON st.ville = d.ville
+            ORDER BY d.date_enregistrement DESC
+        """)
         rows = c.fetchall()
         demandes = [dict(zip([column[0] for column in c.description], row)) for row in rows]
 
@@ -187,10 +465,6 @@ def get_demandes():
             d['nb_personnes'] = demande.get('nb_personnes', '')  # Ajout du nombre de personnes
             d['corps_mail'] = demande.get('corps_mail', '')  # Ajout du corps du mail
 
-            # Compter les sous-traitants dans la même ville
-            c.execute("SELECT COUNT(*) FROM sous_traitants WHERE ville=?", (demande['ville'],))
-            d['nb_sous_traitants'] = c.fetchone()[0]
-
             demandes_formatted.append(d)
 
         c.close()
@@ -236,51 +510,12 @@ def valider_demande(id):
         # Construire les paramètres pour l'envoi aux partenaires de la ville
         subject = "Nouvelle demande de location"
         ville = demande[4]
-        # Groupe: nombre de personnes si dispo, sinon inconnu
-        try:
-            groupe = int(demande[19]) if demande[19] is not None else None
-        except Exception:
-            groupe = None
-        if not groupe:
-            groupe = "?"
-
-        # Itinéraire (strecke): préférer la colonne 'villes' si disponible, sinon la ville simple
-        strecke = demande[14] if demande[14] else ville
-
-        # Distance (entfernung): inconnue par défaut
-        entfernung = "N/A"
-
-        # Fahrten: liste (date, heure). On utilise date_debut si dispo.
-        # Construire les trajets: si période (date_debut/date_fin) → un départ par jour à 08:30
-        dd = demande[5]  # date_debut
-        df = demande[6]  # date_fin
-        dv = demande[11]  # date_voyage fallback
-        fahrten = []
-        default_time = "08:30"
-        try:
-            if dd and df:
-                d0 = datetime.strptime(dd, '%Y-%m-%d').date()
-                d1 = datetime.strptime(df, '%Y-%m-%d').date()
-                if d1 >= d0:
-                    cur = d0
-                    while cur <= d1:
-                        fahrten.append((cur.isoformat(), default_time))
-                        cur += timedelta(days=1)
-            elif dd or dv:
-                d = dd or dv
-                fahrten.append((d, default_time))
-        except Exception:
-            pass
-        if not fahrten:
-            fahrten = [("Date à confirmer", default_time)]
+        groupe, strecke, entfernung, fahrten, stunden_pro_tag = _partner_email_facts(demande)
 
-        # Temps estimé par jour
-        stunden_pro_tag = "à définir"
+        # Envoi asynchrone aux partenaires de la ville (outbox)
+        outbox_ids = send_email_async(id, ville, subject, groupe, strecke, entfernung, fahrten, stunden_pro_tag, conn)
 
-        # Envoi asynchrone aux partenaires de la ville
-        send_email_async(ville, subject, groupe, strecke, entfernung, fahrten, stunden_pro_tag, conn)
-
-        return jsonify({"message": "Demande validée et emails envoyés"})
+        return jsonify({"message": "Demande validée et emails envoyés", "outbox": outbox_ids})
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -296,33 +531,7 @@ def preview_email(id):
             return jsonify({"error": "Demande non trouvée"}), 404
 
         ville = demande[4]
-        # groupe (nb_personnes)
-        try:
-            groupe = int(demande[19]) if demande[19] is not None and str(demande[19]).strip().isdigit() else ""
-        except Exception:
-            groupe = ""
-        strecke = demande[14] if demande[14] else ville
-        entfernung = ""
-        dd = demande[5]
-        df = demande[6]
-        dv = demande[11]
-        default_time = "08:30"
-        fahrten = []
-        try:
-            if dd and df:
-                d0 = datetime.strptime(dd, '%Y-%m-%d').date()
-                d1 = datetime.strptime(df, '%Y-%m-%d').date()
-                if d1 >= d0:
-                    cur = d0
-                    while cur <= d1:
-                        fahrten.append((cur.isoformat(), default_time))
-                        cur += timedelta(days=1)
-            elif dd or dv:
-                d = dd or dv
-                fahrten.append((d, default_time))
-        except Exception:
-            pass
-        stunden_pro_tag = ""
+        groupe, strecke, entfernung, fahrten, stunden_pro_tag = _partner_email_facts(demande)
         # langue via pays
         # Déterminer la langue: d'abord via pays de la demande, sinon via pays des sous-traitants de la ville
         pays = demande[10] if len(demande) > 10 else ""
@@ -353,6 +562,7 @@ def preview_email(id):
         # Try AI composer first, fallback to template
         body_ai = None
         try:
+            from ai_email import compose_partner_email
             body_ai = compose_partner_email(lang, groupe, strecke, entfernung, fahrten, stunden_pro_tag)
         except Exception:
             body_ai = None
@@ -382,8 +592,8 @@ def send_email_with_body(id):
         subject = data.get("subject", "Nouvelle demande de location")
         if not body or not recipients:
             return jsonify({"error": "Body et destinataires requis"}), 400
-        # envoyer les emails
-        send_custom_body_bcc(recipients, subject, body)
+        # envoyer les emails (connexion SMTP partagée du service d'envoi)
+        email_status = send_custom_body_bcc(recipients, subject, body)
         # marquer la demande comme validée et historiser
         c = conn.cursor()
         c.execute("SELECT * FROM demandes WHERE id=?", (id,))
@@ -398,7 +608,7 @@ def send_email_with_body(id):
                        demande[5], demande[6], demande[7], demande[9]))
             conn.commit()
         c.close()
-        return jsonify({"message": "Email envoyé et demande validée"})
+        return jsonify({"message": "Email envoyé et demande validée", "email": email_status})
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -435,31 +645,49 @@ def supprimer_demande(id):
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def _run_fetch_job(progress, cancel_event):
+    try:
+        count = email_fetcher.fetch_emails(progress=progress, cancel_event=cancel_event)
+        print(f"[INFO] fetch_emails terminé: {count} demande(s) insérée(s)")
+        # Store status for UI
+        _record_fetch(count)
+        return count
+    finally:
+        close_thread_connection()
+
+# Un seul fetch actif à la fois; les clics suivants sont rattachés au job en cours
+fetch_jobs = FetchJobScheduler(_run_fetch_job)
+
 @app.route("/fetch_emails", methods=["POST"])
 def fetch_emails_route():
     try:
-        def run_fetch():
-            try:
-                count = email_fetcher.fetch_emails()
-                print(f"[INFO] fetch_emails terminé: {count} demande(s) insérée(s)")
-                # Store status for UI
-                from datetime import datetime as _dt
-                LAST_FETCH["mode"] = getattr(email_fetcher, "LAST_PARSE_MODE", None)
-                LAST_FETCH["inserted"] = count
-                LAST_FETCH["at"] = _dt.now().isoformat(timespec='seconds')
-            except Exception as e:
-                import traceback; traceback.print_exc()
-                print(f"[ERROR] fetch_emails a échoué: {e}")
-
-        Thread(target=run_fetch).start()
-        return jsonify({"message": "Récupération et traitement des emails en cours"})
+        job, coalesced = fetch_jobs.submit()
+        message = ("Récupération déjà en cours, demande rattachée au job actif" if coalesced
+                   else "Récupération et traitement des emails en cours")
+        return jsonify({"message": message, "job_id": job["id"], "coalesced": coalesced})
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route("/fetch_emails/<job_id>/cancel", methods=["POST"])
+def cancel_fetch(job_id):
+    if fetch_jobs.cancel(job_id):
+        return jsonify({"message": "Annulation demandée", "job_id": job_id})
+    if fetch_jobs.get(job_id) is None:
+        return jsonify({"error": "Job non trouvé"}), 404
+    return jsonify({"error": "Job déjà terminé"}), 409
+
 @app.route('/fetch_status', methods=['GET'])
 def fetch_status():
-    return jsonify(LAST_FETCH)
+    """Dernier résultat de fetch + job actif (ou dernier job, ou celui de ?job_id=) avec compteurs."""
+    job_id = request.args.get("job_id")
+    job = fetch_jobs.get(job_id) if job_id else fetch_jobs.latest()
+    if job_id and job is None:
+        return jsonify({"error": "Job non trouvé"}), 404
+    status = {**LAST_FETCH, "job": job}
+    if idle_service is not None:
+        status["idle_service"] = idle_service.status
+    return jsonify(status)
 
 @app.route("/demandes/filter", methods=["GET"])
 def filter_demandes():
@@ -627,17 +855,12 @@ def upload_sous_traitants():
             print(f"[DEBUG] Type de fichier non autorisé : {file.filename}")
             return jsonify({"error": "Type de fichier non autorisé. Utilisez .xlsx ou .xls"}), 400
 
-        # Sauvegarder le fichier temporairement
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        # Lire le fichier Excel
+        # Lire le fichier Excel directement depuis le flux de l'upload (pas de fichier temporaire)
         try:
-            df = pd.read_excel(filepath)
+            import pandas as pd
+            df = pd.read_excel(file.stream)
             print("[DEBUG] Colonnes trouvées dans le fichier Excel:", list(df.columns))
         except Exception as e:
-            os.remove(filepath)  # Supprimer le fichier temporaire
             print(f"[DEBUG] Erreur lors de la lecture du fichier Excel: {str(e)}")
             return jsonify({"error": f"Erreur lors de la lecture du fichier Excel: {str(e)}"}), 400
 
@@ -646,7 +869,6 @@ def upload_sous_traitants():
         missing_columns = [col for col in required_columns if col not in df.columns]
 
         if missing_columns:
-            os.remove(filepath)
             print(f"[DEBUG] Colonnes manquantes: {missing_columns}")
             return jsonify({
                 "error": f"Colonnes manquantes dans le fichier Excel: {', '.join(missing_columns)}",
@@ -654,53 +876,33 @@ def upload_sous_traitants():
                 "colonnes_trouvees": list(df.columns)
             }), 400
 
-        # Traiter les données et insérer en base
-        c = conn.cursor()
-        successful_inserts = 0
-        errors = []
-
-        for index, row in df.iterrows():
-            try:
-                # Nettoyer les données
-                nom_entreprise = str(row['Nom entreprise']).strip() if pd.notna(row['Nom entreprise']) else ""
-                site_internet = str(row['Site internet']).strip() if pd.notna(row['Site internet']) else ""
-                pays = str(row['Pays']).strip() if pd.notna(row['Pays']) else ""
-                ville = str(row['Ville']).strip() if pd.notna(row['Ville']) else ""
-                email = str(row['Email']).strip() if pd.notna(row['Email']) else ""
-                telephone = str(row['Téléphone']).strip() if pd.notna(row['Téléphone']) else ""
-
-                # Vérifier que les champs obligatoires ne sont pas vides
-                if not nom_entreprise or not email or not ville:
-                    error_message = f"Ligne {index + 2}: Nom entreprise, Email et Ville sont obligatoires"
-                    print(f"[DEBUG] {error_message}")
-                    errors.append(error_message)
-                    continue
-
-                # Vérifier si l'email existe déjà
-                c.execute("SELECT id FROM sous_traitants WHERE email = ?", (email,))
-                if c.fetchone():
-                    error_message = f"Ligne {index + 2}: Email {email} existe déjà"
-                    print(f"[DEBUG] {error_message}")
-                    errors.append(error_message)
-                    continue
-
-                # Insérer en base
-                c.execute("""INSERT INTO sous_traitants 
-                             (nom_entreprise, site_internet, pays, ville, email, telephone)
-                             VALUES (?, ?, ?, ?, ?, ?)""",
-                          (nom_entreprise, site_internet, pays, ville, email, telephone))
-                successful_inserts += 1
-
-            except Exception as e:
-                error_message = f"Ligne {index + 2}: Erreur lors de l'insertion - {str(e)}"
-                print(f"[DEBUG] {error_message}")
-                errors.append(error_message)
-
-        conn.commit()
-        c.close()
-
-        # Supprimer le fichier temporaire
-        os.remove(filepath)
+        # Nettoyer les données colonne par colonne: cellules vides -> "", sinon texte sans espaces autour
+        data = df[required_columns].astype(object)
+        data = data.where(data.notna(), "")
+        for col in required_columns:
+            data[col] = data[col].astype(str).str.strip()
+
+        # Champs obligatoires
+        incomplete = (data['Nom entreprise'] == "") | (data['Email'] == "") | (data['Ville'] == "")
+        errors = [(index, f"Ligne {index + 2}: Nom entreprise, Email et Ville sont obligatoires")
+                  for index in data.index[incomplete]]
+        data = data[~incomplete]
+
+        # Emails déjà en base (une recherche groupée) ou répétés plus haut dans le fichier
+        existing = db.existing_sous_traitant_emails(data['Email'])
+        duplicate = data['Email'].isin(existing) | data['Email'].duplicated(keep='first')
+        errors += [(index, f"Ligne {index + 2}: Email {email} existe déjà")
+                   for index, email in data['Email'][duplicate].items()]
+        data = data[~duplicate]
+
+        errors = [message for _, message in sorted(errors)]  # dans l'ordre des lignes du fichier
+        for message in errors:
+            print(f"[DEBUG] {message}")
+
+        # Insertion en une transaction (executemany)
+        successful_inserts = db.insert_sous_traitants_bulk(
+            data[required_columns].itertuples(index=False, name=None)
+        )
 
         print(f"[DEBUG] Import terminé: {successful_inserts} insérés, {len(errors)} erreurs")
         return jsonify({
@@ -825,4 +1027,9 @@ def credentials_status():
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
+    # Avec le reloader de debug, le script tourne dans deux processus: ne lancer le service que dans l'enfant
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_app()
+    BOOT_TIMINGS["total_ms"] = int((time.perf_counter() - _BOOT_T0) * 1000)
+    print(f"[BOOT] Démarrage: {BOOT_TIMINGS}")
     app.run(host="0.0.0.0", port=5001, debug=True)
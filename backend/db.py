@@ -2,23 +2,288 @@ import sqlite3
 import datetime
 import re
 import os
+import threading
 
-# Connexion globale à SQLite (chemin configurable)
+# Connexions SQLite (chemin configurable)
 DB_PATH = os.getenv("SQLITE_PATH", "demandes.db")
+# Réglages des connexions: attente sur verrou, cache de pages (en KiB), niveau de synchronisation
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+# Connexions libérées (fin de requête Flask, fin de job) gardées pour le thread suivant, PRAGMA déjà appliqués
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# Cache d'extraction: date_utilisation (ordre LRU) n'est réécrite que si elle date de plus de N minutes,
+# pour qu'un hit reste une simple lecture
+PARSE_CACHE_TOUCH_MINUTES = float(os.getenv("PARSE_CACHE_TOUCH_MINUTES", "10"))
 print(f"[BOOT] db.py version 2025-10-01 | DB_PATH={DB_PATH}")
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+
+_local = threading.local()
+_pool = []  # [(chemin de la base, connexion)]
+_pool_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Ouvre une connexion configurée: journal WAL (les lecteurs ne sont pas bloqués par un import en cours),
+    busy_timeout au lieu d'échouer immédiatement sur 'database is locked', synchronous/cache_size réglables."""
+    c = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0, check_same_thread=False)
+    try:
+        c.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.DatabaseError:
+        # ex: système de fichiers sans mémoire partagée
+        pass
+    c.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if SQLITE_SYNCHRONOUS in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        c.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    c.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    return c
+
+
+def _from_pool():
+    """Connexion libérée sur la base courante (DB_PATH), ou None; les autres bases sont fermées."""
+    found, stale = None, []
+    with _pool_lock:
+        while _pool and found is None:
+            path, c = _pool.pop()
+            if path == DB_PATH:
+                found = c
+            else:
+                stale.append(c)
+    for c in stale:
+        try:
+            c.close()
+        except Exception:
+            pass
+    return found
+
+
+def get_conn() -> sqlite3.Connection:
+    """Retourne la connexion propre au thread courant (reprise du pool, sinon ouverte au premier appel)."""
+    c = getattr(_local, "conn", None)
+    if c is None:
+        c = _from_pool() or _connect()
+        _local.conn = c
+        _local.path = DB_PATH
+    return c
+
+
+def close_thread_connection():
+    """Libère la connexion du thread courant: une transaction restée ouverte est annulée, puis la
+    connexion retourne au pool (fermée s'il est plein). La prochaine utilisation en reprend une."""
+    c = getattr(_local, "conn", None)
+    if c is None:
+        return
+    _local.conn = None
+    try:
+        if c.in_transaction:
+            c.rollback()
+        with _pool_lock:
+            if len(_pool) < SQLITE_POOL_SIZE:
+                _pool.append((_local.path, c))
+                return
+    except Exception:
+        pass
+    try:
+        c.close()
+    except Exception:
+        pass
+
+
+class _ThreadLocalConnection:
+    """Remplace l'ancienne connexion globale `conn`: chaque appel (cursor, execute, commit, ...)
+    est délégué à la connexion du thread appelant, si bien que les requêtes Flask, le thread
+    de fetch et les threads du mailer ne partagent jamais le même sqlite3.Connection."""
+
+    def __getattr__(self, name):
+        return getattr(get_conn(), name)
+
+    def close(self):
+        close_thread_connection()
+
+
+conn = _ThreadLocalConnection()
+
+# Bases déjà migrées dans ce processus: les instanciations suivantes de Database
+# (app, email_fetcher, ...) ne relisent pas schema_version.
+_MIGRATED = set()
+_MIGRATE_LOCK = threading.Lock()
+
 
 class Database:
     def __init__(self, db_path="demandes.db"):
-        self.conn = conn  # Utiliser la connexion globale
-        self.c = self.conn.cursor()
+        self.conn = conn  # Connexion par thread (voir _ThreadLocalConnection)
+        with _MIGRATE_LOCK:
+            if DB_PATH not in _MIGRATED:
+                self.migrate()
+                _MIGRATED.add(DB_PATH)
+
+    # --- Migrations versionnées ---
+    # Chaque migration (version, description, méthode) est appliquée une seule fois et
+    # enregistrée dans schema_version. Une migration qui retourne False est reportée: rien
+    # n'est enregistré et elle est retentée au démarrage suivant (les suivantes s'appliquent).
+    MIGRATIONS = [
+        (1, "tables de base et colonnes ajoutées", "_migration_1_schema_initial"),
+        (2, "index secondaires (filtres, tris, recherches par ville/email)", "_migration_2_index"),
+        (3, "point de reprise de synchronisation IMAP", "_migration_3_imap_sync"),
+        (4, "cache des résultats d'extraction NLP/IA", "_migration_4_parse_cache"),
+        (5, "file d'envoi durable des emails partenaires (outbox)", "_migration_5_outbox"),
+        (6, "email unique des sous-traitants (import en lot)", "_migration_6_sous_traitants_email_unique"),
+        (7, "messages IMAP en échec (reprise après le point de reprise)", "_migration_7_imap_echecs"),
+        (8, "date de réservation des emails de l'outbox (reprise des réservations expirées)",
+         "_migration_8_outbox_reservation"),
+    ]
+
+    def schema_version(self) -> int:
+        row = self.conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+
+    def applied_versions(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT version FROM schema_version")}
+
+    def migrate(self):
+        """Applique, dans l'ordre, les migrations pas encore enregistrées dans schema_version."""
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            date_application TEXT
+        );
+        """)
+        self.conn.commit()
+        applied = self.applied_versions()
+        for version, description, method in self.MIGRATIONS:
+            if version in applied:
+                continue
+            # Verrou d'écriture: un autre processus peut migrer en même temps
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version in self.applied_versions():
+                    self.conn.rollback()
+                    continue
+                if getattr(self, method)() is False:
+                    self.conn.rollback()
+                    print(f"[WARN] Migration {version} reportée: {description}")
+                    continue
+                self.conn.execute(
+                    "INSERT INTO schema_version (version, description, date_application) VALUES (?, ?, ?)",
+                    (version, description, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+                self.conn.commit()
+                print(f"[INFO] Migration {version} appliquée: {description}")
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _migration_1_schema_initial(self):
+        # Les bases créées avant schema_version ont déjà tout ou partie des colonnes:
+        # cette étape reste donc idempotente.
         self.create_tables()
         self.add_missing_columns()
         self.add_missing_columns_sous_traitants()
 
+    def _migration_2_index(self):
+        for stmt in [
+            "CREATE INDEX IF NOT EXISTS idx_demandes_ville ON demandes(ville)",
+            "CREATE INDEX IF NOT EXISTS idx_demandes_statut ON demandes(statut)",
+            "CREATE INDEX IF NOT EXISTS idx_demandes_periode ON demandes(date_debut, date_fin)",
+            "CREATE INDEX IF NOT EXISTS idx_demandes_date_enregistrement ON demandes(date_enregistrement)",
+            # même expression que le curseur keyset de GET /demandes
+            "CREATE INDEX IF NOT EXISTS idx_demandes_page ON demandes(COALESCE(date_enregistrement, ''), id)",
+            "CREATE INDEX IF NOT EXISTS idx_sous_traitants_ville ON sous_traitants(ville)",
+            "CREATE INDEX IF NOT EXISTS idx_sous_traitants_email ON sous_traitants(email)",
+            "CREATE INDEX IF NOT EXISTS idx_historique_date_action ON historique(date_action)",
+        ]:
+            self.conn.execute(stmt)
+
+    def _migration_3_imap_sync(self):
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS imap_sync (
+            mailbox TEXT PRIMARY KEY,
+            uidvalidity INTEGER,
+            last_uid INTEGER,
+            date_maj TEXT
+        );
+        """)
+
+    def _migration_4_parse_cache(self):
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS parse_cache (
+            cle TEXT PRIMARY KEY,
+            parser TEXT,
+            resultat TEXT,
+            taille INTEGER,
+            date_creation TEXT,
+            date_utilisation TEXT
+        );
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_utilisation ON parse_cache(date_utilisation)")
+
+    def _migration_5_outbox(self):
+        # statut: en_attente -> en_cours -> envoye, ou echec (lettre morte après OUTBOX_MAX_ATTEMPTS)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cle TEXT UNIQUE,
+            demande_id INTEGER,
+            langue TEXT,
+            destinataires TEXT,
+            sujet TEXT,
+            corps TEXT,
+            donnees TEXT,
+            statut TEXT DEFAULT 'en_attente',
+            tentatives INTEGER DEFAULT 0,
+            prochaine_tentative TEXT,
+            derniere_erreur TEXT,
+            date_creation TEXT,
+            date_envoi TEXT
+        );
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_statut ON outbox(statut, prochaine_tentative)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_demande ON outbox(demande_id)")
+
+    def _migration_6_sous_traitants_email_unique(self):
+        # Index partiel: plusieurs sous-traitants sans email restent possibles.
+        # Une base contenant déjà des doublons garde l'index simple (l'import les filtre quand même)
+        # et la migration est reportée: elle sera retentée une fois les doublons supprimés.
+        doublons = self.conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT email FROM sous_traitants WHERE email IS NOT NULL AND email <> ''
+                GROUP BY email HAVING COUNT(*) > 1
+            )
+        """).fetchone()[0]
+        if doublons:
+            print(f"[WARN] {doublons} email(s) de sous-traitants en double: index unique non créé")
+            return False
+        self.conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_sous_traitants_email_unique ON sous_traitants(email) "
+            "WHERE email IS NOT NULL AND email <> ''"
+        )
+
+    def _migration_7_imap_echecs(self):
+        # Messages en échec de récupération ou d'extraction: le point de reprise les dépasse,
+        # ils sont retentés d'après cette table jusqu'à IMAP_MAX_ATTEMPTS tentatives.
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS imap_echecs (
+            mailbox TEXT,
+            uidvalidity INTEGER,
+            uid INTEGER,
+            tentatives INTEGER DEFAULT 0,
+            derniere_erreur TEXT,
+            date_maj TEXT,
+            PRIMARY KEY (mailbox, uidvalidity, uid)
+        );
+        """)
+
+    def _migration_8_outbox_reservation(self):
+        # Un email en_cours dont la réservation a expiré (worker arrêté pendant l'envoi) est repris
+        # par claim_outbox; les lignes en_cours d'avant cette colonne (reserve_le NULL) sont reprises aussi.
+        cols = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if "reserve_le" not in cols:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN reserve_le TEXT")
+
     # --- Création des tables ---
     def create_tables(self):
-        self.c.execute("""
+        c = self.conn.cursor()
+        c.execute("""
         CREATE TABLE IF NOT EXISTS demandes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nom TEXT,
@@ -33,7 +298,7 @@ class Database:
         );
         """)
 
-        self.c.execute("""
+        c.execute("""
         CREATE TABLE IF NOT EXISTS sous_traitants (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nom TEXT,
@@ -42,7 +307,7 @@ class Database:
         );
         """)
 
-        self.c.execute("""
+        c.execute("""
         CREATE TABLE IF NOT EXISTS historique (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             demande_id INTEGER,
@@ -59,14 +324,17 @@ class Database:
             date_action TEXT
         );
         """)
+        c.close()
 
     # --- Vérifier si une colonne existe ---
     def column_exists(self, table_name, column_name):
-        self.c.execute(f"PRAGMA table_info({table_name})")
-        columns = [col[1] for col in self.c.fetchall()]
+        c = self.conn.cursor()
+        c.execute(f"PRAGMA table_info({table_name})")
+        columns = [col[1] for col in c.fetchall()]
+        c.close()
         return column_name in columns
 
-    # --- Ajouter les colonnes manquantes pour 'demandes' ---
+    # --- Ajouter les colonnes manquantes pour 'demandes' (migration 1) ---
     def add_missing_columns(self):
         for col, col_type in [
             ("date_enregistrement", "TEXT"),
@@ -81,10 +349,9 @@ class Database:
             ("nb_personnes", "INTEGER")
         ]:
             if not self.column_exists("demandes", col):
-                self.c.execute(f"ALTER TABLE demandes ADD COLUMN {col} {col_type}")
-        self.conn.commit()
+                self.conn.execute(f"ALTER TABLE demandes ADD COLUMN {col} {col_type}")
 
-    # --- Ajouter les colonnes manquantes pour 'sous_traitants' ---
+    # --- Ajouter les colonnes manquantes pour 'sous_traitants' (migration 1) ---
     def add_missing_columns_sous_traitants(self):
         # Ensure sous_traitants has the columns used by the API upload endpoint
         columns_to_add = [
@@ -99,17 +366,23 @@ class Database:
         for name, ctype in columns_to_add:
             if not self.column_exists("sous_traitants", name):
                 try:
-                    self.c.execute(f"ALTER TABLE sous_traitants ADD COLUMN {name} {ctype}")
+                    self.conn.execute(f"ALTER TABLE sous_traitants ADD COLUMN {name} {ctype}")
                 except Exception:
                     # Ignore if ALTER not applicable in some environments
                     pass
 
-
-
-        self.conn.commit()
-
     # --- Insert demande ---
-    def insert_demande(self, data):
+    INSERT_DEMANDE_QUERY = """
+        INSERT INTO demandes (
+            nom, prenom, telephone, ville, date_debut, date_fin,
+            type_vehicule, date_enregistrement, date_voyage, pays,
+            email, villes, adresses, type_voyage, infos_libres, corps_mail, nb_personnes
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+
+    @staticmethod
+    def _demande_params(data, date_enregistrement=None):
+        """Construit le tuple de paramètres de INSERT_DEMANDE_QUERY pour une demande."""
         def _to_csv(val):
             if isinstance(val, list):
                 return ", ".join([str(x) for x in val])
@@ -133,14 +406,7 @@ class Database:
                 pass
             return None
 
-        query = """
-        INSERT INTO demandes (
-            nom, prenom, telephone, ville, date_debut, date_fin,
-            type_vehicule, date_enregistrement, date_voyage, pays,
-            email, villes, adresses, type_voyage, infos_libres, corps_mail, nb_personnes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        self.c.execute(query, (
+        return (
             data.get("nom"),
             data.get("prenom"),
             data.get("telephone"),
@@ -148,7 +414,7 @@ class Database:
             data.get("date_debut"),
             data.get("date_fin"),
             data.get("type_vehicule"),
-            datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            date_enregistrement or datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             data.get("date_voyage"),
             data.get("pays"),
             data.get("email"),
@@ -158,8 +424,239 @@ class Database:
             data.get("infos_libres"),
             data.get("corps_mail"),
             _nb_personnes_to_int(data.get("nb_personnes"))
-        ))
+        )
+
+    def insert_demande(self, data):
+        self.conn.execute(self.INSERT_DEMANDE_QUERY, self._demande_params(data))
+        self.conn.commit()
+
+    # --- Insert demandes en lot ---
+    def insert_demandes_bulk(self, demandes, chunk_size=None) -> int:
+        """Insère un itérable de demandes via executemany.
+
+        Sans chunk_size, tout est écrit dans une seule transaction (un seul commit);
+        sinon un commit est fait toutes les chunk_size lignes pour borner la taille
+        de la transaction. En cas d'erreur, le lot en cours est annulé et l'exception remontée.
+        Retourne le nombre de demandes insérées.
+        """
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        inserted = 0
+        batch = []
+        try:
+            for data in demandes:
+                batch.append(self._demande_params(data, now))
+                if chunk_size and len(batch) >= chunk_size:
+                    self.conn.executemany(self.INSERT_DEMANDE_QUERY, batch)
+                    self.conn.commit()
+                    inserted += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany(self.INSERT_DEMANDE_QUERY, batch)
+            self.conn.commit()
+            inserted += len(batch)
+        except Exception:
+            self.conn.rollback()
+            raise
+        return inserted
+
+    # --- Import en lot des sous-traitants ---
+    def existing_sous_traitant_emails(self, emails, chunk_size=500):
+        """Sous-ensemble des emails déjà présents dans sous_traitants (requêtes IN par tranches)."""
+        emails = list(dict.fromkeys(e for e in emails if e))
+        found = set()
+        for i in range(0, len(emails), chunk_size):
+            chunk = emails[i:i + chunk_size]
+            rows = self.conn.execute(
+                f"SELECT email FROM sous_traitants WHERE email IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update(r[0] for r in rows)
+        return found
+
+    def insert_sous_traitants_bulk(self, rows) -> int:
+        """Insère des tuples (nom_entreprise, site_internet, pays, ville, email, telephone) via executemany,
+        dans une seule transaction. Un email déjà présent (index unique) est ignoré. Retourne le nombre inséré."""
+        try:
+            cur = self.conn.executemany("""
+                INSERT OR IGNORE INTO sous_traitants
+                (nom_entreprise, site_internet, pays, ville, email, telephone)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            inserted = cur.rowcount
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return inserted
+
+    # --- Point de reprise IMAP (dernier UID traité par boîte) ---
+    def get_sync_checkpoint(self, mailbox):
+        """Retourne (uidvalidity, last_uid) pour la boîte, ou None si jamais synchronisée."""
+        row = self.conn.execute(
+            "SELECT uidvalidity, last_uid FROM imap_sync WHERE mailbox = ?", (mailbox,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save_sync_checkpoint(self, mailbox, uidvalidity, last_uid):
+        self.conn.execute("""
+            INSERT INTO imap_sync (mailbox, uidvalidity, last_uid, date_maj) VALUES (?, ?, ?, ?)
+            ON CONFLICT(mailbox) DO UPDATE SET
+                uidvalidity = excluded.uidvalidity,
+                last_uid = excluded.last_uid,
+                date_maj = excluded.date_maj
+        """, (mailbox, uidvalidity, last_uid, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        self.conn.commit()
+
+    def get_sync_failures(self, mailbox, uidvalidity):
+        """Retourne {uid: tentatives} des messages en échec pour ce UIDVALIDITY; les échecs
+        enregistrés sous un autre UIDVALIDITY (UID réattribués) sont supprimés."""
+        self.conn.execute(
+            "DELETE FROM imap_echecs WHERE mailbox = ? AND uidvalidity <> ?", (mailbox, uidvalidity)
+        )
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT uid, tentatives FROM imap_echecs WHERE mailbox = ? AND uidvalidity = ?", (mailbox, uidvalidity)
+        ).fetchall()
+        return {uid: tentatives for uid, tentatives in rows}
+
+    def record_sync_failures(self, mailbox, uidvalidity, errors) -> dict:
+        """Incrémente les tentatives des UID en échec (errors: {uid: message}); retourne {uid: tentatives}."""
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.conn.executemany("""
+            INSERT INTO imap_echecs (mailbox, uidvalidity, uid, tentatives, derniere_erreur, date_maj)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(mailbox, uidvalidity, uid) DO UPDATE SET
+                tentatives = tentatives + 1,
+                derniere_erreur = excluded.derniere_erreur,
+                date_maj = excluded.date_maj
+        """, [(mailbox, uidvalidity, uid, str(err)[:500], now) for uid, err in errors.items()])
+        self.conn.commit()
+        return {uid: n for uid, n in self.get_sync_failures(mailbox, uidvalidity).items() if uid in errors}
+
+    def clear_sync_failures(self, mailbox, uidvalidity, uids):
+        self.conn.executemany(
+            "DELETE FROM imap_echecs WHERE mailbox = ? AND uidvalidity = ? AND uid = ?",
+            [(mailbox, uidvalidity, uid) for uid in uids]
+        )
+        self.conn.commit()
+
+    # --- Cache des résultats d'extraction (clé = hash du corps + parser + version + modèle) ---
+    def get_parse_result(self, key):
+        """Retourne le résultat JSON mis en cache pour cette clé, ou None.
+        La date d'utilisation n'est mise à jour (écriture + commit) que si elle date de plus de
+        PARSE_CACHE_TOUCH_MINUTES: l'éviction LRU a cette granularité."""
+        row = self.conn.execute(
+            "SELECT resultat, date_utilisation FROM parse_cache WHERE cle = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = datetime.datetime.now()
+        seuil = (now - datetime.timedelta(minutes=PARSE_CACHE_TOUCH_MINUTES)).strftime('%Y-%m-%d %H:%M:%S.%f')
+        if (row[1] or "") <= seuil:
+            self.conn.execute(
+                "UPDATE parse_cache SET date_utilisation = ? WHERE cle = ?",
+                (now.strftime('%Y-%m-%d %H:%M:%S.%f'), key)
+            )
+            self.conn.commit()
+        return row[0]
+
+    def save_parse_result(self, key, parser, result_json, max_bytes=None):
+        """Enregistre un résultat puis, si max_bytes est donné, évince les entrées les moins
+        récemment utilisées jusqu'à ce que la taille totale du cache repasse sous la limite."""
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        self.conn.execute("""
+            INSERT OR REPLACE INTO parse_cache (cle, parser, resultat, taille, date_creation, date_utilisation)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (key, parser, result_json, len(result_json.encode('utf-8')), now, now))
+        if max_bytes:
+            self.conn.execute("""
+                DELETE FROM parse_cache WHERE cle IN (
+                    SELECT cle FROM (
+                        SELECT cle, SUM(taille) OVER (ORDER BY date_utilisation DESC, cle) AS cumul
+                        FROM parse_cache
+                    ) WHERE cumul > ?
+                )
+            """, (max_bytes,))
+        self.conn.commit()
+
+    # --- File d'envoi durable (outbox) ---
+    OUTBOX_COLUMNS = ["id", "cle", "demande_id", "langue", "destinataires", "sujet", "corps", "donnees",
+                      "statut", "tentatives", "prochaine_tentative", "derniere_erreur", "date_creation", "date_envoi",
+                      "reserve_le"]
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def enqueue_outbox(self, cle, demande_id, langue, destinataires, sujet, corps=None, donnees=None):
+        """Ajoute un email à la file; une clé déjà présente (même demande et langue) n'est pas dupliquée.
+        destinataires et donnees sont des chaînes JSON. Retourne (id, True si créé)."""
+        now = self._now()
+        cur = self.conn.execute("""
+            INSERT INTO outbox (cle, demande_id, langue, destinataires, sujet, corps, donnees,
+                                statut, tentatives, prochaine_tentative, date_creation)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'en_attente', 0, ?, ?)
+            ON CONFLICT(cle) DO NOTHING
+        """, (cle, demande_id, langue, destinataires, sujet, corps, donnees, now, now))
+        created = cur.rowcount == 1
         self.conn.commit()
+        row = self.conn.execute("SELECT id FROM outbox WHERE cle = ?", (cle,)).fetchone()
+        return row[0], created
+
+    def claim_outbox(self, limit=10, lease_seconds=600):
+        """Réserve (statut en_cours, reserve_le = maintenant) les emails dont la prochaine tentative est échue,
+        ainsi que les emails en_cours dont la réservation date de plus de lease_seconds (worker arrêté
+        pendant l'envoi), et les retourne (dicts, avec le statut lu avant la réservation)."""
+        now = datetime.datetime.now()
+        expired = (now - datetime.timedelta(seconds=lease_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        now = now.strftime('%Y-%m-%d %H:%M:%S')
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(f"""
+                SELECT {", ".join(self.OUTBOX_COLUMNS)} FROM outbox
+                WHERE (statut = 'en_attente' AND prochaine_tentative <= ?)
+                   OR (statut = 'en_cours' AND (reserve_le IS NULL OR reserve_le <= ?))
+                ORDER BY prochaine_tentative, id LIMIT ?
+            """, (now, expired, limit)).fetchall()
+            if rows:
+                self.conn.executemany("UPDATE outbox SET statut = 'en_cours', reserve_le = ? WHERE id = ?",
+                                      [(now, r[0]) for r in rows])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return [dict(zip(self.OUTBOX_COLUMNS, r)) for r in rows]
+
+    def update_outbox(self, outbox_id, **fields):
+        """Met à jour les colonnes données (statut, corps, tentatives, derniere_erreur, ...)."""
+        cols = [c for c in fields if c in self.OUTBOX_COLUMNS and c != "id"]
+        if not cols:
+            return
+        self.conn.execute(f"UPDATE outbox SET {', '.join(c + ' = ?' for c in cols)} WHERE id = ?",
+                          [fields[c] for c in cols] + [outbox_id])
+        self.conn.commit()
+
+    def get_outbox(self, outbox_id):
+        row = self.conn.execute(f"SELECT {', '.join(self.OUTBOX_COLUMNS)} FROM outbox WHERE id = ?",
+                                (outbox_id,)).fetchone()
+        return dict(zip(self.OUTBOX_COLUMNS, row)) if row else None
+
+    def list_outbox(self, statut=None, demande_id=None, limit=100):
+        where, params = [], []
+        if statut:
+            where.append("statut = ?")
+            params.append(statut)
+        if demande_id is not None:
+            where.append("demande_id = ?")
+            params.append(demande_id)
+        sql = f"SELECT {', '.join(self.OUTBOX_COLUMNS)} FROM outbox"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self.conn.execute(sql, params + [limit]).fetchall()
+        return [dict(zip(self.OUTBOX_COLUMNS, r)) for r in rows]
+
+    def outbox_counts(self):
+        return dict(self.conn.execute("SELECT statut, COUNT(*) FROM outbox GROUP BY statut").fetchall())
 
     # --- Copier nom dans nom_entreprise si vide ---
     def sync_sous_traitants_nom(self):
@@ -168,5 +665,23 @@ class Database:
 
     # --- Fermer la connexion ---
     def close(self):
-        self.c.close()
-        self.conn.close()
+        close_thread_connection()
+
+
+class LazyDatabase:
+    """Database partagée d'un module, créée (et la base migrée) au premier accès: importer app,
+    email_fetcher ou outbox n'ouvre aucune connexion. Voir app.init_app pour la migration au démarrage."""
+
+    def __init__(self):
+        self._db = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Database:
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = Database()
+        return self._db
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -1,21 +1,61 @@
 import imaplib
 import email
 import re
-import html as html_module
-from db import Database
-from nlp_parser import extraire_infos as extraire_infos_nlp
+import hashlib
+import json
+import random
+import select
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from db import LazyDatabase, close_thread_connection
+from html_text import html_to_text as _html_to_text
 try:
-    from ai_parser import extraire_infos_ai
+    import ai_parser as ai_parser_module
+    from ai_parser import extraire_infos_ai, extraire_infos_ai_many
 except Exception:
+    ai_parser_module = None
     extraire_infos_ai = None
+    extraire_infos_ai_many = None
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 IMAP_SERVER_DEFAULT = "imap.gmail.com"
+# Nombre de demandes par commit lors de l'insertion en lot (0 = une seule transaction par fetch)
+FETCH_COMMIT_EVERY = int(os.getenv("FETCH_COMMIT_EVERY", "0"))
+# Pipeline de fetch: messages par FETCH IMAP, threads d'extraction, messages en attente max
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "25"))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+FETCH_MAX_IN_FLIGHT = int(os.getenv("FETCH_MAX_IN_FLIGHT", str(FETCH_WORKERS * 4)))
+# Mode NLP seul: messages regroupés par tâche pour un passage nlp.pipe commun (1 = pas de regroupement)
+FETCH_NLP_BATCH = int(os.getenv("FETCH_NLP_BATCH", "16"))
+# Mode IA: messages par tâche, extraits par requêtes LLM concurrentes (voir ai_parser.AI_CONCURRENCY)
+FETCH_AI_BATCH = int(os.getenv("FETCH_AI_BATCH", "8"))
+# Cache des extractions (désactivable) et taille maximale en Mo avant éviction LRU
+PARSE_CACHE_ENABLED = (os.getenv("PARSE_CACHE", "true").lower() in ("1", "true", "yes", "y"))
+PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "50"))
+# Synchronisation incrémentale: 'uid' (point de reprise UID/UIDVALIDITY) ou 'unseen' (ancien mode)
+IMAP_MAILBOX = os.getenv("IMAP_MAILBOX", "inbox")
+IMAP_SYNC_MODE = os.getenv("IMAP_SYNC_MODE", "uid").lower()
+# Un message en échec est retenté aux synchronisations suivantes, puis abandonné après ce nombre de tentatives
+IMAP_MAX_ATTEMPTS = int(os.getenv("IMAP_MAX_ATTEMPTS", "5"))
+# Téléchargement: 'rfc822' (message complet) ou 'parts' (BODYSTRUCTURE puis seules les parties
+# text/plain et text/html, tronquées à IMAP_BODY_MAX_BYTES octets chacune; 0 = sans limite)
+IMAP_FETCH_MODE = os.getenv("IMAP_FETCH_MODE", "rfc822").lower()
+IMAP_BODY_MAX_BYTES = int(os.getenv("IMAP_BODY_MAX_BYTES", str(256 * 1024)))
 LAST_PARSE_MODE = "nlp"  # updated each fetch: 'ai' or 'nlp'
 
+
+def _nlp_parser():
+    """nlp_parser (spaCy, dateparser, langdetect) n'est importé qu'à la première extraction NLP,
+    pour ne pas alourdir le démarrage de l'API (voir nlp_parser.warmup pour le préchargement)."""
+    import nlp_parser
+    return nlp_parser
+
 def _load_openai_from_credentials_file() -> bool:
     """Load OPENAI_API_KEY, OPENAI_MODEL and optional flags from credentials.txt into environment if present."""
     try:
@@ -164,8 +204,8 @@ def _get_credentials():
             pass
     return None, None, imap_server
 
-# Créer une instance de la classe Database
-db = Database()
+# Instance partagée de Database, créée au premier accès (pas de migration à l'import)
+db = LazyDatabase()
 
 def _extract_email_from_header(header_val: str) -> str:
     if not header_val:
@@ -175,210 +215,885 @@ def _extract_email_from_header(header_val: str) -> str:
     return m.group(0) if m else ""
 
 
-def fetch_emails() -> int:
-    """Récupère les emails non lus, extrait les demandes, insère via Database.
+# --- Décodage MIME ---
+def _is_attachment(part) -> bool:
+    try:
+        cd = (part.get("Content-Disposition") or "").lower()
+        if 'attachment' in cd:
+            return True
+        filename = part.get_filename()
+        return bool(filename)
+    except Exception:
+        return False
+
+
+def _decode_payload(part) -> str:
+    try:
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            return ""
+        charset = part.get_content_charset() or "utf-8"
+        for enc in [charset, 'utf-8', 'latin-1', 'windows-1252']:
+            try:
+                return payload.decode(enc, errors='ignore')
+            except Exception:
+                continue
+        return payload.decode(errors='ignore')
+    except Exception:
+        return ""
+
+
+def _is_meaningful(s: str) -> bool:
+    s = (s or '').strip()
+    if len(s) < 30:
+        return False
+    # doit contenir quelques lettres
+    return bool(re.search(r'[A-Za-zÀ-ÿ]{5,}', s))
+
+
+def _choose_body(body: str, html_body: str) -> str:
+    """Heuristique: si text/plain est vide ou anémique, utiliser le HTML converti."""
+    if html_body:
+        html_text = _html_to_text(html_body)
+        if not _is_meaningful(body) or (len(html_text) > len(body) * 2):
+            return html_text
+    return body
+
+
+def _extract_body(msg) -> str:
+    """Récupère le corps de l'email (texte brut prioritaire, sinon HTML converti)."""
+    body = ""
+    html_body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            ctype = (part.get_content_type() or '').lower()
+            if _is_attachment(part):
+                continue
+            if ctype == "text/plain":
+                text = _decode_payload(part)
+                if text:
+                    body += text
+            elif ctype == "text/html":
+                text = _decode_payload(part)
+                if text:
+                    html_body += text
+    else:
+        ctype = (msg.get_content_type() or '').lower()
+        part = msg
+        if ctype == "text/plain" and not _is_attachment(part):
+            body = _decode_payload(part)
+        elif ctype == "text/html" and not _is_attachment(part):
+            html_body = _decode_payload(part)
+    return _choose_body(body, html_body)
+
+
+# --- Cache des extractions ---
+def _normalize_body(body: str) -> str:
+    """Forme normalisée servant au hash: fins de ligne, espaces et lignes vides comme clean_text,
+    sans toucher à la structure en blocs qui conditionne l'extraction."""
+    text = (body or "").replace("\r\n", "\n").replace("\r", "\n")
+    lines = [re.sub(r"[ \t\x0b\x0c]+", " ", ln).strip() for ln in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _parse_cache_key(body: str, mode: str) -> str:
+    if mode == "ai":
+        version = getattr(ai_parser_module, "PARSER_VERSION", "")
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    else:
+        nlp_parser = _nlp_parser()
+        version = getattr(nlp_parser, "PARSER_VERSION", "")
+        model = ",".join(getattr(nlp_parser, "SPACY_MODELS", {}).values())
+    h = hashlib.sha256(_normalize_body(body).encode("utf-8")).hexdigest()
+    return f"{mode}:{version}:{model}:{h}"
+
+
+def _parse_isolated(bodies, parse_many_fn):
+    """parse_many_fn(corps) avec un échec limité au message concerné: si l'appel groupé lève,
+    les corps sont repris un par un et chaque exception prend la place de son message."""
+    try:
+        return parse_many_fn(bodies)
+    except Exception as e:
+        if len(bodies) <= 1:
+            return [e] * len(bodies)
+        print(f"[WARN] Extraction groupée échouée ({e}), reprise message par message")
+    results = []
+    for body in bodies:
+        try:
+            results.append(parse_many_fn([body])[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _cached_parse_many(bodies, mode: str, parse_many_fn):
+    """Exécute parse_many_fn(corps) sur les seuls corps absents du cache; retourne une liste alignée sur bodies.
+    parse_many_fn peut renvoyer une exception pour un corps: elle est transmise telle quelle, sans mise en cache
+    (de même si l'appel groupé lève, voir _parse_isolated)."""
+    if not PARSE_CACHE_ENABLED:
+        return _parse_isolated(bodies, parse_many_fn)
+    results = [None] * len(bodies)
+    misses = []
+    for i, body in enumerate(bodies):
+        key = _parse_cache_key(body, mode)
+        try:
+            cached = db.get_parse_result(key)
+            if cached is not None:
+                print(f"[INFO] Parse cache hit ({mode})")
+                results[i] = json.loads(cached)
+                continue
+        except Exception as e:
+            print(f"[WARN] Lecture du cache d'extraction impossible: {e}")
+        misses.append((i, key))
+    if misses:
+        parsed = _parse_isolated([bodies[i] for i, _ in misses], parse_many_fn)
+        for (i, key), demandes in zip(misses, parsed):
+            results[i] = demandes
+            if isinstance(demandes, Exception):
+                continue
+            try:
+                db.save_parse_result(key, mode, json.dumps(demandes, ensure_ascii=False),
+                                     max_bytes=int(PARSE_CACHE_MAX_MB * 1024 * 1024))
+            except Exception as e:
+                print(f"[WARN] Écriture du cache d'extraction impossible: {e}")
+    return results
+
+
+# --- Extraction et sélection des demandes ---
+def _ai_enabled() -> bool:
+    # Prefer AI parsing if OPENAI_API_KEY is configured
+    return bool((os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_TOKEN")) and extraire_infos_ai)
+
+
+def _score_demande(d: dict) -> int:
+    score = 0
+    if d.get('email'): score += 2
+    if d.get('telephone'): score += 2
+    if d.get('ville'): score += 2
+    if d.get('date_debut'): score += 2
+    if d.get('date_fin'): score += 1
+    if d.get('type_vehicule'): score += 1
+    if d.get('nb_personnes'): score += 1
+    return score
+
+
+def _unique_key(d: dict):
+    return (
+        (d.get('email') or '').lower().strip(),
+        re.sub(r'\D', '', d.get('telephone') or ''),
+        (d.get('ville') or '').lower().strip(),
+        d.get('date_debut') or '',
+        d.get('date_fin') or '',
+    )
+
+
+def _select_demandes(demandes):
+    """Post-process: by default, avoid inserting multiple demandes per email."""
+    raw_count = len(demandes)
+    allow_multi = (os.getenv('ALLOW_MULTIPLE_DEMANDES_PER_EMAIL', 'false').lower() in ('1', 'true', 'yes', 'y'))
+
+    # de-duplicate likely duplicates
+    uniq = []
+    seen = set()
+    for d in demandes:
+        k = _unique_key(d)
+        if k not in seen:
+            seen.add(k)
+            uniq.append(d)
+
+    if not allow_multi and uniq:
+        # pick the best single demande
+        uniq.sort(key=lambda d: (_score_demande(d), len((d.get('infos_libres') or d.get('corps_mail') or ''))), reverse=True)
+        demandes = [uniq[0]]
+    else:
+        demandes = uniq
+    print(f"[INFO] Selected demandes: {len(demandes)} from extracted {raw_count} (allow_multiple={allow_multi})")
+    return demandes
+
+
+def _decode_message(raw_email: bytes):
+    """Décodage MIME: retourne (corps texte, email de l'expéditeur, sujet)."""
+    msg = email.message_from_bytes(raw_email)
+    return _extract_body(msg), _extract_email_from_header(msg.get('From', '')), msg.get('Subject', '')
+
+
+def _finalize_demandes(demandes, body: str, sender_email: str, subject: str):
+    """Sélection puis complétion des demandes extraites d'un message."""
+    demandes = _select_demandes(demandes)
+    for d in demandes:
+        # fallback email depuis l'entête si manquant
+        if not d.get('email') and sender_email:
+            d['email'] = sender_email
+        # ajouter sujet dans infos_libres si utile
+        if subject and 'infos_libres' in d and subject not in d['infos_libres']:
+            d['infos_libres'] = f"Subject: {subject}\n\n" + d['infos_libres']
+        # toujours conserver le corps complet
+        d['corps_mail'] = body
+    return demandes
+
+
+def _process_messages_nlp(raw_emails):
+    """Mode NLP seul: décodage MIME puis extraction des corps absents du cache
+    ensemble (extraire_infos_batch: un nlp.pipe par langue pour tous les blocs du lot).
+    Retourne, par message, (demandes, mode) ou l'exception qui le concerne seul."""
+    decoded = []
+    for raw_email in raw_emails:
+        try:
+            decoded.append(_decode_message(raw_email))
+        except Exception as e:
+            decoded.append(e)
+    ok = [d for d in decoded if not isinstance(d, Exception)]
+    parsed = iter(_cached_parse_many([d[0] for d in ok], "nlp", _nlp_parser().extraire_infos_batch))
+    results = []
+    for d in decoded:
+        demandes = d if isinstance(d, Exception) else next(parsed)
+        if isinstance(demandes, Exception):
+            results.append(demandes)
+        else:
+            results.append((_finalize_demandes(demandes, *d), "nlp"))
+    return results
+
+
+def _process_messages_ai(raw_emails):
+    """Mode IA: les corps absents du cache sont envoyés ensemble au LLM (requêtes concurrentes,
+    extraire_infos_ai_many); chaque échec retombe sur le NLP, en un seul lot pour ces messages.
+    Un message en échec avec l'IA puis le NLP est retourné comme exception, sans affecter les autres."""
+    decoded = []
+    for raw_email in raw_emails:
+        try:
+            decoded.append(_decode_message(raw_email))
+        except Exception as e:
+            decoded.append(e)
+    ok = [d for d in decoded if not isinstance(d, Exception)]
+    parsed = _cached_parse_many([d[0] for d in ok], "ai", extraire_infos_ai_many)
+    failed = [i for i, p in enumerate(parsed) if isinstance(p, Exception)]
+    if failed:
+        print(f"[WARN] AI parsing failed for {len(failed)}/{len(ok)} message(s), falling back to NLP: {parsed[failed[0]]}")
+        fallback = _cached_parse_many([ok[i][0] for i in failed], "nlp", _nlp_parser().extraire_infos_batch)
+        for i, demandes in zip(failed, fallback):
+            parsed[i] = demandes
+    failed_set = set(failed)
+    modes = ["nlp" if i in failed_set else "ai" for i in range(len(ok))]
+    print(f"[INFO] Parsed with AI: {modes.count('ai')}, NLP fallback: {modes.count('nlp')}")
+    parsed = iter(zip(parsed, modes))
+    results = []
+    for d in decoded:
+        demandes, mode = (d, None) if isinstance(d, Exception) else next(parsed)
+        if isinstance(demandes, Exception):
+            results.append(demandes)
+        else:
+            results.append((_finalize_demandes(demandes, *d), mode))
+    return results
+
+
+# --- Récupération IMAP par lots ---
+def _fetch_raw_batches(mail, uids, batch_size: int):
+    """Génère (uid, octets RFC822) dans l'ordre des UID en récupérant les messages par plages: un seul
+    UID FETCH par lot. Un message non récupéré (FETCH échoué ou absent de la réponse) est généré avec None
+    (compté en échec par sync_mailbox)."""
+    for i in range(0, len(uids), batch_size):
+        batch = uids[i:i + batch_size]
+        fetched = _fetch_raw(mail, batch)
+        for uid in batch:
+            yield uid, fetched.get(uid)
+
+
+def _fetch_raw(mail, uids) -> dict:
+    """{uid: octets RFC822} des messages renvoyés par un UID FETCH (RFC822)."""
+    status, data = mail.uid('FETCH', ",".join(str(u) for u in uids), '(RFC822)')
+    if status != 'OK' or not data:
+        print(f"[WARN] FETCH des UID {uids[0]}..{uids[-1]} échoué: {status}")
+        return {}
+    fetched = {}
+    for segments in _split_fetch_responses(data):
+        # UID avant ou après le littéral: b'12 (UID 345 RFC822 {3456}' ou b'12 (RFC822 {3456}', ..., b' UID 345)'
+        m = re.search(rb"UID (\d+)", b"".join(seg for seg in segments if isinstance(seg, bytes)))
+        literal = next((seg[1] for seg in segments if isinstance(seg, tuple)), None)
+        if m and literal is not None:
+            fetched[int(m.group(1))] = literal
+    return fetched
+
+
+def _split_fetch_responses(data):
+    """Regroupe les éléments renvoyés par imaplib pour un FETCH en réponses (une par message).
+    Chaque réponse est une liste de segments: octets de texte ou ('lit', octets) pour un littéral."""
+    responses = []
+    for item in data or []:
+        if isinstance(item, tuple):
+            head, literal = item[0], item[1]
+        else:
+            head, literal = item, None
+        if not isinstance(head, bytes):
+            continue
+        if re.match(rb"\d+ \(", head) or not responses:
+            responses.append([])
+        responses[-1].append(head)
+        if literal is not None:
+            responses[-1].append(('lit', literal))
+    return responses
+
+
+def _response_text(segments) -> bytes:
+    """Texte d'une réponse FETCH, littéraux réinsérés en chaînes entre guillemets (pour BODYSTRUCTURE)."""
+    out = b""
+    for seg in segments:
+        if isinstance(seg, tuple):
+            out = re.sub(rb"\{\d+\}$", b"", out)
+            out += b'"' + seg[1].replace(b"\\", b"\\\\").replace(b'"', b'\\"') + b'"'
+        else:
+            out += seg
+    return out
+
+
+def _parse_sexp(data: bytes):
+    """Analyse une expression parenthésée IMAP: listes Python, chaînes (str), None pour NIL."""
+    tokens = re.findall(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+', data)
+    stack = [[]]
+    for tok in tokens:
+        if tok == b"(":
+            stack.append([])
+        elif tok == b")":
+            if len(stack) == 1:
+                break
+            done = stack.pop()
+            stack[-1].append(done)
+        elif tok.startswith(b'"'):
+            stack[-1].append(re.sub(rb"\\(.)", rb"\1", tok[1:-1]).decode("utf-8", "replace"))
+        else:
+            stack[-1].append(None if tok.upper() == b"NIL" else tok.decode("ascii", "replace"))
+    return stack[0]
+
+
+def _bodystructure_of(segments):
+    """(uid, arbre BODYSTRUCTURE) d'une réponse FETCH, ou (uid, None) si illisible."""
+    text = _response_text(segments)
+    m_uid = re.search(rb"UID (\d+)", text)
+    uid = int(m_uid.group(1)) if m_uid else None
+    idx = text.find(b"BODYSTRUCTURE ")
+    if idx < 0:
+        return uid, None
+    try:
+        parsed = _parse_sexp(text[idx + len(b"BODYSTRUCTURE "):])
+        return uid, (parsed[0] if parsed and isinstance(parsed[0], list) else None)
+    except Exception:
+        return uid, None
+
+
+def _params_dict(params) -> dict:
+    if not isinstance(params, list):
+        return {}
+    return {str(params[i]).lower(): params[i + 1] for i in range(0, len(params) - 1, 2)}
+
+
+def _leading_lists(bs):
+    # les sous-parties précèdent le sous-type; les extensions (paramètres, disposition) suivent
+    children = []
+    for p in bs:
+        if not isinstance(p, list):
+            break
+        children.append(p)
+    return children
+
+
+def _text_sections(bs, prefix=""):
+    """Parties text/plain et text/html hors pièces jointes: [(section, type, params, encodage)]."""
+    if bs and isinstance(bs[0], list):
+        # multipart: sous-parties puis sous-type; numérotation 1, 2, ... (1.1, 1.2 en imbriqué)
+        found = []
+        for i, child in enumerate(_leading_lists(bs), 1):
+            found += _text_sections(child, f"{prefix}{i}.")
+        return found
+    if len(bs) < 7 or not isinstance(bs[0], str):
+        return []
+    ctype = f"{bs[0]}/{bs[1]}".lower()
+    if ctype not in ("text/plain", "text/html"):
+        return []
+    params = _params_dict(bs[2])
+    # extensions d'une partie texte: md5 (8), disposition (9)
+    disposition = bs[9] if len(bs) > 9 and isinstance(bs[9], list) else None
+    if disposition and (str(disposition[0] or "").lower() == "attachment"
+                        or "filename" in _params_dict(disposition[1] if len(disposition) > 1 else None)):
+        return []
+    if "name" in params:
+        return []
+    return [(prefix.rstrip(".") or "1", ctype, params, (bs[5] or "7bit"))]
+
+
+def _build_text_message(headers: bytes, parts) -> bytes:
+    """Recompose un message MIME minimal (en-têtes From/Subject + parties texte) pour _decode_message."""
+    boundary = "==text-parts=="
+    out = [headers.rstrip(b"\r\n") + b"\r\n",
+           f'MIME-Version: 1.0\r\nContent-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode()]
+    for ctype, params, encoding, payload in parts:
+        ct = ctype + "".join(f'; {k}="{v}"' for k, v in params.items() if k == "charset")
+        out.append(f"--{boundary}\r\nContent-Type: {ct}\r\nContent-Transfer-Encoding: {encoding}\r\n\r\n".encode())
+        out.append(payload + b"\r\n")
+    out.append(f"--{boundary}--\r\n".encode())
+    return b"".join(out)
+
+
+def _fetch_text_batches(mail, uids, batch_size: int):
+    """Comme _fetch_raw_batches, mais sans pièces jointes: un UID FETCH BODYSTRUCTURE par lot, puis
+    BODY.PEEK des seules parties texte (tronquées à IMAP_BODY_MAX_BYTES). Un message dont la structure
+    est illisible est récupéré en entier (RFC822). Les messages sont générés dans l'ordre des UID,
+    avec None pour ceux qui n'ont pas pu être récupérés."""
+    for i in range(0, len(uids), batch_size):
+        batch = uids[i:i + batch_size]
+        fetched = _fetch_text(mail, batch)
+        for uid in batch:
+            yield uid, fetched.get(uid)
+
+
+def _fetch_text(mail, uids) -> dict:
+    """{uid: message MIME recomposé} pour un lot (voir _fetch_text_batches)."""
+    cap = f"<0.{IMAP_BODY_MAX_BYTES}>" if IMAP_BODY_MAX_BYTES > 0 else ""
+    status, data = mail.uid('FETCH', ",".join(str(u) for u in uids), '(BODYSTRUCTURE)')
+    if status != 'OK' or not data:
+        print(f"[WARN] FETCH BODYSTRUCTURE des UID {uids[0]}..{uids[-1]} échoué: {status}")
+        return {}
+    # messages regroupés par liste de sections identique: un seul FETCH par groupe
+    groups = {}
+    fallback = []
+    for segments in _split_fetch_responses(data):
+        uid, bs = _bodystructure_of(segments)
+        if uid is None:
+            continue
+        if bs is None:
+            fallback.append(uid)
+            continue
+        sections = tuple(_text_sections(bs))
+        groups.setdefault(tuple(sec for sec, _, _, _ in sections), []).append((uid, sections))
+    fetched = {}
+    for secs, members in groups.items():
+        items = ["BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)]"] + [f"BODY.PEEK[{sec}]{cap}" for sec in secs]
+        status, data = mail.uid('FETCH', ",".join(str(u) for u, _ in members), f"({' '.join(items)})")
+        if status != 'OK' or not data:
+            print(f"[WARN] FETCH des parties texte échoué: {status}")
+            continue
+        by_uid = {}
+        for segments in _split_fetch_responses(data):
+            m_uid = re.search(rb"UID (\d+)", b"".join(s for s in segments if isinstance(s, bytes)))
+            if not m_uid:
+                continue
+            headers, payloads, label = b"", {}, None
+            for seg in segments:
+                if isinstance(seg, tuple):
+                    if label == "HEADER":
+                        headers = seg[1]
+                    elif label is not None:
+                        payloads[label] = seg[1]
+                else:
+                    m = re.search(rb"BODY\[([^\]]*)\](?:<\d+>)? \{\d+\}$", seg)
+                    label = None if not m else ("HEADER" if m.group(1).startswith(b"HEADER") else m.group(1).decode())
+            by_uid[int(m_uid.group(1))] = (headers, payloads)
+        for uid, sections in members:
+            if uid not in by_uid:
+                continue
+            headers, payloads = by_uid[uid]
+            parts = [(ctype, params, enc, payloads.get(sec, b"")) for sec, ctype, params, enc in sections]
+            fetched[uid] = _build_text_message(headers, parts)
+    if fallback:
+        fetched.update(_fetch_raw(mail, fallback))
+    return fetched
+
+
+def _select_response_int(mail, code: str):
+    """Lit UIDVALIDITY/UIDNEXT renvoyés par SELECT (None si le serveur ne les fournit pas)."""
+    try:
+        typ, data = mail.response(code)
+        if data and data[0] is not None:
+            return int(data[0])
+    except Exception:
+        pass
+    return None
+
+
+def _search_uids(mail, checkpoint, uidvalidity):
+    """Retourne (uids à traiter, incrémental?).
+
+    Avec un point de reprise valide (même UIDVALIDITY), seuls les messages arrivés depuis
+    sont demandés (UID SEARCH UID n:*), lus ou non. Sinon (première synchro, UIDVALIDITY
+    changé ou IMAP_SYNC_MODE=unseen), on retombe sur la recherche UNSEEN historique.
+    """
+    if checkpoint and uidvalidity is not None and checkpoint[0] == uidvalidity:
+        last_uid = checkpoint[1] or 0
+        status, data = mail.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+        uids = [int(u) for u in (data[0].split() if data and data[0] else [])]
+        # "n:*" renvoie toujours le dernier message, même si son UID est < n
+        return sorted(u for u in uids if u > last_uid), True
+    if checkpoint:
+        print(f"[INFO] UIDVALIDITY de {IMAP_MAILBOX} modifié, resynchronisation via UNSEEN")
+    status, data = mail.uid('SEARCH', None, 'UNSEEN')
+    return sorted(int(u) for u in (data[0].split() if data and data[0] else [])), False
+
+
+def _next_checkpoint(uids, reached, incremental, last_uid, uidnext):
+    """Calcule le nouveau dernier UID traité, ou None s'il ne faut pas l'enregistrer.
+
+    reached: UID parcourus (traités ou enregistrés en échec), None si toute la liste l'a été.
+    Les messages en échec ne bloquent pas le point de reprise: ils sont retentés d'après
+    imap_echecs. Après une annulation, il n'avance que sur la plage parcourue sans trou;
+    une première synchro (UNSEEN) annulée ne le pose pas.
+    """
+    if reached is None:
+        if not incremental:
+            return max([(uidnext or 1) - 1] + list(uids))
+        new_last = max([last_uid] + list(uids))
+        return new_last if new_last != last_uid else None
+    if not incremental:
+        return None
+    new_last = last_uid
+    for u in uids:
+        if u <= last_uid:
+            continue  # échec antérieur retenté
+        if u not in reached:
+            break
+        new_last = u
+    return new_last if new_last != last_uid else None
+
+
+def _connect_imap():
+    """Ouvre et authentifie une connexion IMAP (None si les identifiants manquent)."""
+    EMAIL, APP_PASSWORD, IMAP_SERVER = _get_credentials()
+    if not EMAIL or not APP_PASSWORD:
+        print("[ERROR] EMAIL ou APP_PASSWORD non configurés. Mettez-les dans .env ou via /save_credentials.")
+        return None
+
+    # Ensure OPENAI credentials are available from file if not in env
+    if not (os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_TOKEN")):
+        _load_openai_from_credentials_file()
+
+    mail = imaplib.IMAP4_SSL(IMAP_SERVER or IMAP_SERVER_DEFAULT)
+    mail.login(EMAIL, APP_PASSWORD)
+    return mail
+
+
+def _record_failures(uidvalidity, errors, ok_uids):
+    """Enregistre les échecs (tentatives + 1) et efface ceux des messages enfin traités."""
+    if ok_uids:
+        db.clear_sync_failures(IMAP_MAILBOX, uidvalidity, ok_uids)
+    if not errors:
+        return
+    for uid, attempts in sorted(db.record_sync_failures(IMAP_MAILBOX, uidvalidity, errors).items()):
+        if attempts >= IMAP_MAX_ATTEMPTS:
+            print(f"[ERROR] Message UID {uid} abandonné après {attempts} tentatives: {errors[uid]}")
+        else:
+            print(f"[WARN] Message UID {uid} en échec ({attempts}/{IMAP_MAX_ATTEMPTS}), retenté à la prochaine synchro")
+
+
+# Une seule synchronisation à la fois (fetch manuel et service IDLE partagent le point de reprise)
+_SYNC_LOCK = threading.Lock()
+
+
+def sync_mailbox(mail, progress=None, cancel_event=None) -> int:
+    """Synchronise IMAP_MAILBOX sur une connexion déjà authentifiée.
     Retourne le nombre de demandes insérées.
+
+    progress: dict optionnel mis à jour au fil de l'eau (total, fetched, parsed, inserted).
+    cancel_event: threading.Event optionnel; une fois levé, plus aucun lot n'est récupéré,
+    les messages déjà en cours sont terminés puis insérés (le point de reprise reste cohérent).
+
+    Pipeline: UID FETCH par lots sur une seule connexion IMAP -> pool de FETCH_WORKERS threads
+    (décodage MIME + extraction NLP/IA) -> écriture ordonnée (insertion en lot, \\Seen, point de reprise).
     """
     global LAST_PARSE_MODE
     inserted = 0
-    try:
-        EMAIL, APP_PASSWORD, IMAP_SERVER = _get_credentials()
-        if not EMAIL or not APP_PASSWORD:
-            print("[ERROR] EMAIL ou APP_PASSWORD non configurés. Mettez-les dans .env ou via /save_credentials.")
-            return inserted
+    with _SYNC_LOCK:
+        mail.select(IMAP_MAILBOX)
+        uidvalidity = _select_response_int(mail, 'UIDVALIDITY')
+        uidnext = _select_response_int(mail, 'UIDNEXT')
+
+        checkpoint = db.get_sync_checkpoint(IMAP_MAILBOX) if IMAP_SYNC_MODE == "uid" else None
+        uids, incremental = _search_uids(mail, checkpoint, uidvalidity)
+        track_failures = IMAP_SYNC_MODE == "uid" and uidvalidity is not None
+        if track_failures:
+            # échecs des synchronisations précédentes, retentés tant qu'il reste des tentatives
+            retries = [u for u, n in db.get_sync_failures(IMAP_MAILBOX, uidvalidity).items() if n < IMAP_MAX_ATTEMPTS]
+            if retries:
+                print(f"[INFO] {len(retries)} message(s) en échec retenté(s)")
+                uids = sorted(set(uids) | set(retries))
+        if progress is None:
+            progress = {}
+        progress.update({"total": len(uids), "fetched": 0, "parsed": 0, "inserted": 0})
+        # Demandes accumulées puis insérées en lot; les messages ne sont marqués \Seen
+        # (et le point de reprise avancé) qu'après le commit pour ne rien perdre en cas d'échec.
+        pending = []
+        processed_uids = []
+        reached = []  # UID générés par le fetch (y compris en échec), dans l'ordre
+        errors = {}  # uid -> erreur (FETCH ou extraction)
+        cancelled = False
+        in_flight = deque()  # (uids du lot, future -> [(demandes, mode) | exception])
+        in_flight_msgs = 0
+        # Messages regroupés par tâche: sans IA pour batcher spaCy, avec IA pour des requêtes LLM concurrentes
+        if _ai_enabled() and extraire_infos_ai_many:
+            lot_size, process_fn = max(1, FETCH_AI_BATCH), _process_messages_ai
+        else:
+            lot_size, process_fn = max(1, FETCH_NLP_BATCH), _process_messages_nlp
+        max_in_flight = max(FETCH_MAX_IN_FLIGHT, lot_size * max(1, FETCH_WORKERS))
+        lot = []
+
+        def _submit(pool):
+            nonlocal in_flight_msgs
+            in_flight.append(([u for u, _ in lot], pool.submit(process_fn, [r for _, r in lot])))
+            in_flight_msgs += len(lot)
+            lot.clear()
+
+        def _drain_oldest():
+            # Écriture ordonnée: les résultats sont consommés dans l'ordre des UID
+            global LAST_PARSE_MODE
+            nonlocal in_flight_msgs
+            lot_uids, future = in_flight.popleft()
+            in_flight_msgs -= len(lot_uids)
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"[ERROR] Traitement des messages UID {lot_uids[0]}..{lot_uids[-1]} échoué: {e}")
+                errors.update((uid, e) for uid in lot_uids)
+                return
+            for uid, result in zip(lot_uids, results):
+                if isinstance(result, Exception):
+                    # message non marqué traité: il sera retenté (voir imap_echecs)
+                    print(f"[ERROR] Traitement du message UID {uid} échoué: {result}")
+                    errors[uid] = result
+                    continue
+                demandes, mode = result
+                LAST_PARSE_MODE = mode
+                pending.extend(demandes)
+                processed_uids.append(uid)
+                progress["parsed"] += 1
+
+        with ThreadPoolExecutor(max_workers=max(1, FETCH_WORKERS)) as pool:
+            fetch_batches = _fetch_text_batches if IMAP_FETCH_MODE == "parts" else _fetch_raw_batches
+            for uid, raw_email in fetch_batches(mail, uids, max(1, FETCH_BATCH_SIZE)):
+                reached.append(uid)
+                if raw_email is None:
+                    errors[uid] = "message non récupéré (FETCH échoué ou absent de la réponse)"
+                else:
+                    progress["fetched"] += 1
+                    lot.append((uid, raw_email))
+                if len(lot) >= lot_size:
+                    _submit(pool)
+                if cancel_event is not None and cancel_event.is_set():
+                    print("[INFO] Fetch annulé: arrêt après les messages déjà récupérés")
+                    cancelled = True
+                    break
+                # borne la mémoire: nombre de messages en attente limité
+                while in_flight_msgs > max_in_flight:
+                    _drain_oldest()
+            if lot:
+                _submit(pool)
+            while in_flight:
+                _drain_oldest()
+
+        # insertion en lot (executemany, une transaction ou un commit par tranche de FETCH_COMMIT_EVERY)
+        if pending:
+            inserted = db.insert_demandes_bulk(pending, chunk_size=FETCH_COMMIT_EVERY or None)
+        progress["inserted"] = inserted
+
+        # Marquer comme vus en une seule commande UID STORE
+        if processed_uids:
+            mail.uid('STORE', ",".join(str(u) for u in processed_uids), '+FLAGS', '\\Seen')
+
+        if track_failures:
+            ok_uids = set(processed_uids)
+            _record_failures(uidvalidity, errors, ok_uids)
+            last_uid = checkpoint[1] if (incremental and checkpoint) else 0
+            new_last = _next_checkpoint(uids, set(reached) if cancelled else None, incremental, last_uid, uidnext)
+            if new_last is not None:
+                db.save_sync_checkpoint(IMAP_MAILBOX, uidvalidity, new_last)
+                print(f"[INFO] Point de reprise {IMAP_MAILBOX}: UIDVALIDITY={uidvalidity}, dernier UID={new_last}")
+
+        print(f"[INFO] Emails traités: {len(uids)}, demandes insérées: {inserted}")
+    return inserted
 
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER or IMAP_SERVER_DEFAULT)
-        mail.login(EMAIL, APP_PASSWORD)
-        mail.select("inbox")
-
-        status, messages = mail.search(None, '(UNSEEN)')
-        email_ids = messages[0].split() if messages and messages[0] else []
-        for num in email_ids:
-            status, data = mail.fetch(num, '(RFC822)')
-            raw_email = data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            # Récupérer le corps de l’email (texte brut prioritaire, sinon HTML converti)
-            def _html_to_text(h: str) -> str:
-                try:
-                    # Préserver une structure lisible pour les tableaux et paragraphes
-                    # 1) Normaliser les fin de lignes pour tables
-                    # Table sections
-                    h = re.sub(r'</\s*(thead|tbody|tfoot)\s*>', '\n', h, flags=re.I)
-                    h = re.sub(r'<\s*(thead|tbody|tfoot)[^>]*>', '', h, flags=re.I)
-                    h = re.sub(r'</\s*tr\s*>', '\n', h, flags=re.I)
-                    h = re.sub(r'<\s*tr[^>]*>', '', h, flags=re.I)
-                    # Convertir cellules en séparateurs " | "
-                    h = re.sub(r'</\s*t[dh]\s*>', ' | ', h, flags=re.I)
-                    h = re.sub(r'<\s*t[dh][^>]*>', '', h, flags=re.I)
-
-                    # 2) Sauts de ligne pour br/p/div
-                    h = re.sub(r'<\s*br\s*/?>', '\n', h, flags=re.I)
-                    h = re.sub(r'</\s*p\s*>', '\n\n', h, flags=re.I)
-                    h = re.sub(r'</\s*div\s*>', '\n', h, flags=re.I)
-                    # list items to lines
-                    h = re.sub(r'</\s*li\s*>', '\n', h, flags=re.I)
-                    h = re.sub(r'<\s*li[^>]*>', '- ', h, flags=re.I)
-                    # supprimer scripts/styles
-                    h = re.sub(r'<script[\s\S]*?</script>', '', h, flags=re.I)
-                    h = re.sub(r'<style[\s\S]*?</style>', '', h, flags=re.I)
-                    # 3) Enlever le reste des balises
-                    h = re.sub(r'<[^>]+>', '', h)
-                    # 4) Nettoyer séparateurs superflus
-                    # remplacer suites de " | " et espaces
-                    h = re.sub(r'(\s*\|\s*){2,}', ' | ', h)
-                    # trim chaque ligne
-                    h = '\n'.join([ln.strip(' |\t ') for ln in h.splitlines()])
-                    # décoder entités HTML
-                    return html_module.unescape(h)
-                except Exception:
-                    return h
-
-            def _is_attachment(part) -> bool:
-                try:
-                    cd = (part.get("Content-Disposition") or "").lower()
-                    if 'attachment' in cd:
-                        return True
-                    filename = part.get_filename()
-                    return bool(filename)
-                except Exception:
-                    return False
-
-            def _decode_payload(part) -> str:
-                try:
-                    payload = part.get_payload(decode=True)
-                    if payload is None:
-                        return ""
-                    charset = part.get_content_charset() or "utf-8"
-                    for enc in [charset, 'utf-8', 'latin-1', 'windows-1252']:
-                        try:
-                            return payload.decode(enc, errors='ignore')
-                        except Exception:
-                            continue
-                    return payload.decode(errors='ignore')
-                except Exception:
-                    return ""
-
-            body = ""
-            html_body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    ctype = (part.get_content_type() or '').lower()
-                    if _is_attachment(part):
-                        continue
-                    if ctype == "text/plain":
-                        text = _decode_payload(part)
-                        if text:
-                            body += text
-                    elif ctype == "text/html":
-                        text = _decode_payload(part)
-                        if text:
-                            html_body += text
-            else:
-                ctype = (msg.get_content_type() or '').lower()
-                part = msg
-                if ctype == "text/plain" and not _is_attachment(part):
-                    body = _decode_payload(part)
-                elif ctype == "text/html" and not _is_attachment(part):
-                    html_body = _decode_payload(part)
-            # Heuristique: si text/plain est vide ou anémique, utiliser le HTML
-            if html_body:
-                html_text = _html_to_text(html_body)
-                def _is_meaningful(s: str) -> bool:
-                    s = (s or '').strip()
-                    if len(s) < 30:
-                        return False
-                    # doit contenir quelques lettres
-                    return bool(re.search(r'[A-Za-zÀ-ÿ]{5,}', s))
-                if not _is_meaningful(body) or (len(html_text) > len(body) * 2):
-                    body = html_text
-
-            # Ensure OPENAI credentials are available from file if not in env
-            if not (os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_TOKEN")):
-                _load_openai_from_credentials_file()
-
-            # Prefer AI parsing if OPENAI_API_KEY is configured
-            demandes = []
-            use_ai = os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_TOKEN")
-            if use_ai and extraire_infos_ai:
-                try:
-                    demandes = extraire_infos_ai(body)
-                    print(f"[INFO] Parsed with AI, demandes: {len(demandes)}")
-                    LAST_PARSE_MODE = "ai"
-                except Exception:
-                    # Fallback to NLP parser on any AI failure
-                    demandes = extraire_infos_nlp(body)
-                    print(f"[INFO] Fallback to NLP parser, demandes: {len(demandes)}")
-                    LAST_PARSE_MODE = "nlp"
-            else:
-                demandes = extraire_infos_nlp(body)
-                print(f"[INFO] Parsed with NLP, demandes: {len(demandes)}")
-                LAST_PARSE_MODE = "nlp"
-
-            # Post-process: by default, avoid inserting multiple demandes per email.
-            raw_count = len(demandes)
-            allow_multi = (os.getenv('ALLOW_MULTIPLE_DEMANDES_PER_EMAIL', 'false').lower() in ('1', 'true', 'yes', 'y'))
-
-            def _score_demande(d: dict) -> int:
-                score = 0
-                if d.get('email'): score += 2
-                if d.get('telephone'): score += 2
-                if d.get('ville'): score += 2
-                if d.get('date_debut'): score += 2
-                if d.get('date_fin'): score += 1
-                if d.get('type_vehicule'): score += 1
-                if d.get('nb_personnes'): score += 1
-                return score
-
-            def _unique_key(d: dict):
-                return (
-                    (d.get('email') or '').lower().strip(),
-                    re.sub(r'\D', '', d.get('telephone') or ''),
-                    (d.get('ville') or '').lower().strip(),
-                    d.get('date_debut') or '',
-                    d.get('date_fin') or '',
-                )
-
-            # de-duplicate likely duplicates
-            uniq = []
-            seen = set()
-            for d in demandes:
-                k = _unique_key(d)
-                if k not in seen:
-                    seen.add(k)
-                    uniq.append(d)
-
-            if not allow_multi and uniq:
-                # pick the best single demande
-                uniq.sort(key=lambda d: (_score_demande(d), len((d.get('infos_libres') or d.get('corps_mail') or ''))), reverse=True)
-                demandes = [uniq[0]]
-            else:
-                demandes = uniq
-            print(f"[INFO] Selected demandes: {len(demandes)} from extracted {raw_count} (allow_multiple={allow_multi})")
-
-            sender_email = _extract_email_from_header(msg.get('From', ''))
-            subject = msg.get('Subject', '')
-
-            for d in demandes:
-                # fallback email depuis l'entête si manquant
-                if not d.get('email') and sender_email:
-                    d['email'] = sender_email
-                # ajouter sujet dans infos_libres si utile
-                if subject and 'infos_libres' in d and subject not in d['infos_libres']:
-                    d['infos_libres'] = f"Subject: {subject}\n\n" + d['infos_libres']
-                # toujours conserver le corps complet
-                d['corps_mail'] = body
-                # insertion
-                db.insert_demande(d)
-                inserted += 1
-
-            # Marquer comme vu
-            mail.store(num, '+FLAGS', '\\Seen')
 
+def fetch_emails(progress=None, cancel_event=None) -> int:
+    """Récupère les nouveaux emails, extrait les demandes, insère via Database.
+    Retourne le nombre de demandes insérées (voir sync_mailbox pour progress/cancel_event).
+    """
+    inserted = 0
+    try:
+        mail = _connect_imap()
+        if mail is None:
+            if progress is not None:
+                progress["error"] = "EMAIL ou APP_PASSWORD non configurés"
+            return inserted
+        inserted = sync_mailbox(mail, progress=progress, cancel_event=cancel_event)
         mail.logout()
-        print(f"[INFO] Emails traités: {len(email_ids)}, demandes insérées: {inserted}")
         return inserted
 
     except Exception as e:
         print(f"[ERROR] Impossible de récupérer les emails: {e}")
+        if progress is not None:
+            progress["error"] = str(e)
         return inserted
+
+
+# --- Service d'ingestion continue (IMAP IDLE) ---
+IMAP_IDLE_TIMEOUT = int(os.getenv("IMAP_IDLE_TIMEOUT", str(25 * 60)))  # < 29 min (RFC 2177)
+IMAP_POLL_INTERVAL = int(os.getenv("IMAP_POLL_INTERVAL", "60"))  # repli NOOP si IDLE non supporté
+IMAP_RECONNECT_MIN = float(os.getenv("IMAP_RECONNECT_MIN", "2"))
+IMAP_RECONNECT_MAX = float(os.getenv("IMAP_RECONNECT_MAX", "300"))
+
+
+def _buffered(mail) -> bool:
+    """Vrai si des octets sont déjà lus côté client (couche SSL ou tampon de mail.file):
+    select() sur la socket ne les signalerait pas."""
+    if getattr(mail.sock, "pending", lambda: 0)():
+        return True
+    peek = getattr(getattr(mail, "file", None), "peek", None)
+    if peek is None:
+        return False
+    timeout = mail.sock.gettimeout()
+    try:
+        mail.sock.setblocking(False)
+        return bool(peek(1))
+    except (OSError, ValueError):
+        # rien de disponible sans bloquer (BlockingIOError, SSLWantReadError)
+        return False
+    finally:
+        mail.sock.settimeout(timeout)
+
+
+def _is_new_mail(line: bytes) -> bool:
+    return line.startswith(b"*") and (b"EXISTS" in line or b"RECENT" in line)
+
+
+def _idle_wait(mail, timeout: float, stop_event) -> bool:
+    """Envoie IDLE et attend une notification du serveur (EXISTS/RECENT) au plus `timeout` secondes.
+    Retourne True si de nouveaux messages sont signalés. imaplib ne gère pas IDLE avant Python 3.14,
+    la commande est donc pilotée directement sur la socket. DONE n'est envoyé que si IDLE a été
+    accepté et que la connexion est encore utilisable (sinon l'appelant se reconnecte)."""
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    idling = False
+    alive = True
+    notified = False
+    try:
+        # des réponses non sollicitées peuvent précéder la continuation "+"
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connexion fermée avant IDLE")
+            if line.startswith(b"+"):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.abort(f"IDLE refusé: {line!r}")
+            notified = notified or _is_new_mail(line)
+        idling = True
+        deadline = time.monotonic() + timeout
+        while not notified and not stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not _buffered(mail):
+                # tranches d'une seconde pour réagir rapidement à stop()
+                readable, _, _ = select.select([mail.sock], [], [], min(1.0, remaining))
+                if not readable:
+                    continue
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connexion fermée pendant IDLE")
+            notified = _is_new_mail(line)
+    except (OSError, imaplib.IMAP4.abort):
+        alive = False
+        raise
+    finally:
+        if idling and alive:
+            mail.send(b"DONE\r\n")
+            while True:
+                line = mail.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connexion fermée après IDLE")
+                if line.startswith(tag):
+                    break
+    return notified
+
+
+class IdleIngestionService:
+    """Ingestion quasi temps réel: une connexion IMAP authentifiée maintenue ouverte,
+    IDLE (ou NOOP périodique si le serveur ne le supporte pas) pour détecter les nouveaux
+    messages, et reconnexion avec backoff exponentiel en cas de coupure."""
+
+    def __init__(self, on_sync=None):
+        self._on_sync = on_sync  # callback(inserted) après chaque synchronisation
+        self._stop = threading.Event()
+        self._thread = None
+        self.status = {"running": False, "connected": False, "idle": None,
+                       "last_sync": None, "last_error": None, "reconnects": 0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="imap-idle", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _sync(self, mail):
+        inserted = sync_mailbox(mail)
+        self.status["last_sync"] = datetime.now().isoformat(timespec='seconds')
+        if self._on_sync:
+            try:
+                self._on_sync(inserted)
+            except Exception:
+                pass
+
+    def _run(self):
+        self.status["running"] = True
+        backoff = IMAP_RECONNECT_MIN
+        while not self._stop.is_set():
+            mail = None
+            try:
+                mail = _connect_imap()
+                if mail is None:
+                    raise RuntimeError("identifiants IMAP non configurés")
+                self.status["connected"] = True
+                self.status["idle"] = b"IDLE" in [c.encode() if isinstance(c, str) else c for c in mail.capabilities]
+                print(f"[INFO] Service IMAP connecté (IDLE={'oui' if self.status['idle'] else 'non, NOOP'})")
+                backoff = IMAP_RECONNECT_MIN
+                self._sync(mail)  # rattrapage au (re)démarrage
+                while not self._stop.is_set():
+                    if self.status["idle"]:
+                        notified = _idle_wait(mail, IMAP_IDLE_TIMEOUT, self._stop)
+                    else:
+                        if self._stop.wait(IMAP_POLL_INTERVAL):
+                            break
+                        mail.noop()
+                        notified = True  # la synchro UID ne transfère que les nouveaux messages
+                    if notified:
+                        self._sync(mail)
+            except Exception as e:
+                self.status["last_error"] = str(e)
+                print(f"[ERROR] Service IMAP: {e}; reconnexion dans {backoff:.0f}s")
+                self.status["reconnects"] += 1
+                self._stop.wait(backoff * random.uniform(0.8, 1.2))
+                backoff = min(backoff * 2, IMAP_RECONNECT_MAX)
+            finally:
+                self.status["connected"] = False
+                if mail is not None:
+                    try:
+                        mail.logout()
+                    except Exception:
+                        pass
+                close_thread_connection()
+        self.status["running"] = False
+
+
+if __name__ == "__main__":
+    import sys
+    _nlp_parser().preload_models()
+    if "--idle" in sys.argv:
+        service = IdleIngestionService()
+        service.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            service.stop()
+    else:
+        print(f"{fetch_emails()} demande(s) insérée(s)")
@@ -0,0 +1,113 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+# États d'un job encore en cours: une nouvelle demande y est rattachée
+_ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class FetchJobScheduler:
+    """Ordonnanceur des récupérations d'emails: un seul fetch actif à la fois.
+
+    Une demande reçue pendant un fetch en cours (y compris en cours d'annulation) est rattachée
+    à ce job (même job_id) au lieu de lancer un second thread qui traiterait les mêmes messages.
+    Les champs des jobs ne sont modifiés que sous self._lock; seul progress est mis à jour
+    par run_fn au fil de l'eau.
+    run_fn(progress, cancel_event) -> int exécute le fetch et renvoie le nombre de demandes insérées.
+    """
+
+    def __init__(self, run_fn, on_done=None, history: int = 20):
+        self._run_fn = run_fn
+        self._on_done = on_done  # callback(job) à la fin de chaque job
+        self._history = history
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> job (les plus récents en dernier)
+        self._cancel_events = {}
+        self._active_id = None
+
+    def submit(self):
+        """Lance un fetch, ou rattache la demande au fetch actif. Retourne (job, coalesced)."""
+        with self._lock:
+            active = self._jobs.get(self._active_id) if self._active_id else None
+            if active and active["status"] in _ACTIVE_STATUSES:
+                active["requests"] += 1
+                return dict(active), True
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "requests": 1,
+                "created_at": _now(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": {"total": 0, "fetched": 0, "parsed": 0, "inserted": 0},
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = threading.Event()
+            self._active_id = job_id
+            while len(self._jobs) > self._history:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._cancel_events.pop(old_id, None)
+            threading.Thread(target=self._run, args=(job_id,), name=f"fetch-{job_id}", daemon=True).start()
+            return dict(job), False
+
+    def _run(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            cancel_event = self._cancel_events[job_id]
+            progress = job["progress"]
+            started = not cancel_event.is_set()  # annulé avant de démarrer: rien à faire
+            if started:
+                job["status"] = "running"
+                job["started_at"] = _now()
+        inserted, error = 0, None
+        try:
+            if started:
+                inserted = self._run_fn(progress, cancel_event)
+            error = progress.pop("error", None)
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            progress["inserted"] = inserted
+            job["error"] = error
+            if error:
+                job["status"] = "failed"
+            else:
+                job["status"] = "cancelled" if cancel_event.is_set() else "done"
+            job["finished_at"] = _now()
+            if self._active_id == job_id:
+                self._active_id = None
+            snapshot = dict(job, progress=dict(progress))
+        if self._on_done:
+            try:
+                self._on_done(snapshot)
+            except Exception:
+                pass
+
+    def cancel(self, job_id) -> bool:
+        """Demande l'annulation d'un job actif. Retourne False si le job est inconnu ou terminé."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] not in ("queued", "running"):
+                return False
+            self._cancel_events[job_id].set()
+            job["status"] = "cancelling"
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, progress=dict(job["progress"])) if job else None
+
+    def latest(self):
+        """Le job actif s'il y en a un, sinon le dernier job lancé."""
+        with self._lock:
+            job_id = self._active_id or (next(reversed(self._jobs)) if self._jobs else None)
+        return self.get(job_id) if job_id else None
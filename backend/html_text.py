@@ -0,0 +1,35 @@
+import html as html_module
+import re
+
+# Conversion HTML -> texte des corps d'emails (tableaux en "Label | Valeur", paragraphes, listes).
+# Motifs compilés une fois; les remplacements de même résultat sont fusionnés pour limiter les passes.
+# Un convertisseur html.parser.HTMLParser mesure ~9x plus lent en CPython (Test/bench_html_to_text.py).
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style)\b[\s\S]*?</\1\s*>', re.I)
+# fins de sections/lignes de tableau, de blocs et d'items de liste, <br>: un saut de ligne
+_NEWLINE_TAG_RE = re.compile(r'</\s*(?:thead|tbody|tfoot|tr|div|li)\s*>|<\s*br\b[^>]*>', re.I)
+# fin de cellule: séparateur " | "
+_CELL_END_RE = re.compile(r'</\s*t[dh]\s*>', re.I)
+_P_END_RE = re.compile(r'</\s*p\s*>', re.I)
+_LI_START_RE = re.compile(r'<\s*li\b[^>]*>', re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+# équivalent à (\s*\|\s*){2,} sans groupe répété (3x plus rapide sur les longs tableaux)
+_PIPE_RUN_RE = re.compile(r'\s*\|(?:\s*\|)+\s*')
+
+
+def html_to_text(h: str) -> str:
+    try:
+        # scripts/styles d'abord: leur contenu ne doit pas être interprété comme du balisage
+        h = _SCRIPT_STYLE_RE.sub('', h)
+        h = _NEWLINE_TAG_RE.sub('\n', h)
+        h = _CELL_END_RE.sub(' | ', h)
+        h = _P_END_RE.sub('\n\n', h)
+        h = _LI_START_RE.sub('- ', h)
+        # Enlever le reste des balises (ouvertures de tableau, td, tr...)
+        h = _TAG_RE.sub('', h)
+        # Nettoyer séparateurs superflus: suites de " | " et espaces, puis trim de chaque ligne
+        h = _PIPE_RUN_RE.sub(' | ', h)
+        h = '\n'.join([ln.strip(' |\t ') for ln in h.splitlines()])
+        # décoder entités HTML
+        return html_module.unescape(h)
+    except Exception:
+        return h
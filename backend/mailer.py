@@ -1,12 +1,14 @@
 import smtplib
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
 import os
-# Import AI email composer (absolute import to work when backend isn't a package)
-try:
-    import ai_email as ai_email_module
-except Exception:
-    ai_email_module = None
+from email_templates import render_partner_email
 
 load_dotenv()
 
@@ -63,6 +65,17 @@ try:
 except Exception:
     SMTP_PORT = 587
 
+# Service d'envoi: une connexion SMTP authentifiée réutilisée par un worker unique
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "100"))
+# Connexion inutilisée depuis plus de SMTP_NOOP_AFTER s: vérifiée par NOOP avant l'envoi
+SMTP_NOOP_AFTER = float(os.getenv("SMTP_NOOP_AFTER", "30"))
+# Connexion fermée (QUIT) après SMTP_IDLE_TIMEOUT s sans message à envoyer
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "120"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+MAIL_STATUS_KEEP = int(os.getenv("MAIL_STATUS_KEEP", "500"))
+# Rédactions IA lancées en parallèle (une par langue / par email à rédiger)
+COMPOSE_WORKERS = int(os.getenv("COMPOSE_WORKERS", "4"))
+
 # Mapping pays → langue
 COUNTRY_LANGUAGE = {
     "Allemagne": "de",
@@ -88,163 +101,245 @@ def subject_for_lang(base_subject: str | None, lang: str) -> str:
     return SUBJECT_BY_LANG.get(lang, base_subject or "New request")
 
 def format_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
-    """Formate le mail selon la langue en omettant les infos inconnues."""
+    """Formate le mail selon la langue en omettant les infos inconnues (gabarits de email_templates)."""
+    return render_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+
+
+def _build_message(subject, body) -> str:
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = EMAIL
+    # To: neutre pour ne pas exposer les adresses; les destinataires passent en BCC via l'enveloppe SMTP
+    msg["To"] = EMAIL
+    return msg.as_string()
+
+
+class SmtpConnection:
+    """Connexion SMTP (STARTTLS + LOGIN) ouverte à la demande et réutilisée d'un envoi à l'autre.
+    Non thread-safe: utilisée par le seul worker de MailerService."""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+
+    def _open(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        server.starttls()
+        server.login(EMAIL, APP_PASSWORD)
+        print(f"[INFO] Connexion SMTP ouverte ({SMTP_SERVER}:{SMTP_PORT})")
+        self.server = server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
 
-    def _known(val: str) -> bool:
-        if val is None:
+    def _alive(self) -> bool:
+        if self.server is None:
             return False
-        if isinstance(val, (int, float)):
+        if time.monotonic() - self.last_used < SMTP_NOOP_AFTER:
             return True
-        v = str(val).strip().lower()
-        return v not in ("", "n/a", "?", "à définir", "to be defined", "tbd")
-
-    if lang == "de":  # Allemand
-        mail = "Guten Tag,\n\n"
-        mail += "wir suchen einen Bus mit Fahrer für folgende Transfers:\n\n"
-        mail += "Details\n"
-        if _known(gruppe):
-            mail += f"Gruppe: ca. {gruppe} Personen\n"
-        if _known(strecke):
-            mail += f"Strecke: {strecke}\n"
-        if _known(entfernung):
-            mail += f"Entfernung: {entfernung}\n"
-        mail += "\nFahrten\n"
-        for date, uhrzeit in fahrten:
-            mail += f"{date} – Abfahrt {uhrzeit} Uhr\n"
-        total_parts = [f"{len(fahrten)} Fahrten"]
-        if _known(entfernung):
-            total_parts.append(entfernung)
-        if _known(stunden_pro_tag):
-            total_parts.append(f"geschätzte Einsatzzeit pro Tag ca. {stunden_pro_tag}")
-        mail += "\n" + ("Gesamt: " + ", ".join(total_parts) + ".\n\n")
-        mail += "Wir bitten um Ihr Verfügbarkeits- und Preisangebot.\n\nVielen Dank im Voraus.\n--------------\n"
-    elif lang == "da":  # Danois
-        mail = "Goddag,\n\n"
-        mail += "Vi søger en bus med chauffør til følgende transporter:\n\n"
-        mail += "Detaljer\n"
-        if _known(gruppe):
-            mail += f"Gruppe: ca. {gruppe} personer\n"
-        if _known(strecke):
-            mail += f"Rute: {strecke}\n"
-        if _known(entfernung):
-            mail += f"Afstand: {entfernung}\n"
-        mail += "\nTure\n"
-        for date, tid in fahrten:
-            mail += f"{date} – Afgang {tid} \n"
-        total_parts = [f"{len(fahrten)} ture"]
-        if _known(entfernung):
-            total_parts.append(entfernung)
-        if _known(stunden_pro_tag):
-            total_parts.append(f"anslået varighed pr. dag ca. {stunden_pro_tag}")
-        mail += "\n" + ("I alt: " + ", ".join(total_parts) + ".\n\n")
-        mail += "Send venligst jeres tilgængelighed og prisoverslag.\n\nPå forhånd tak.\n--------------\n"
-    elif lang == "fr":  # Français
-        mail = "Bonjour,\n\n"
-        mail += "Nous recherchons un bus avec chauffeur pour les trajets suivants :\n\n"
-        mail += "Détails\n"
-        if _known(gruppe):
-            mail += f"Groupe : environ {gruppe} personnes\n"
-        if _known(strecke):
-            mail += f"Trajet : {strecke}\n"
-        if _known(entfernung):
-            mail += f"Distance : {entfernung}\n"
-        mail += "\nTrajets\n"
-        for date, heure in fahrten:
-            mail += f"{date} – Départ {heure} h\n"
-        total_parts = [f"{len(fahrten)} trajets"]
-        if _known(entfernung):
-            total_parts.append(entfernung)
-        if _known(stunden_pro_tag):
-            total_parts.append(f"durée estimée par jour environ {stunden_pro_tag}")
-        mail += "\n" + ("Total : " + ", ".join(total_parts) + ".\n\n")
-        mail += "Merci de nous communiquer vos disponibilités et vos tarifs.\n\nCordialement,\n--------------\n"
-    else:  # Anglais par défaut
-        mail = "Hello,\n\n"
-        mail += "We are looking for a bus with driver for the following transfers:\n\n"
-        mail += "Details\n"
-        if _known(gruppe):
-            mail += f"Group: approx. {gruppe} persons\n"
-        if _known(strecke):
-            mail += f"Route: {strecke}\n"
-        if _known(entfernung):
-            mail += f"Distance: {entfernung}\n"
-        mail += "\nTrips\n"
-        for date, time in fahrten:
-            mail += f"{date} – Departure {time}\n"
-        total_parts = [f"{len(fahrten)} trips"]
-        if _known(entfernung):
-            total_parts.append(entfernung)
-        if _known(stunden_pro_tag):
-            total_parts.append(f"estimated duration per day approx. {stunden_pro_tag}")
-        mail += "\n" + ("Total: " + ", ".join(total_parts) + ".\n\n")
-        mail += "Please send us your availability and quote.\n\nThank you in advance.\n--------------\n"
-    return mail
-
-def send_email_partners_bcc(ville, subject, gruppe, strecke, entfernung, fahrten, stunden_pro_tag, conn):
-    """
-    Envoie le mail aux partenaires d'une ville en CCI, groupés par langue (1 email par langue).
-    """
-    try:
-        c = conn.cursor()
-        c.execute("SELECT email, pays FROM sous_traitants WHERE ville=?", (ville,))
-        partenaires = [row for row in c.fetchall() if row[0]]
-        c.close()
-        if not partenaires:
-            print(f"[INFO] Aucun partenaire trouvé pour la ville {ville}")
+        try:
+            return self.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def sendmail(self, recipients, message: str):
+        """Envoie sur la connexion courante; reconnecte une fois si elle a été coupée."""
+        if not self._alive():
+            self.close()
+            self._open()
+        try:
+            self.server.sendmail(EMAIL, recipients, message)
+        # seules les coupures de connexion sont rejouées (SMTPException hérite aussi d'OSError)
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+            print(f"[WARN] Connexion SMTP perdue ({e}), reconnexion")
+            self.close()
+            self._open()
+            self.server.sendmail(EMAIL, recipients, message)
+        self.last_used = time.monotonic()
+
+
+_PENDING_STATUSES = ("queued", "sending")
+
+
+class MailerService:
+    """File d'envoi bornée vidée par un worker qui réutilise une seule connexion SMTP.
+    Chaque message reçoit un identifiant; son statut (queued, sending, sent, failed, cancelled) est consultable."""
+
+    def __init__(self, maxsize: int = MAIL_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.connection = SmtpConnection()
+        self._statuses = OrderedDict()
+        self._events = {}
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._thread.start()
+
+    def _set_status(self, msg_id, **fields):
+        with self._lock:
+            self._statuses.setdefault(msg_id, {"id": msg_id}).update(fields)
+            self._statuses.move_to_end(msg_id)
+            self._evict()
+
+    def _evict(self):
+        """Oublie (sous self._lock) les plus anciens statuts au-delà de MAIL_STATUS_KEEP.
+        Un message encore en file ou en cours d'envoi, ou attendu par wait(), n'est jamais oublié."""
+        excess = len(self._statuses) - MAIL_STATUS_KEEP
+        if excess <= 0:
             return
+        done = [msg_id for msg_id, s in self._statuses.items()
+                if s.get("status") not in _PENDING_STATUSES and not self._waiters.get(msg_id)]
+        for msg_id in done[:excess]:
+            del self._statuses[msg_id]
+            self._events.pop(msg_id, None)
 
-        # Regrouper par langue
-        groups = {}
-        for email_addr, pays in partenaires:
-            lang = COUNTRY_LANGUAGE.get(pays, "en")
-            groups.setdefault(lang, []).append(email_addr)
-
-        for lang, recipients in groups.items():
-            # Compose body via AI if available, else fallback to template
-            body_ai = None
-            if ai_email_module is not None:
-                try:
-                    body_ai = ai_email_module.compose_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
-                except Exception:
-                    body_ai = None
-            body = body_ai or format_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
-
-            # Envoyer un seul email avec tous les destinataires en BCC (CCI)
+    def submit(self, recipients, subject, body) -> int:
+        """Met un message en file (bloque si la file est pleine) et retourne son identifiant."""
+        msg_id = next(self._ids)
+        with self._lock:
+            self._events[msg_id] = threading.Event()
+        self._set_status(msg_id, status="queued", subject=subject, recipients=len(recipients), error=None)
+        self._ensure_worker()
+        self.queue.put((msg_id, list(recipients), subject, body))
+        return msg_id
+
+    def wait(self, msg_id, timeout=None) -> dict:
+        """Attend la fin de l'envoi (sent/failed/cancelled), au plus timeout s, et retourne le statut du message.
+        Le statut reste conservé pendant l'attente, même si MAIL_STATUS_KEEP est dépassé entre-temps."""
+        with self._lock:
+            event = self._events.get(msg_id)
+            if event is not None:
+                self._waiters[msg_id] = self._waiters.get(msg_id, 0) + 1
+        if event is None:
+            return self.status(msg_id)
+        try:
+            event.wait(timeout)
+        finally:
+            with self._lock:
+                status = dict(self._statuses.get(msg_id) or {})
+                waiters = self._waiters.pop(msg_id) - 1
+                if waiters:
+                    self._waiters[msg_id] = waiters
+                self._evict()
+        return status
+
+    def cancel(self, msg_id) -> bool:
+        """Annule un message encore en file (pas encore pris par le worker). Retourne True si annulé."""
+        with self._lock:
+            entry = self._statuses.get(msg_id)
+            if entry is None or entry.get("status") != "queued":
+                return False
+            entry["status"] = "cancelled"
+            event = self._events.get(msg_id)
+        if event is not None:
+            event.set()
+        return True
+
+    def _start(self, msg_id) -> bool:
+        """Passe le message en envoi, sauf s'il a été annulé entre-temps."""
+        with self._lock:
+            entry = self._statuses.get(msg_id)
+            if entry is not None and entry.get("status") == "cancelled":
+                return False
+            self._statuses.setdefault(msg_id, {"id": msg_id})["status"] = "sending"
+            return True
+
+    def status(self, msg_id) -> dict:
+        with self._lock:
+            return dict(self._statuses.get(msg_id) or {})
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = [dict(s) for s in list(self._statuses.values())[-20:]]
+        return {"queued": self.queue.qsize(), "connected": self.connection.server is not None, "recent": recent}
+
+    def _run(self):
+        while True:
             try:
-                msg = MIMEText(body)
-                msg["Subject"] = subject_for_lang(subject, lang)
-                msg["From"] = EMAIL
-                msg["To"] = EMAIL  # masque les adresses, BCC via enveloppe SMTP
-
-                server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-                server.starttls()
-                server.login(EMAIL, APP_PASSWORD)
-                server.sendmail(EMAIL, recipients, msg.as_string())
-                server.quit()
-                print(f"[INFO] Email envoyé (lang={lang}) en CCI à {len(recipients)} destinataires")
-            except Exception as se:
-                print(f"[ERROR] Envoi (lang={lang}) échoué: {se}")
-    except Exception as e:
-        print(f"[ERROR] Impossible d'envoyer email partenaires CCI: {e}")
+                msg_id, recipients, subject, body = self.queue.get(timeout=SMTP_IDLE_TIMEOUT)
+            except queue.Empty:
+                # file vide: libérer la connexion plutôt que de la laisser expirer côté serveur
+                self.connection.close()
+                continue
+            if not self._start(msg_id):
+                print(f"[INFO] Email {msg_id} annulé avant l'envoi")
+                self.queue.task_done()
+                continue
+            try:
+                self.connection.sendmail(recipients, _build_message(subject, body))
+                self._set_status(msg_id, status="sent", sent_at=time.time())
+                print(f"[INFO] Email {msg_id} envoyé en CCI à {len(recipients)} destinataires")
+            except Exception as e:
+                self.connection.close()
+                self._set_status(msg_id, status="failed", error=str(e))
+                print(f"[ERROR] Envoi de l'email {msg_id} échoué: {e}")
+            finally:
+                with self._lock:
+                    event = self._events.get(msg_id)
+                if event is not None:
+                    event.set()
+                self.queue.task_done()
+
+
+mailer_service = MailerService()
+
 
+def partner_groups(ville, conn):
+    """Emails des partenaires d'une ville regroupés par langue: {langue: [emails]}."""
+    c = conn.cursor()
+    c.execute("SELECT email, pays FROM sous_traitants WHERE ville=?", (ville,))
+    partenaires = [row for row in c.fetchall() if row[0]]
+    c.close()
+    groups = {}
+    for email_addr, pays in partenaires:
+        lang = COUNTRY_LANGUAGE.get(pays, "en")
+        groups.setdefault(lang, []).append(email_addr)
+    return groups
 
-def send_custom_body_bcc(recipients, subject, body):
-    """Envoie un seul email avec tous les destinataires en BCC (CCI)."""
+
+def compose_partner_body(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag):
+    """Corps du mail partenaire: rédigé par l'IA si disponible, sinon modèle format_partner_email."""
+    # Import AI email composer on first use (absolute import to work when backend isn't a package)
     try:
-        if not recipients:
-            return
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = EMAIL
-        # Put a neutral To: to avoid exposing addresses; all recipients go to BCC at SMTP level
-        msg["To"] = EMAIL
+        import ai_email as ai_email_module
+        body_ai = ai_email_module.compose_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
+    except Exception:
+        body_ai = None
+    return body_ai or format_partner_email(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)
 
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL, APP_PASSWORD)
-        # BCC achieved by passing recipients in sendmail but not listing in headers
-        server.sendmail(EMAIL, recipients, msg.as_string())
-        server.quit()
-        print(f"[INFO] Email personnalisé envoyé en CCI à {len(recipients)} destinataires")
+
+def compose_partner_bodies(jobs):
+    """Rédige en parallèle plusieurs corps: jobs = [(lang, gruppe, strecke, entfernung, fahrten, stunden_pro_tag)].
+    Retourne les corps dans l'ordre des jobs (les faits identiques sont rédigés une seule fois, voir ai_email)."""
+    jobs = list(jobs)
+    if len(jobs) <= 1:
+        return [compose_partner_body(*job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=max(1, min(COMPOSE_WORKERS, len(jobs)))) as pool:
+        return list(pool.map(lambda job: compose_partner_body(*job), jobs))
+
+
+def send_custom_body_bcc(recipients, subject, body, timeout=None):
+    """Envoie un seul email avec tous les destinataires en BCC (CCI), via la connexion partagée.
+    Attend la fin de l'envoi (au plus timeout s) et retourne le statut du message."""
+    try:
+        if not recipients:
+            return {}
+        msg_id = mailer_service.submit(recipients, subject, body)
+        status = mailer_service.wait(msg_id, timeout=timeout or SMTP_TIMEOUT * 3)
+        if status.get("status") == "sent":
+            print(f"[INFO] Email personnalisé envoyé en CCI à {len(recipients)} destinataires")
+        return status
     except Exception as e:
         print(f"[ERROR] Impossible d'envoyer email personnalisé: {e}")
+        return {"status": "failed", "error": str(e)}
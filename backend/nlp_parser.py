@@ -1,13 +1,19 @@
 import spacy
+import hashlib
+import os
 import re
+import threading
+import time
 import unicodedata
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dateparser import parse
 from dateparser.search import search_dates
 
 try:
-    from langdetect import detect as langdetect_detect
+    from langdetect import detect as langdetect_detect, DetectorFactory
+    DetectorFactory.seed = 0  # langdetect est aléatoire: graine fixe pour des résultats reproductibles
 except Exception:  # langdetect facultatif
     langdetect_detect = None
 
@@ -17,41 +23,108 @@ except Exception:
     validate_email = None
     EmailNotValidError = Exception
 
+# Version des règles d'extraction: à incrémenter quand le résultat change (invalide le cache d'extraction)
+PARSER_VERSION = "5"
+
+# Modèles spaCy par langue
+SPACY_MODELS = {
+    "fr": "fr_core_news_sm",
+    "en": "en_core_web_sm",
+    "da": "da_core_news_sm",
+}
+
+# Seules les entités nommées (doc.ents) sont exploitées: les autres composants sont exclus au chargement
+SPACY_EXCLUDE = [c.strip() for c in os.getenv(
+    "SPACY_EXCLUDE", "parser,tagger,morphologizer,attribute_ruler,lemmatizer,senter"
+).split(",") if c.strip()]
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+# Langues passées à dateparser (chargées paresseusement par dateparser au premier appel)
+DATE_LANGUAGES = ['fr', 'en', 'da', 'nl']
+# Lecture directe des formats de date courants avant tout appel à dateparser (voir _scan_dates)
+DATE_FAST_PATH = (os.getenv("DATE_FAST_PATH", "true").lower() in ("1", "true", "yes", "y"))
+
 # Modèles spaCy chargés à la demande pour éviter les erreurs si non installés
 _NLP_CACHE: Dict[str, Optional[spacy.language.Language]] = {"fr": None, "en": None, "da": None}
+# Un seul chargement par modèle même si warmup, le thread de fetch et les workers démarrent ensemble
+_SPACY_LOAD_LOCK = threading.Lock()
+# Un Language spaCy n'est pas garanti thread-safe (caches du tokenizer/vocab modifiés pendant
+# l'analyse): les appels nlp.pipe sur un même modèle sont sérialisés, les langues restent parallèles
+_SPACY_PIPE_LOCKS: Dict[str, threading.Lock] = {}
+
+# --- Registre des expressions régulières, compilées une seule fois au chargement du module ---
+_CITY_CUT_RE = re.compile(r"\b(cordialement|merci|bien\s*à\s*vous|salutations|regards|best\s*regards|thanks)\b", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t\x0b\x0c\r]+")
+_MULTI_NEWLINES_RE = re.compile(r"\n{3,}")
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(\+?\d{1,3}[\s.-]?)?(\d[\d\s.-]{7,14})")
+_NON_DIGIT_RE = re.compile(r"\D")
+_PHONE_STRIP_RE = re.compile(r"[^0-9+]")
+_PLUS_RUN_RE = re.compile(r"\+{2,}")
 
 
 def _load_spacy(lang: str) -> spacy.language.Language:
-    if _NLP_CACHE.get(lang) is not None:
-        return _NLP_CACHE[lang]  # type: ignore
-    model_name = {
-        "fr": "fr_core_news_sm",
-        "en": "en_core_web_sm",
-        "da": "da_core_news_sm",
-    }.get(lang, "fr_core_news_sm")
-    try:
-        nlp = spacy.load(model_name)
-    except Exception:
-        # Fallback minimal si le modèle manque
+    nlp = _NLP_CACHE.get(lang)
+    if nlp is not None:
+        return nlp
+    with _SPACY_LOAD_LOCK:
+        # un autre thread a pu charger le modèle pendant l'attente du verrou
+        nlp = _NLP_CACHE.get(lang)
+        if nlp is not None:
+            return nlp
+        model_name = SPACY_MODELS.get(lang, "fr_core_news_sm")
         try:
-            nlp = spacy.blank({"fr": "fr", "en": "en", "da": "da"}.get(lang, "fr"))
+            nlp = spacy.load(model_name, exclude=SPACY_EXCLUDE)
         except Exception:
-            nlp = spacy.blank("xx")
-    _NLP_CACHE[lang] = nlp
+            # Fallback minimal si le modèle manque
+            try:
+                nlp = spacy.blank({"fr": "fr", "en": "en", "da": "da"}.get(lang, "fr"))
+            except Exception:
+                nlp = spacy.blank("xx")
+        _NLP_CACHE[lang] = nlp
     return nlp
 
 
+def preload_models(langs: Optional[List[str]] = None) -> Dict[str, str]:
+    """Charge les modèles spaCy dès le démarrage (évite le coût du premier appel pendant un fetch).
+    Retourne {langue: composants actifs}."""
+    loaded = {}
+    for lang in (langs or list(SPACY_MODELS)):
+        nlp = _load_spacy(lang)
+        loaded[lang] = ",".join(getattr(nlp, "pipe_names", []) or []) or "blank"
+    print(f"[INFO] Modèles spaCy préchargés: {loaded}")
+    return loaded
+
+
+def warmup() -> Dict[str, int]:
+    """Précharge tout ce qui est coûteux au premier appel: modèles spaCy, langues dateparser,
+    profils langdetect. Retourne la durée de chaque étape en ms."""
+    timings = {}
+    t0 = time.perf_counter()
+    preload_models()
+    timings["spacy_ms"] = int((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    search_dates("du 12 janvier au 3 February, 4. maj, 5 oktober", languages=DATE_LANGUAGES,
+                 settings={"RETURN_AS_TIMEZONE_AWARE": False})
+    timings["dateparser_ms"] = int((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    detect_language("Bonjour, nous cherchons un autocar pour notre groupe.")
+    timings["langdetect_ms"] = int((time.perf_counter() - t0) * 1000)
+    print(f"[INFO] Warmup NLP terminé: {timings}")
+    return timings
+
+
 def _clean_city_name(val: str) -> str:
     """Nettoie une valeur de ville: coupe sur formules de politesse, sauts de ligne, et ponctuation."""
     if not val:
         return ""
     v = str(val)
     # couper aux formules de politesse fréquentes
-    v = re.split(r"\b(cordialement|merci|bien\s*à\s*vous|salutations|regards|best\s*regards|thanks)\b", v, flags=re.IGNORECASE)[0]
+    v = _CITY_CUT_RE.split(v)[0]
     # couper à la première ligne
     v = v.split('\n')[0]
     # nettoyer ponctuation/espaces
-    v = v.strip(" \t,;:.!\-_")
+    v = v.strip(" \t,;:.!\\-_")
     return v
 
 
@@ -60,44 +133,107 @@ def clean_text(text: str) -> str:
     # uniformiser les tirets/fleches pour parcours
     text = text.replace("→", "->").replace("—", "-").replace("–", "-")
     # réduire espaces
-    text = re.sub(r"[ \t\x0b\x0c\r]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _MULTI_NEWLINES_RE.sub("\n\n", text)
     return text.strip()
 
 
-def detect_language(text: str) -> str:
-    """Détecte FR/EN/DA via langdetect si dispo, sinon heuristique."""
-    t = (text or "").strip()
-    if not t:
-        return "fr"
+# --- Détection de langue: pré-classifieur mots-outils/caractères, langdetect en arbitre, cache ---
+# Mots-outils propres à une langue: un mot courant dans une autre des quatre langues n'y figure pas
+# ("de" FR/NL/DA, "et" FR/DA, "du" FR/DA, "je"/"pas" FR/NL, "van" FR/NL, "is"/"in"/"we" EN/NL, "for"/"to"
+# EN/DA, "op"/"af"/"er" DA/NL, "on" FR/EN...), sinon il fausse le score d'une langue absente du texte
+_STOPWORDS = {
+    "fr": {"le", "la", "les", "des", "est", "une", "pour", "nous", "vous", "avec", "dans", "sur", "au", "aux",
+           "ce", "cette", "sont", "qui", "que", "par", "votre", "notre", "vos", "nos", "bonjour", "merci",
+           "cordialement", "personnes", "demande", "devis", "voiture", "location", "aller", "retour", "autocar"},
+    "en": {"the", "and", "are", "with", "you", "from", "this", "that", "our", "your", "please", "thank",
+           "thanks", "hello", "dear", "will", "be", "would", "could", "need", "people", "regards", "request",
+           "quote", "coach", "trip"},
+    "da": {"og", "det", "med", "vi", "jeg", "på", "har", "som", "ikke", "fra", "skal", "vil", "jeres",
+           "vores", "også", "hvor", "hvad", "tak", "hej", "venlig", "hilsen", "mvh", "bil", "leje",
+           "personer", "rejse", "tilbud"},
+    "nl": {"het", "een", "voor", "wij", "ik", "zijn", "naar", "niet", "dat", "deze", "ons", "onze", "uw",
+           "ook", "bij", "wordt", "graag", "bedankt", "groet", "groeten", "vriendelijke", "personen",
+           "reizigers", "reis", "offerte", "vervoer", "heen", "terug"},
+}
+# Caractères propres à une langue (un point par mot qui en contient)
+_LANG_CHAR_RE = {
+    "fr": re.compile(r"[éèêàçùœ]"),
+    "da": re.compile(r"[æøå]"),
+    "nl": re.compile(r"ij"),
+}
+_WORD_RE = re.compile(r"[a-zà-ÿæøå']+")
+LANG_DETECT_MAX_CHARS = 4000  # au-delà, la langue d'un email ne change plus
+LANG_CACHE_SIZE = int(os.getenv("LANG_CACHE_SIZE", "4096"))
+_LANG_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_LANG_CACHE_LOCK = threading.Lock()
+
+
+def _model_language(code: str) -> str:
+    """Ramène un code langue à une langue ayant un modèle spaCy (pas de modèle néerlandais: fr, comme avant)."""
+    return code if code in SPACY_MODELS else "fr"
+
+
+def _preclassify(text: str) -> Tuple[Optional[str], bool]:
+    """Score FR/EN/DA/NL par mots-outils et caractères. Retourne (meilleure langue ou None, sûr?)."""
+    scores = dict.fromkeys(_STOPWORDS, 0)
+    for w in _WORD_RE.findall(text.lower()):
+        for lang, words in _STOPWORDS.items():
+            if w in words:
+                scores[lang] += 1
+        for lang, rgx in _LANG_CHAR_RE.items():
+            if rgx.search(w):
+                scores[lang] += 1
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (best, top), (_, second) = ranked[0], ranked[1]
+    if top == 0:
+        return None, False
+    return best, (top >= 3 and top >= 2 * second)
+
+
+def _detect_language_uncached(t: str) -> str:
+    best, sure = _preclassify(t)
+    if sure:
+        return _model_language(best)
+    # Cas serré: langdetect arbitre
     if langdetect_detect:
         try:
-            code = langdetect_detect(t)
-            if code.startswith("fr"):
-                return "fr"
-            if code.startswith("en"):
-                return "en"
-            if code.startswith("da"):
-                return "da"
+            code = langdetect_detect(t)[:2]
+            if code in _STOPWORDS:
+                return _model_language(code)
         except Exception:
             pass
-    # Heuristique simple en fallback
-    french_words = ['bonjour', 'merci', 'voiture', 'location', 'réservation', 'demande', 'personnes']
-    english_words = ['hello', 'thank', 'car', 'rental', 'booking', 'request', 'people']
-    danish_words = ['hej', 'tak', 'bil', 'leje', 'booking']
-    tl = t.lower()
-    fr_c = sum(1 for w in french_words if w in tl)
-    en_c = sum(1 for w in english_words if w in tl)
-    da_c = sum(1 for w in danish_words if w in tl)
-    if fr_c >= en_c and fr_c >= da_c:
-        return 'fr'
-    if en_c >= da_c:
-        return 'en'
-    return 'da'
+    return _model_language(best or "fr")
+
+
+def detect_language(text: str) -> str:
+    """Détecte FR/EN/DA (langues des modèles spaCy): pré-classifieur rapide, langdetect seulement
+    en cas d'hésitation; résultat mémorisé par empreinte du texte."""
+    t = (text or "").strip()[:LANG_DETECT_MAX_CHARS]
+    if not t:
+        return "fr"
+    key = hashlib.blake2b(t.encode("utf-8", "ignore"), digest_size=16).digest()
+    with _LANG_CACHE_LOCK:
+        lang = _LANG_CACHE.get(key)
+        if lang is not None:
+            _LANG_CACHE.move_to_end(key)
+            return lang
+    lang = _detect_language_uncached(t)
+    with _LANG_CACHE_LOCK:
+        _LANG_CACHE[key] = lang
+        while len(_LANG_CACHE) > LANG_CACHE_SIZE:
+            _LANG_CACHE.popitem(last=False)
+    return lang
+
+
+def _block_language(bloc: str, email_lang: str) -> str:
+    """Langue d'un bloc: celle de l'email, sauf si le pré-classifieur est sûr d'une autre."""
+    best, sure = _preclassify(bloc)
+    return _model_language(best) if sure else email_lang
 
 
 def extract_email(text: str) -> str:
-    m = re.search(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text)
+    m = EMAIL_RE.search(text)
     if not m:
         return ""
     addr = m.group(0)
@@ -111,19 +247,18 @@ def extract_email(text: str) -> str:
 
 def normalize_phone(raw: str) -> str:
     # Conserver + et chiffres
-    digits = re.sub(r"[^0-9+]", "", raw)
+    digits = _PHONE_STRIP_RE.sub("", raw)
     # Simplifier ++ et formats bizarres
-    digits = re.sub(r"\+{2,}", "+", digits)
+    digits = _PLUS_RUN_RE.sub("+", digits)
     return digits
 
 
 def extract_phone(text: str) -> str:
     # Capte diverses formes: +33 6 12 34 56 78, 06-12-34-56-78, +45 12 34 56 78
-    pattern = r"(\+?\d{1,3}[\s.-]?)?(\d[\d\s.-]{7,14})"
-    for m in re.finditer(pattern, text):
+    for m in PHONE_RE.finditer(text):
         candidate = m.group(0)
         cand_norm = normalize_phone(candidate)
-        if len(re.sub(r"\D", "", cand_norm)) >= 8:
+        if len(_NON_DIGIT_RE.sub("", cand_norm)) >= 8:
             return cand_norm
     return ""
 
@@ -139,69 +274,185 @@ WORD_NUM_EN = {
     "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
     "sixteen": 16,
 }
+# Priorité = ordre du dictionnaire fusionné (FR puis EN), comme l'ancienne boucle mot par mot
+_WORD_NUM = {**WORD_NUM_FR, **WORD_NUM_EN}
+_WORD_NUM_PRIORITY = {w: i for i, w in enumerate(_WORD_NUM)}
+_WORD_NUM_RE = re.compile(
+    r"\b(" + "|".join(re.escape(w) for w in _WORD_NUM) + r")\b\s+(?:personnes|people|passagers)"
+)
+_NB_DIRECT_PATTERNS = [re.compile(rgx, re.IGNORECASE) for rgx in [
+    r"(?:\bfor|pour)\s+(\d{1,3})\s+(?:people|persons|personnes|personne|passagers|pax)",
+    r"\b(\d{1,3})\s*(?:personnes|personne|people|voyageurs|participants|coaches|boys|passagers|pax)\b",
+    r"There will be\s+(\d{1,3})\s+of us",
+    r"\b(\d{1,3})\s*x\s*(?:people|personnes|pax)\b",
+    r"\bgroup of\s*(\d{1,3})\b",
+    r"\b(\d{1,3})\s*(?:adults|adultes)\b",
+    r"\b(\d{1,3})\s*(?:children|kids|enfants)\b",
+]]
+_NB_RANGE_RE = re.compile(r"(\d{1,3})\s*[-àto]{1,2}\s*(\d{1,3})\s*(?:personnes|people|pax)")
 
 
 def extract_nb_personnes(text: str) -> str:
     # 1) Expressions directes
-    direct_patterns = [
-        r"(?:\bfor|pour)\s+(\d{1,3})\s+(?:people|persons|personnes|personne|passagers|pax)",
-        r"\b(\d{1,3})\s*(?:personnes|personne|people|voyageurs|participants|coaches|boys|passagers|pax)\b",
-        r"There will be\s+(\d{1,3})\s+of us",
-        r"\b(\d{1,3})\s*x\s*(?:people|personnes|pax)\b",
-        r"\bgroup of\s*(\d{1,3})\b",
-        r"\b(\d{1,3})\s*(?:adults|adultes)\b",
-        r"\b(\d{1,3})\s*(?:children|kids|enfants)\b",
-    ]
-    for rgx in direct_patterns:
-        m = re.search(rgx, text, re.IGNORECASE)
+    for rgx in _NB_DIRECT_PATTERNS:
+        m = rgx.search(text)
         if m:
             return m.group(1)
 
-    # 2) Nombres en lettres FR/EN
+    # 2) Nombres en lettres FR/EN (une seule passe; le mot le plus prioritaire l'emporte)
     tl = text.lower()
-    for w, n in {**WORD_NUM_FR, **WORD_NUM_EN}.items():
-        if re.search(fr"\b{re.escape(w)}\b\s+(?:personnes|people|passagers)", tl):
-            return str(n)
+    words = [m.group(1) for m in _WORD_NUM_RE.finditer(tl)]
+    if words:
+        return str(_WORD_NUM[min(words, key=_WORD_NUM_PRIORITY.__getitem__)])
 
     # 3) Intervalles 20-30 personnes -> 20-30
-    m = re.search(r"(\d{1,3})\s*[-àto]{1,2}\s*(\d{1,3})\s*(?:personnes|people|pax)", tl)
+    m = _NB_RANGE_RE.search(tl)
     if m:
         return f"{m.group(1)}-{m.group(2)}"
     return ""
 
 
+MONTH_NAMES = [
+    'jan', 'janv', 'janvier', 'feb', 'fev', 'févr', 'février', 'february', 'march', 'mars', 'apr', 'avr', 'avril', 'april',
+    'may', 'mai', 'jun', 'juin', 'june', 'jul', 'juillet', 'july', 'aug', 'août', 'aout', 'august', 'sep', 'sept', 'septembre',
+    'oct', 'octobre', 'october', 'nov', 'novembre', 'november', 'dec', 'déc', 'décembre', 'december',
+    # NL/DA short
+    'januar', 'januar', 'februar', 'marts', 'april', 'maj', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'december',
+    'januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli', 'augustus', 'september', 'oktober', 'november', 'december'
+]
+_MONTH_ALT = r"(" + "|".join(sorted(set(MONTH_NAMES), key=len, reverse=True)) + r")"
+_DM_NO_YEAR_RE = re.compile(r"\b(\d{1,2})([\/\-.])(\d{1,2})(?![\/\-.]\d{2,4})\b")
+_DAY_MONTH_NO_YEAR_RE = re.compile(fr"\b(\d{{1,2}})\s+{_MONTH_ALT}\b(?!\s*\d{{2,4}})", re.IGNORECASE)
+_MONTH_DAY_NO_YEAR_RE = re.compile(fr"\b{_MONTH_ALT}\s+(\d{{1,2}})\b(?!\s*\d{{2,4}})", re.IGNORECASE)
+
+# Numéro de mois par nom (FR/EN/DA/NL), pour le tokenizer de dates rapide
+MONTH_NUMBERS = {
+    'jan': 1, 'janv': 1, 'janvier': 1, 'january': 1, 'januar': 1, 'januari': 1,
+    'feb': 2, 'fev': 2, 'fév': 2, 'févr': 2, 'février': 2, 'fevrier': 2, 'february': 2, 'februar': 2, 'februari': 2,
+    'mar': 3, 'mars': 3, 'march': 3, 'marts': 3, 'maart': 3,
+    'apr': 4, 'avr': 4, 'avril': 4, 'april': 4,
+    'may': 5, 'mai': 5, 'maj': 5, 'mei': 5,
+    'jun': 6, 'juin': 6, 'june': 6, 'juni': 6,
+    'jul': 7, 'juil': 7, 'juillet': 7, 'july': 7, 'juli': 7,
+    'aug': 8, 'août': 8, 'aout': 8, 'august': 8, 'augustus': 8,
+    'sep': 9, 'sept': 9, 'septembre': 9, 'september': 9,
+    'oct': 10, 'okt': 10, 'octobre': 10, 'october': 10, 'oktober': 10,
+    'nov': 11, 'novembre': 11, 'november': 11,
+    'dec': 12, 'déc': 12, 'décembre': 12, 'decembre': 12, 'december': 12,
+}
+_MONTH_NUM_ALT = "|".join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+# ISO (2025-10-12), numérique jour d'abord (12/10, 12.10.2025, 27-09-2025 17:30), "12 oct(obre) 2025",
+# "4. maj", "1er mai", "Oct 12, 2025". L'heure éventuelle est ignorée.
+_FAST_DATE_RE = re.compile(
+    r"(?<![\w/.\-])(?:"
+    r"(?P<iy>\d{4})-(?P<im>\d{1,2})-(?P<id>\d{1,2})"
+    r"|(?P<nd>\d{1,2})(?P<sep>[/.\-])(?P<nm>\d{1,2})(?:(?P=sep)(?P<ny>\d{4}|\d{2}))?"
+    fr"|(?P<td>\d{{1,2}})(?:er|st|nd|rd|th|\.)?\s+(?P<tm>{_MONTH_NUM_ALT})\.?(?:\s+(?P<ty>\d{{4}}))?"
+    fr"|(?P<mm>{_MONTH_NUM_ALT})\.?\s+(?P<md>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<my>\d{{4}}))?"
+    r")(?![\w/\-]|[.:]\d)",
+    re.IGNORECASE,
+)
+# Mots relatifs que seul dateparser sait résoudre: leur présence renvoie au chemin dateparser
+_DATE_HINT_RE = re.compile(
+    r"\b(?:aujourd'hui|demain|today|tomorrow|tonight|i\s+dag|i\s+morgen|overmorgen|vandaag|morgen)\b",
+    re.IGNORECASE,
+)
+# Sans lecture rapide, dateparser n'est appelé que si le texte contient un de ces indices de date
+# (mois, jour de la semaine, délai relatif); sinon il transformerait prix, heures ou effectifs en dates
+_WEEKDAYS = [
+    'lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+    'mandag', 'tirsdag', 'onsdag', 'torsdag', 'fredag', 'lørdag', 'søndag',
+    'maandag', 'dinsdag', 'woensdag', 'donderdag', 'vrijdag', 'zaterdag', 'zondag',
+]
+_DATE_CANDIDATE_RE = re.compile(
+    r"\b(?:" + "|".join(sorted(set(MONTH_NAMES) | set(MONTH_NUMBERS) | set(_WEEKDAYS), key=len, reverse=True)) + r")\b"
+    r"|\b(?:dans|in|om|over)\s+\d+\s+(?:jours?|semaines?|mois|days?|weeks?|months?|dage?|uger?|måneder?|dagen|weken|maanden)\b"
+    r"|\b(?:semaine|mois)\s+prochaine?\b|\bnext\s+(?:week|month)\b|\bnæste\s+(?:uge|måned)\b|\bvolgende\s+(?:week|maand)\b",
+    re.IGNORECASE,
+)
+_AMBIGUOUS = object()
+
+_REL_NEXT_WEEK_FR_RE = re.compile(r"semaine\s+prochaine.*?\b(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b")
+_REL_NEXT_EN_RE = re.compile(r"next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)")
+_REL_FROM_FR_RE = re.compile(r"\b(?:a|à)\s*partir\s*de\s*(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b")
+_PERIOD_PATTERNS = [re.compile(rgx, re.IGNORECASE) for rgx in [
+    r"(?:du|from|van)\s+([^\n;]+?)\s+(?:au|to|till|until|tot)\s+([^\n;]+)",
+    r"(\d{1,2}[\/.\-]\d{1,2}(?:[\/.\-]\d{2,4})?)\s*(?:au|to|-)\s*(\d{1,2}[\/.\-]\d{1,2}(?:[\/.\-]\d{2,4})?)",
+]]
+
+
+def _inject_year(s: str, year: int) -> str:
+    """Injecte l'année quand elle est omise (ex: 12/10 -> 12/10/2025, 12 Oct -> 12 Oct 2025)."""
+    # dd/mm or dd-mm or dd.mm without trailing year
+    s = _DM_NO_YEAR_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}{m.group(2)}{year}", s)
+    # 12 Oct -> 12 Oct 2025
+    s = _DAY_MONTH_NO_YEAR_RE.sub(lambda m: f"{m.group(1)} {m.group(2)} {year}", s)
+    # Oct 12 -> Oct 12 2025
+    s = _MONTH_DAY_NO_YEAR_RE.sub(lambda m: f"{m.group(1)} {m.group(2)} {year}", s)
+    return s
+
+
+def _fast_match_to_date(m, year: int):
+    """Date d'une correspondance de _FAST_DATE_RE; None si invalide, _AMBIGUOUS si seul dateparser peut trancher."""
+    g = m.groupdict()
+    try:
+        if g["iy"]:
+            return date(int(g["iy"]), int(g["im"]), int(g["id"]))
+        if g["nd"]:
+            d, mo = int(g["nd"]), int(g["nm"])
+            y = int(g["ny"]) if g["ny"] else year
+            if g["ny"] and len(g["ny"]) == 2:
+                y += 2000
+            if mo > 12:
+                # 10/25/2025: lisible seulement en mois/jour; sans année (10-20 personnes), pas une date
+                return _AMBIGUOUS if g["ny"] and 1 <= d <= 12 and mo <= 31 else None
+            if g["sep"] == "-" and not g["ny"]:
+                # 5-6 personnes, 10-12 ans: un intervalle, pas le 5 juin
+                return None
+            return date(y, mo, d)
+        if g["td"]:
+            return date(int(g["ty"]) if g["ty"] else year, MONTH_NUMBERS[g["tm"].lower()], int(g["td"]))
+        return date(int(g["my"]) if g["my"] else year, MONTH_NUMBERS[g["mm"].lower()], int(g["md"]))
+    except ValueError:
+        return None
+
+
+def _scan_dates(text: str, year: int) -> Optional[List[date]]:
+    """Tokenizer de dates rapide (sans dateparser). Retourne les dates trouvées ([] si le texte n'a
+    aucun indice de date), ou None si le texte contient une forme ambiguë, relative ou non lue
+    (mois ou jour de la semaine hors formats courants) à confier à dateparser."""
+    if _DATE_HINT_RE.search(text):
+        return None
+    dates = []
+    for m in _FAST_DATE_RE.finditer(text):
+        d = _fast_match_to_date(m, year)
+        if d is _AMBIGUOUS:
+            return None
+        if d is not None:
+            dates.append(d)
+    if not dates and _DATE_CANDIDATE_RE.search(text):
+        return None
+    return dates
+
+
+def _parse_date_fast(raw: str, year: int) -> Optional[date]:
+    """Équivalent rapide de dateparser.parse quand `raw` est exactement une date d'un format courant."""
+    m = _FAST_DATE_RE.fullmatch(raw.strip().rstrip(".,;:!?)").strip())
+    if not m:
+        return None
+    d = _fast_match_to_date(m, year)
+    return None if d is _AMBIGUOUS else d
+
+
 def parse_dates_block(text: str) -> Tuple[str, str]:
     """Extrait (date_debut, date_fin) au format YYYY-MM-DD.
     Utilise d'abord patterns explicites de périodes, puis search_dates comme fallback.
+    Les formats courants sont lus directement (DATE_FAST_PATH); dateparser ne sert qu'au reste.
     """
     t = text
     current_year = datetime.now().year
 
-    # Injecter l'année courante quand elle est omise (ex: 12/10 -> 12/10/2025)
-    def _inject_year_ymd(s: str) -> str:
-        # dd/mm or dd-mm or dd.mm without trailing year
-        def repl(m):
-            d, mth, sep = m.group(1), m.group(2), m.group(3)
-            return f"{d}{sep}{mth}{sep}{current_year}"
-        s = re.sub(r"\b(\d{1,2})([\/\-.])(\d{1,2})(?![\/\-.]\d{2,4})\b", lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}{m.group(2)}{current_year}", s)
-        # 12 Oct/Octobre sans année -> ajouter année
-        months = [
-            'jan', 'janv', 'janvier', 'feb', 'fev', 'févr', 'février', 'february', 'march', 'mars', 'apr', 'avr', 'avril', 'april',
-            'may', 'mai', 'jun', 'juin', 'june', 'jul', 'juillet', 'july', 'aug', 'août', 'aout', 'august', 'sep', 'sept', 'septembre',
-            'oct', 'octobre', 'october', 'nov', 'novembre', 'november', 'dec', 'déc', 'décembre', 'december',
-            # NL/DA short
-            'januar', 'januar', 'februar', 'marts', 'april', 'maj', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'december',
-            'januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli', 'augustus', 'september', 'oktober', 'november', 'december'
-        ]
-        month_re = r"(" + "|".join(sorted(set(months), key=len, reverse=True)) + r")"
-        # 12 Oct -> 12 Oct 2025
-        s = re.sub(fr"\b(\d{{1,2}})\s+{month_re}\b(?!\s*\d{{2,4}})", lambda m: f"{m.group(1)} {m.group(2)} {current_year}", s, flags=re.IGNORECASE)
-        # Oct 12 -> Oct 12 2025
-        s = re.sub(fr"\b{month_re}\s+(\d{{1,2}})\b(?!\s*\d{{2,4}})", lambda m: f"{m.group(1)} {m.group(2)} {current_year}", s, flags=re.IGNORECASE)
-        return s
-
-    t_inj = _inject_year_ymd(t)
-
     # 0) Expressions relatives: "la semaine prochaine à partir de lundi", "next monday", "à partir de lundi"
     days_fr = {"lundi":0, "mardi":1, "mercredi":2, "jeudi":3, "vendredi":4, "samedi":5, "dimanche":6}
     days_en = {"monday":0, "tuesday":1, "wednesday":2, "thursday":3, "friday":4, "saturday":5, "sunday":6}
@@ -215,7 +466,7 @@ def parse_dates_block(text: str) -> Tuple[str, str]:
 
     tl = t.lower()
     # semaine prochaine + jour
-    m_rel = re.search(r"semaine\s+prochaine.*?\b(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b", tl)
+    m_rel = _REL_NEXT_WEEK_FR_RE.search(tl)
     if m_rel:
         wd = days_fr[m_rel.group(1)]
         base = datetime.now() + timedelta(days=7)
@@ -225,7 +476,7 @@ def parse_dates_block(text: str) -> Tuple[str, str]:
         return start_dt.strftime('%Y-%m-%d'), ""
 
     # "next monday" (EN)
-    m_rel_en = re.search(r"next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)", tl)
+    m_rel_en = _REL_NEXT_EN_RE.search(tl)
     if m_rel_en:
         wd = days_en[m_rel_en.group(1)]
         base = datetime.now()
@@ -233,33 +484,35 @@ def parse_dates_block(text: str) -> Tuple[str, str]:
         return start_dt.strftime('%Y-%m-%d'), ""
 
     # "à partir de lundi"
-    m_from = re.search(r"\b(?:a|à)\s*partir\s*de\s*(lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b", tl)
+    m_from = _REL_FROM_FR_RE.search(tl)
     if m_from:
         wd = days_fr[m_from.group(1)]
         base = datetime.now()
         start_dt = _next_weekday(base, wd)
         return start_dt.strftime('%Y-%m-%d'), ""
     # Périodes explicites: du 12/10 au 15/10, from 1 Nov to 3 Nov
-    period_patterns = [
-        r"(?:du|from|van)\s+([^\n;]+?)\s+(?:au|to|till|until|tot)\s+([^\n;]+)",
-        r"(\d{1,2}[\/.\-]\d{1,2}(?:[\/.\-]\d{2,4})?)\s*(?:au|to|-)\s*(\d{1,2}[\/.\-]\d{1,2}(?:[\/.\-]\d{2,4})?)",
-    ]
-    for rgx in period_patterns:
-        m = re.search(rgx, t, re.IGNORECASE)
+    for rgx in _PERIOD_PATTERNS:
+        m = rgx.search(t)
         if m:
             start_raw, end_raw = m.group(1), m.group(2)
-            start_raw = _inject_year_ymd(start_raw)
-            end_raw = _inject_year_ymd(end_raw)
-            s = parse(start_raw, languages=['fr', 'en', 'da', 'nl'], settings={"PREFER_DAY_OF_MONTH": "first", "RELATIVE_BASE": datetime.now()})
-            e = parse(end_raw, languages=['fr', 'en', 'da', 'nl'], settings={"PREFER_DAY_OF_MONTH": "last", "RELATIVE_BASE": datetime.now()})
+            s = _parse_date_fast(start_raw, current_year) if DATE_FAST_PATH else None
+            if s is None:
+                s = parse(_inject_year(start_raw, current_year), languages=DATE_LANGUAGES, settings={"PREFER_DAY_OF_MONTH": "first", "RELATIVE_BASE": datetime.now()})
+            e = _parse_date_fast(end_raw, current_year) if (DATE_FAST_PATH and s) else None
+            if s and e is None:
+                e = parse(_inject_year(end_raw, current_year), languages=DATE_LANGUAGES, settings={"PREFER_DAY_OF_MONTH": "last", "RELATIVE_BASE": datetime.now()})
             if s and e:
                 return s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')
 
-    # Fallback: chercher toutes les dates, garder fenêtre la plus plausible (préférez futur)
-    found = search_dates(t_inj, languages=['fr', 'en', 'da', 'nl'], settings={"RETURN_AS_TIMEZONE_AWARE": False, "RELATIVE_BASE": datetime.now()})
-    if found:
+    # Fallback: chercher toutes les dates, garder fenêtre la plus plausible (préférez futur).
+    # Tokenizer rapide d'abord; search_dates seulement pour les textes ambigus ou aux dates non lues.
+    dates = _scan_dates(t, current_year) if DATE_FAST_PATH else None
+    if dates is None:
+        found = search_dates(_inject_year(t, current_year), languages=DATE_LANGUAGES, settings={"RETURN_AS_TIMEZONE_AWARE": False, "RELATIVE_BASE": datetime.now()})
+        dates = [d[1].date() for d in found] if found else []
+    if dates:
         today = datetime.now().date()
-        dates = sorted([d[1].date() for d in found])
+        dates = sorted(dates)
         # garder seulement >= aujourd'hui si dispo, sinon original
         future = [d for d in dates if d >= today]
         chosen = future if future else dates
@@ -287,6 +540,15 @@ PHONE_CODE_COUNTRY = {
     '+49': 'Germany', '+45': 'Denmark', '+41': 'Switzerland', '+352': 'Luxembourg', '+351': 'Portugal'
 }
 
+_PLACE_LABEL_PATTERNS = [re.compile(rgx, re.IGNORECASE) for rgx in [
+    r"(?:Ville\s*(?:de)?\s*départ|Départ|From|Pickup|Vertrekstad)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
+    r"(?:Ville\s*(?:d')?arriv[ée]e|Arrivée|To|Dropoff|Aankomststad)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
+    r"(?:Ville|City|Lieu)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
+]]
+_ITINERARY_RE = re.compile(r"([A-Za-zÀ-ÿ'\- ]{2,})\s*(?:->|to|vers|\-)\s*([A-Za-zÀ-ÿ'\- ]{2,})", re.IGNORECASE)
+_COUNTRY_LABEL_RE = re.compile(r"(?:Pays|Country)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)", re.IGNORECASE)
+
+
 def extract_places(text: str, doc: spacy.language.Language) -> Tuple[str, List[str], str, str]:
     """Retourne (ville_principale, villes, pays, itineraire) où itineraire peut être 'A->B'."""
     villes: List[str] = []
@@ -294,19 +556,14 @@ def extract_places(text: str, doc: spacy.language.Language) -> Tuple[str, List[s
     itinerary = ""
 
     # Champs étiquetés
-    labeled_patterns = [
-        r"(?:Ville\s*(?:de)?\s*départ|Départ|From|Pickup|Vertrekstad)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
-        r"(?:Ville\s*(?:d')?arriv[ée]e|Arrivée|To|Dropoff|Aankomststad)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
-        r"(?:Ville|City|Lieu)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
-    ]
-    for rgx in labeled_patterns:
-        for m in re.finditer(rgx, text, re.IGNORECASE):
+    for rgx in _PLACE_LABEL_PATTERNS:
+        for m in rgx.finditer(text):
             val = _clean_city_name(m.group(1).strip())
             if val and val not in villes:
                 villes.append(val)
 
     # Itinéraire A -> B
-    m = re.search(r"([A-Za-zÀ-ÿ'\- ]{2,})\s*(?:->|to|vers|\-)\s*([A-Za-zÀ-ÿ'\- ]{2,})", text, re.IGNORECASE)
+    m = _ITINERARY_RE.search(text)
     if m:
         a, b = _clean_city_name(m.group(1).strip()), _clean_city_name(m.group(2).strip())
         itinerary = f"{a}->{b}"
@@ -322,7 +579,7 @@ def extract_places(text: str, doc: spacy.language.Language) -> Tuple[str, List[s
                 villes.append(v)
 
     # Pays
-    pm = re.search(r"(?:Pays|Country)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)", text, re.IGNORECASE)
+    pm = _COUNTRY_LABEL_RE.search(text)
     if pm:
         pays = pm.group(1).strip()
 
@@ -350,41 +607,50 @@ def extract_places(text: str, doc: spacy.language.Language) -> Tuple[str, List[s
     return ville, villes, pays, itinerary
 
 
+VEHICLE_VOCAB = [
+    # FR
+    "bus", "autocar", "minibus", "voiture", "van", "minivan", "minibus", "suv",
+    # EN
+    "car", "coach", "bus", "minibus", "van", "minivan", "suv",
+    # DA/NL keywords
+    "bil", "lastbil", "bus", "minibus",
+]
+# Vocabulaire dédoublonné une fois pour toutes, ordre de priorité conservé. Le test de sous-chaîne
+# (`in`, en C) reste plus rapide qu'une alternation regex qui devrait gérer les chevauchements.
+_VEHICLE_TERMS = tuple(dict.fromkeys(VEHICLE_VOCAB))
+
+
 def extract_vehicle(text: str) -> str:
-    vocab = [
-        # FR
-        "bus", "autocar", "minibus", "voiture", "van", "minivan", "minibus", "suv",
-        # EN
-        "car", "coach", "bus", "minibus", "van", "minivan", "suv",
-        # DA/NL keywords
-        "bil", "lastbil", "bus", "minibus",
-    ]
     t = text.lower()
-    for v in vocab:
+    for v in _VEHICLE_TERMS:
         if v in t:
             return v
     return ""
 
 
+_TRIP_TYPE_PATTERNS = [(re.compile(rgx, re.IGNORECASE), label) for rgx, label in [
+    (r"aller\s*retour|aller-retour|a/r|ar|retourreis|heen en terug|round\s*trip", "aller-retour"),
+    (r"aller\s*simple|one\s*way|one-way", "aller simple"),
+]]
+
+
 def extract_trip_type(text: str) -> str:
-    patterns = [
-        (r"aller\s*retour|aller-retour|a/r|ar|retourreis|heen en terug|round\s*trip", "aller-retour"),
-        (r"aller\s*simple|one\s*way|one-way", "aller simple"),
-    ]
-    for rgx, label in patterns:
-        if re.search(rgx, text, re.IGNORECASE):
+    for rgx, label in _TRIP_TYPE_PATTERNS:
+        if rgx.search(text):
             return label
     return ""
 
 
+_NAME_PATTERNS = [re.compile(rgx, re.IGNORECASE) for rgx in [
+    r"(?:Naam|Nom|Name)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
+    r"(?:Je m'appelle|My name is|Mijn naam is|Mon nom est)\s+([A-Za-zÀ-ÿ'\- ]+)",
+]]
+
+
 def extract_name(doc: spacy.language.Language, text: str) -> Tuple[str, str]:
     nom, prenom = "", ""
-    nom_patterns = [
-        r"(?:Naam|Nom|Name)\s*[:\-]?\s*([A-Za-zÀ-ÿ'\- ]+)",
-        r"(?:Je m'appelle|My name is|Mijn naam is|Mon nom est)\s+([A-Za-zÀ-ÿ'\- ]+)",
-    ]
-    for rgx in nom_patterns:
-        m = re.search(rgx, text, re.IGNORECASE)
+    for rgx in _NAME_PATTERNS:
+        m = rgx.search(text)
         if m:
             parts = m.group(1).split()
             if len(parts) > 1:
@@ -399,15 +665,12 @@ def extract_name(doc: spacy.language.Language, text: str) -> Tuple[str, str]:
     return nom, prenom
 
 
-def extraire_infos(email_text: str) -> List[Dict[str, str]]:
-    """Analyse multi-langues (FR, EN, NL, DA), multi-blocs et retourne une liste de demandes structurées
+_KV_LINE_RE = re.compile(r"^([A-Za-zÀ-ÿ' \-]{2,40})\s*[:\-]\s*(.+)$")
+_BLOCK_SPLIT_RE = re.compile(r"\n\s*\n")
 
-    Champs retournés minimum (compatibles existants):
-    - nom, prenom, email, telephone, ville, villes, pays,
-    - date_debut, date_fin, type_vehicule, type_voyage, nb_personnes,
-    - infos_libres, corps_mail, langue_detectee
-    + Extras non bloquants: itinerary
-    """
+
+def _split_blocs(email_text: str) -> List[str]:
+    """Nettoie le texte, ajoute les alias des lignes 'Label | Valeur' / 'Label: Valeur' et découpe en blocs."""
     text = clean_text(email_text or "")
     # Si le texte provient d'un tableau HTML transformé, on peut avoir des lignes "Label | Valeur"
     # Essayons d'aplatir les lignes en clés/valeurs pour enrichir le bloc avant extraction
@@ -421,7 +684,7 @@ def extraire_infos(email_text: str) -> List[Dict[str, str]]:
                 kv_map[parts[0].lower()] = parts[1]
                 continue
         # Forme 2: Label: Valeur
-        m = re.match(r"^([A-Za-zÀ-ÿ' \-]{2,40})\s*[:\-]\s*(.+)$", ln)
+        m = _KV_LINE_RE.match(ln)
         if m:
             kv_map[m.group(1).lower()] = m.group(2).strip()
     # Construire un texte enrichi avec les alias multi-langues pour aider les regex
@@ -468,48 +731,120 @@ def extraire_infos(email_text: str) -> List[Dict[str, str]]:
     if alias_pairs:
         text = text + "\n\n" + "\n".join(alias_pairs)
     # Séparer par doubles sauts de ligne mais conserver blocs raisonnables
-    blocs = [b.strip() for b in re.split(r"\n\s*\n", text) if b.strip()]
-    demandes: List[Dict[str, str]] = []
+    return [b.strip() for b in _BLOCK_SPLIT_RE.split(text) if b.strip()]
+
+
+def _extract_bloc(bloc: str, langue: str, doc) -> Dict[str, str]:
+    """Extraction des champs d'un bloc, à partir de son doc spaCy (seul doc.ents est utilisé)."""
+    # Nom/prénom
+    nom, prenom = extract_name(doc, bloc)
+    # Email
+    email = extract_email(bloc)
+    # Téléphone
+    telephone = extract_phone(bloc)
+    # Nb personnes
+    nb_personnes = extract_nb_personnes(bloc)
+    # Dates
+    date_debut, date_fin = parse_dates_block(bloc)
+    # Lieux
+    ville, villes, pays, itinerary = extract_places(bloc, doc)
+    # Type de véhicule
+    type_vehicule = extract_vehicle(bloc)
+    # Type de voyage
+    type_voyage = extract_trip_type(bloc)
+
+    return {
+        "nom": nom,
+        "prenom": prenom,
+        "email": email,
+        "telephone": telephone,
+        "ville": ville,
+        "villes": villes,
+        "pays": pays,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+        "type_vehicule": type_vehicule,
+        "type_voyage": type_voyage,
+        "nb_personnes": nb_personnes,
+        "infos_libres": bloc,
+        "corps_mail": bloc,
+        "langue_detectee": langue,
+        "itinerary": itinerary,
+    }
+
+
+def extraire_infos_batch(email_texts: List[str], batch_size: Optional[int] = None,
+                         n_process: Optional[int] = None) -> List:
+    """Version groupée de extraire_infos: retourne une liste de demandes par email, dans l'ordre.
+
+    Les blocs de tous les emails sont regroupés par langue détectée et passés en une fois
+    dans nlp.pipe (un seul passage du modèle par langue au lieu d'un appel par bloc).
+    Un email dont l'analyse échoue n'affecte pas les autres: sa place contient l'exception levée.
+    Appelable depuis plusieurs threads: nlp.pipe est sérialisé par modèle (_SPACY_PIPE_LOCKS).
+    """
+    echecs: Dict[int, Exception] = {}
+    blocs_par_email: List[List[str]] = []
+    # (index email, index bloc) par langue, pour replacer chaque doc à sa place
+    par_langue: Dict[str, List[Tuple[int, int]]] = {}
+    langues: Dict[Tuple[int, int], str] = {}
+    for i, texte in enumerate(email_texts):
+        try:
+            blocs = _split_blocs(texte)
+            # une détection par email; un bloc ne change de langue que si le pré-classifieur est formel
+            langue_email = detect_language("\n\n".join(blocs)) if blocs else "fr"
+            langues_email = [_block_language(bloc, langue_email) for bloc in blocs]
+        except Exception as e:
+            echecs[i] = e
+            blocs, langues_email = [], []
+        blocs_par_email.append(blocs)
+        for j, langue in enumerate(langues_email):
+            langues[(i, j)] = langue
+            par_langue.setdefault(langue, []).append((i, j))
+
+    docs = {}
+    for langue, positions in par_langue.items():
+        try:
+            nlp = _load_spacy(langue)
+            textes = (blocs_par_email[i][j] for i, j in positions)
+            with _SPACY_PIPE_LOCKS.setdefault(langue, threading.Lock()):
+                for pos, doc in zip(positions, nlp.pipe(textes,
+                                                        batch_size=batch_size or SPACY_BATCH_SIZE,
+                                                        n_process=n_process or SPACY_N_PROCESS)):
+                    docs[pos] = doc
+        except Exception:
+            # passage groupé en échec: chaque bloc restant est analysé seul, l'échec reste sur son email
+            for i, j in positions:
+                if (i, j) in docs or i in echecs:
+                    continue
+                try:
+                    nlp = _load_spacy(langue)
+                    with _SPACY_PIPE_LOCKS.setdefault(langue, threading.Lock()):
+                        docs[(i, j)] = nlp(blocs_par_email[i][j])
+                except Exception as e_bloc:
+                    echecs[i] = e_bloc
+
+    resultats = []
+    for i, blocs in enumerate(blocs_par_email):
+        if i in echecs:
+            resultats.append(echecs[i])
+            continue
+        try:
+            resultats.append([_extract_bloc(bloc, langues[(i, j)], docs[(i, j)]) for j, bloc in enumerate(blocs)])
+        except Exception as e:
+            resultats.append(e)
+    return resultats
 
-    for bloc in blocs:
-        langue = detect_language(bloc)
-        nlp = _load_spacy(langue)
-        doc = nlp(bloc)
 
-        # Nom/prénom
-        nom, prenom = extract_name(doc, bloc)
-        # Email
-        email = extract_email(bloc)
-        # Téléphone
-        telephone = extract_phone(bloc)
-        # Nb personnes
-        nb_personnes = extract_nb_personnes(bloc)
-        # Dates
-        date_debut, date_fin = parse_dates_block(bloc)
-        # Lieux
-        ville, villes, pays, itinerary = extract_places(bloc, doc)
-        # Type de véhicule
-        type_vehicule = extract_vehicle(bloc)
-        # Type de voyage
-        type_voyage = extract_trip_type(bloc)
-
-        demandes.append({
-            "nom": nom,
-            "prenom": prenom,
-            "email": email,
-            "telephone": telephone,
-            "ville": ville,
-            "villes": villes,
-            "pays": pays,
-            "date_debut": date_debut,
-            "date_fin": date_fin,
-            "type_vehicule": type_vehicule,
-            "type_voyage": type_voyage,
-            "nb_personnes": nb_personnes,
-            "infos_libres": bloc,
-            "corps_mail": bloc,
-            "langue_detectee": langue,
-            "itinerary": itinerary,
-        })
-
-    return demandes
+def extraire_infos(email_text: str) -> List[Dict[str, str]]:
+    """Analyse multi-langues (FR, EN, NL, DA), multi-blocs et retourne une liste de demandes structurées
+
+    Champs retournés minimum (compatibles existants):
+    - nom, prenom, email, telephone, ville, villes, pays,
+    - date_debut, date_fin, type_vehicule, type_voyage, nb_personnes,
+    - infos_libres, corps_mail, langue_detectee
+    + Extras non bloquants: itinerary
+    """
+    resultat = extraire_infos_batch([email_text])[0]
+    if isinstance(resultat, Exception):
+        raise resultat
+    return resultat
@@ -0,0 +1,215 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+# Optional dependency: requests
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:
+    requests = None
+    HTTPAdapter = None
+
+# Shared HTTP layer for the OpenAI calls (ai_parser, ai_email):
+# one keep-alive session with a connection pool, retries with jittered backoff on 429/5xx,
+# and a remembered choice between the Responses and Chat Completions endpoints.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "10"))
+# How long a "this endpoint works" decision is kept before the preferred endpoint is probed again
+OPENAI_ENDPOINT_TTL = float(os.getenv("OPENAI_ENDPOINT_TTL", "3600"))
+# Requests sent at the same time, whatever the caller (extraction pool, email composer)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_endpoints = {}  # purpose -> (endpoint name, remembered at)
+_endpoints_lock = threading.Lock()
+
+
+def _parse_reset(value):
+    """Seconds from an x-ratelimit-reset-* header ('1s', '6m0s', '20ms', '1h2m3.5s'), or None."""
+    if not value:
+        return None
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", str(value))
+    if not parts:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return sum(float(n) * units[u] for n, u in parts)
+
+
+class RateLimiter:
+    """Requests/tokens-per-minute budget learnt from the x-ratelimit-* response headers.
+
+    acquire() blocks while the last known remaining budget is exhausted and its reset time
+    has not passed; each call debits the local copy so concurrent threads do not overshoot
+    between two responses. Until a first response arrives the budget is unknown (no wait).
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._requests = None  # (remaining, reset at)
+        self._tokens = None
+
+    def _wait_time(self, budget, need, now):
+        if budget is None:
+            return 0.0
+        remaining, reset_at = budget
+        if now >= reset_at or remaining >= need:
+            return 0.0
+        return reset_at - now
+
+    def acquire(self, tokens: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self._wait_time(self._requests, 1, now),
+                           self._wait_time(self._tokens, tokens, now))
+                if wait <= 0:
+                    if self._requests and now < self._requests[1]:
+                        self._requests = (self._requests[0] - 1, self._requests[1])
+                    if self._tokens and now < self._tokens[1]:
+                        self._tokens = (self._tokens[0] - tokens, self._tokens[1])
+                    break
+            print(f"[INFO] OpenAI rate limit budget exhausted, waiting {wait:.1f}s")
+            time.sleep(wait)
+        self._slots.acquire()
+
+    def release(self):
+        self._slots.release()
+
+    def update(self, headers):
+        """Record the budget reported by a response (missing headers leave it unchanged)."""
+        now = time.monotonic()
+        with self._lock:
+            for kind, attr in (("requests", "_requests"), ("tokens", "_tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                reset = _parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                if remaining is None or reset is None:
+                    continue
+                try:
+                    setattr(self, attr, (int(float(remaining)), now + reset))
+                except (TypeError, ValueError):
+                    continue
+
+    def pause(self, seconds: float):
+        """Block every caller for `seconds` (429 without usable headers)."""
+        with self._lock:
+            self._requests = (0, time.monotonic() + seconds)
+
+
+limiter = RateLimiter(OPENAI_MAX_CONCURRENCY)
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough token count charged for a request: ~4 characters per input token plus the output cap."""
+    out = payload.get("max_output_tokens") or payload.get("max_tokens") or 0
+    return len(json.dumps(payload, ensure_ascii=False)) // 4 + int(out)
+
+
+def get_session():
+    """Process-wide requests.Session (keep-alive, pooled connections), created on first use."""
+    global _session
+    if requests is None:
+        raise RuntimeError("requests not installed")
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=OPENAI_POOL_SIZE, pool_maxsize=OPENAI_POOL_SIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def _backoff_delay(attempt: int, retry_after=None) -> float:
+    """Full-jitter exponential backoff; honours a numeric Retry-After header when present."""
+    try:
+        if retry_after is not None:
+            return min(OPENAI_BACKOFF_MAX, max(0.0, float(retry_after)))
+    except (TypeError, ValueError):
+        pass
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def post_json(path: str, api_key: str, payload: dict, extra_headers=None, timeout=None):
+    """POST a JSON payload to OPENAI_BASE_URL + path on the shared session.
+
+    429/5xx responses and connection errors/timeouts are retried up to OPENAI_MAX_RETRIES times.
+    Each attempt goes through the shared rate limiter (concurrency slots, RPM/TPM budget).
+    Returns the last response; the caller checks the status code.
+    """
+    session = get_session()
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    headers.update(extra_headers or {})
+    url = f"{OPENAI_BASE_URL}/{path.lstrip('/')}"
+    timeout = timeout or (OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT)
+    tokens = estimate_tokens(payload)
+    attempt = 0
+    while True:
+        limiter.acquire(tokens)
+        try:
+            r = session.post(url, headers=headers, json=payload, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+            print(f"[WARN] OpenAI {path}: {e.__class__.__name__}, retry {attempt + 1} in {delay:.1f}s")
+        else:
+            limiter.update(r.headers)
+            if r.status_code not in RETRY_STATUS or attempt >= OPENAI_MAX_RETRIES:
+                return r
+            delay = _backoff_delay(attempt, r.headers.get("Retry-After"))
+            if r.status_code == 429:
+                limiter.pause(delay)
+            print(f"[WARN] OpenAI {path}: HTTP {r.status_code}, retry {attempt + 1} in {delay:.1f}s")
+        finally:
+            limiter.release()
+        time.sleep(delay)
+        attempt += 1
+
+
+def preferred_endpoint(purpose: str):
+    """Endpoint name that last succeeded for this purpose, or None once OPENAI_ENDPOINT_TTL has elapsed."""
+    with _endpoints_lock:
+        entry = _endpoints.get(purpose)
+    if entry and time.monotonic() - entry[1] < OPENAI_ENDPOINT_TTL:
+        return entry[0]
+    return None
+
+
+def call_with_fallback(purpose: str, attempts):
+    """Run the (name, fn) attempts in order, starting with the endpoint remembered for `purpose`.
+
+    The first fn that returns without raising wins and is remembered; if all fail the last error is raised.
+    """
+    preferred = preferred_endpoint(purpose)
+    ordered = sorted(attempts, key=lambda a: a[0] != preferred)
+    last_error = None
+    for name, fn in ordered:
+        try:
+            result = fn()
+        except Exception as e:
+            last_error = e
+            continue
+        if name != preferred:
+            print(f"[INFO] OpenAI {purpose}: using {name} endpoint")
+        with _endpoints_lock:
+            _endpoints[purpose] = (name, time.monotonic())
+        return result
+    raise last_error or RuntimeError("no endpoint attempted")
@@ -0,0 +1,179 @@
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from db import LazyDatabase, close_thread_connection
+from mailer import compose_partner_bodies, mailer_service, partner_groups, subject_for_lang
+
+# File d'envoi durable des emails partenaires: une ligne par (demande, langue) dans la table outbox,
+# livrée par un worker qui réessaie avec un délai exponentiel puis classe en échec (lettre morte).
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "30"))  # secondes, doublé à chaque échec
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "10"))
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "10"))
+# Attente maximale de la confirmation d'envoi par mailer_service (secondes)
+OUTBOX_SEND_TIMEOUT = float(os.getenv("OUTBOX_SEND_TIMEOUT", "120"))
+# Réservation (en_cours) reprise par un autre worker au-delà de ce délai: doit dépasser rédaction + envoi
+OUTBOX_LEASE_TTL = float(os.getenv("OUTBOX_LEASE_TTL", "600"))
+
+db = LazyDatabase()
+
+
+def outbox_key(demande_id, lang) -> str:
+    """Clé d'idempotence: une seule ligne par demande et par langue, même si la validation est rejouée."""
+    return f"demande:{demande_id}:{lang}"
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue_partner_emails(demande_id, ville, subject, gruppe, strecke, entfernung, fahrten, stunden_pro_tag, conn):
+    """Enregistre un email par langue de partenaires de la ville, sans le rédiger ni l'envoyer:
+    la rédaction (IA ou modèle) et l'envoi sont faits par le worker. Retourne les ids outbox."""
+    groups = partner_groups(ville, conn)
+    if not groups:
+        print(f"[INFO] Aucun partenaire trouvé pour la ville {ville}")
+        return []
+    donnees = json.dumps({
+        "gruppe": gruppe, "strecke": strecke, "entfernung": entfernung,
+        "fahrten": fahrten, "stunden_pro_tag": stunden_pro_tag,
+    }, ensure_ascii=False)
+    ids = []
+    for lang, recipients in groups.items():
+        outbox_id, created = db.enqueue_outbox(
+            outbox_key(demande_id, lang), demande_id, lang, json.dumps(recipients),
+            subject_for_lang(subject, lang), donnees=donnees,
+        )
+        ids.append(outbox_id)
+        if not created:
+            print(f"[INFO] Email (demande={demande_id}, lang={lang}) déjà en file: #{outbox_id}")
+    outbox_worker.wake()
+    return ids
+
+
+class OutboxWorker:
+    """Thread de livraison: réserve les emails échus, les rédige si besoin, les envoie via mailer_service
+    (connexion SMTP partagée) et enregistre le résultat (envoye, nouvelle tentative ou echec)."""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # pas de remise en file globale des en_cours: ils peuvent appartenir à un autre processus;
+            # claim_outbox ne reprend que ceux dont la réservation a expiré
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Signale de nouveaux emails; démarre le worker s'il ne tourne pas encore."""
+        self.start()
+        self._wake.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _compose_missing(self, items):
+        """Rédige en parallèle les corps manquants du lot (toutes les langues d'une demande à la fois).
+        Le corps est conservé: une nouvelle tentative renvoie le même texte sans le rédiger à nouveau."""
+        todo = [item for item in items if not item["corps"]]
+        jobs = []
+        for item in todo:
+            facts = json.loads(item["donnees"] or "{}")
+            jobs.append((item["langue"], facts.get("gruppe"), facts.get("strecke"), facts.get("entfernung"),
+                         [tuple(f) for f in facts.get("fahrten") or []], facts.get("stunden_pro_tag")))
+        for item, body in zip(todo, compose_partner_bodies(jobs)):
+            item["corps"] = body
+            db.update_outbox(item["id"], corps=body)
+
+    def _deliver(self, item):
+        if not item["corps"]:
+            raise RuntimeError("corps non rédigé")
+        msg_id = mailer_service.submit(json.loads(item["destinataires"] or "[]"), item["sujet"], item["corps"])
+        status = mailer_service.wait(msg_id, timeout=OUTBOX_SEND_TIMEOUT)
+        # encore en file: retiré et retenté plus tard
+        if status.get("status") == "queued" and mailer_service.cancel(msg_id):
+            raise RuntimeError(f"envoi non commencé après {OUTBOX_SEND_TIMEOUT:.0f} s")
+        while status.get("status") in ("queued", "sending"):
+            # transaction SMTP en cours: elle peut encore aboutir, une nouvelle tentative risquerait un doublon;
+            # l'email reste en_cours, réservation prolongée jusqu'au statut final
+            print(f"[WARN] Outbox #{item['id']}: envoi toujours en cours après {OUTBOX_SEND_TIMEOUT:.0f} s, attente")
+            db.update_outbox(item["id"], reserve_le=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            status = mailer_service.wait(msg_id, timeout=OUTBOX_SEND_TIMEOUT)
+        if status.get("status") != "sent":
+            raise RuntimeError(status.get("error") or "envoi non confirmé")
+
+    def process_due(self) -> int:
+        """Traite un lot d'emails échus; retourne le nombre d'emails réservés."""
+        items = db.claim_outbox(OUTBOX_BATCH, OUTBOX_LEASE_TTL)
+        for item in items:
+            if item["statut"] == "en_cours":
+                print(f"[WARN] Outbox #{item['id']}: réservation expirée (envoi interrompu), email repris")
+        try:
+            self._compose_missing(items)
+        except Exception as e:
+            print(f"[WARN] Outbox: rédaction des emails échouée: {e}")
+        for item in items:
+            attempts = (item["tentatives"] or 0) + 1
+            try:
+                # réservation prolongée avant chaque envoi: le lot peut durer plus que OUTBOX_LEASE_TTL
+                db.update_outbox(item["id"], reserve_le=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                self._deliver(item)
+                db.update_outbox(item["id"], statut="envoye", tentatives=attempts, derniere_erreur=None,
+                                 date_envoi=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                print(f"[INFO] Outbox #{item['id']} envoyé (demande={item['demande_id']}, lang={item['langue']})")
+            except Exception as e:
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    db.update_outbox(item["id"], statut="echec", tentatives=attempts, derniere_erreur=str(e))
+                    print(f"[ERROR] Outbox #{item['id']} abandonné après {attempts} tentatives: {e}")
+                    continue
+                retry_at = datetime.now() + timedelta(seconds=_retry_delay(attempts))
+                db.update_outbox(item["id"], statut="en_attente", tentatives=attempts, derniere_erreur=str(e),
+                                 prochaine_tentative=retry_at.strftime('%Y-%m-%d %H:%M:%S'))
+                print(f"[WARN] Outbox #{item['id']} échec ({e}), nouvelle tentative à {retry_at:%H:%M:%S}")
+        return len(items)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                try:
+                    if self.process_due():
+                        continue
+                except Exception as e:
+                    print(f"[ERROR] Outbox: {e}")
+                self._wake.wait(OUTBOX_POLL_INTERVAL)
+        finally:
+            close_thread_connection()
+
+
+outbox_worker = OutboxWorker()
+
+
+def retry_now(outbox_id) -> bool:
+    """Remet un email (en échec ou en attente) en file pour un envoi immédiat."""
+    item = db.get_outbox(outbox_id)
+    if item is None or item["statut"] in ("en_cours", "envoye"):
+        return False
+    db.update_outbox(outbox_id, statut="en_attente", tentatives=0 if item["statut"] == "echec" else item["tentatives"],
+                     prochaine_tentative=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    outbox_worker.wake()
+    return True